@@ -0,0 +1,303 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark the ONOS sync steps against an in process fake ONOS.
+
+ONOSApps (in dependency chains), ServiceInstanceAttributes and ServiceAttributes are generated through the mock
+model accessor, and synchronized by SyncONOSApp and SyncONOSService for a number of cycles. The wall time, the REST
+calls received by the fake ONOS and the calls per synchronized object are written as JSON.
+
+With more than one ONOS instance every instance gets the same models, the first one can be made slower than the
+others to measure how much it delays them. With --cohorts the models of each instance are synchronized by their own
+threads, as the XOS event loop does with the cohorts of dependent models:
+
+    python benchmark_sync.py --onos 4 --slow-latency 500 --latency 5 --cohorts
+
+As the unit tests, it needs the xos and xos-services repositories checked out under a directory named
+orchestration, eg:
+
+    python benchmark_sync.py --apps 100 --chain 4 --attributes 200 --latency 5 --output results.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import yaml
+
+from fake_onos import FakeONOS
+
+benchmark_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(benchmark_path, ".."))
+sys.path.append(os.path.join(benchmark_path, "../steps"))
+
+VERSION = "1.0.0"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ONOS sync steps against a fake ONOS")
+    parser.add_argument("--apps", type=int, default=50, help="number of ONOSApps")
+    parser.add_argument("--chain", type=int, default=5, help="length of the dependency chains of the ONOSApps")
+    parser.add_argument("--remote", type=float, default=0.5,
+                        help="fraction of the ONOSApps installed from an url, the others are bundled in ONOS")
+    parser.add_argument("--attributes", type=int, default=100, help="number of ServiceInstanceAttributes")
+    parser.add_argument("--service-attributes", type=int, default=10, help="number of ServiceAttributes")
+    parser.add_argument("--latency", type=float, default=0, help="latency of every ONOS REST call, in milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of the ONOS REST calls failing with 503")
+    parser.add_argument("--backend", default="requests", choices=["requests", "twisted"], help="ONOS client backend")
+    parser.add_argument("--onos", type=int, default=1, help="number of ONOS instances, each with its own models")
+    parser.add_argument("--slow-latency", type=float,
+                        help="latency of every REST call to the first ONOS instance, in milliseconds, by default the "
+                             "same of the others")
+    parser.add_argument("--cohorts", action="store_true",
+                        help="synchronize the models of every ONOS instance in their own threads")
+    parser.add_argument("--workers", type=int, default=1, help="models synchronized at the same time")
+    parser.add_argument("--cycles", type=int, default=2, help="sync cycles, the later ones find ONOS up to date")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random generators")
+    parser.add_argument("--output", help="file to write the results to, by default they are printed")
+    return parser.parse_args()
+
+
+def setup_config(args):
+    """
+    Configure the synchronizer as the unit tests do, with the ONOS tunables coming from the arguments
+    """
+    from xosconfig import Config
+
+    with open(os.path.join(benchmark_path, "../test_config.yaml")) as f:
+        config = yaml.safe_load(f)
+    config["onos"] = {
+        "client": {"backend": args.backend},
+        "artifacts": {"enabled": False},
+        "retry": {"max_attempts": 3, "initial_backoff": 0.01, "max_backoff": 0.1},
+        "events": {"probe": False},
+    }
+
+    (fd, path) = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, "w") as f:
+        yaml.safe_dump(config, f)
+
+    Config.clear()
+    Config.init(path, os.path.join(benchmark_path, "../onos-config-schema.yaml"))
+    os.remove(path)
+
+
+def setup_model_accessor():
+    from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+    mock_modelaccessor_config(benchmark_path, [("onos-service", "onos.xproto"), ])
+
+    import xossynchronizer.modelaccessor
+    import mock_modelaccessor
+    reload(mock_modelaccessor)
+    reload(xossynchronizer.modelaccessor)
+    return xossynchronizer.modelaccessor
+
+
+def generate_models(args, name, fake, port, rng):
+    """
+    :return: (ONOSService, list of ONOSApp, list of ServiceInstanceAttribute)
+    """
+    from xossynchronizer.modelaccessor import ONOSService, ONOSApp, Service, ServiceInstanceAttribute
+
+    onos = ONOSService(name=name, rest_hostname="127.0.0.1", rest_port=port, rest_username="karaf",
+                       rest_password="karaf", class_names="ONOSService")
+    onos.save()
+
+    # SyncONOSService reads the attributes from the Service base model
+    service = Service(id=onos.id, serviceattribute_dict={
+        "/onos/v1/network/configuration/apps/org.opencord.benchmark%d" % i: json.dumps({"index": i})
+        for i in range(args.service_attributes)
+    })
+    service.save()
+
+    apps = []
+    for i in range(args.apps):
+        app_id = "org.opencord.benchmark%d" % i
+        # every app depends on the previous one in its chain
+        dependencies = apps[-1].app_id if i % args.chain else ""
+
+        if rng.random() < args.remote:
+            url = "http://artifacts.local/%s-%s.oar" % (app_id, VERSION)
+            fake.add_artifact(url, app_id, VERSION)
+        else:
+            url = None
+            fake.add_bundled_app(app_id, VERSION)
+
+        app = ONOSApp(name=app_id, app_id=app_id, dependencies=dependencies, owner=onos, owner_id=onos.id, url=url,
+                      version=VERSION, class_names="ONOSApp")
+        app.save()
+        apps.append(app)
+
+    attrs = []
+    for i in range(args.attributes if apps else 0):
+        app = apps[i % len(apps)]
+        attr = ServiceInstanceAttribute(name="/onos/v1/network/configuration/apps/%s/config%d" % (app.app_id, i),
+                                        value=json.dumps({"index": i, "enabled": True}), service_instance=app,
+                                        service_instance_id=app.id)
+        attr.save()
+        attrs.append(attr)
+
+    return (onos, apps, attrs)
+
+
+def run_step(fakes, step, model, objects, workers, cohorts=False):
+    """
+    Synchronize objects with a sync step
+    :param fakes: dict ONOS name -> FakeONOS
+    :param objects: list of (ONOS name, model)
+    :param workers: models synchronized at the same time (for each ONOS instance, with cohorts)
+    :param cohorts: synchronize the models of every ONOS instance in their own threads
+    :return: the measurements, as a dict
+    """
+    from xossynchronizer.steps.syncstep import DeferredException
+    from onos.workers import run_concurrently
+
+    outcomes = {"success": 0, "deferred": 0, "failure": 0}
+    errors = {}  # error message -> count
+    completed = {}  # ONOS name -> seconds before its last model was synchronized
+    lock = threading.Lock()
+
+    def sync(item):
+        (name, o) = item
+        error = None
+        try:
+            step.sync_record(o)
+            outcome = "success"
+        except DeferredException as e:
+            outcome = "deferred"
+            error = str(e)
+        except Exception as e:
+            outcome = "failure"
+            error = str(e)
+        with lock:
+            outcomes[outcome] += 1
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            completed[name] = time.time() - started
+
+    for fake in fakes.values():
+        fake.reset_calls()
+    started = time.time()
+    if cohorts:
+        groups = {}
+        for item in objects:
+            groups.setdefault(item[0], []).append(item)
+        run_concurrently(lambda group: run_concurrently(sync, group, workers), groups.values(), len(groups))
+    else:
+        run_concurrently(sync, objects, workers)
+    wall_time = time.time() - started
+
+    calls = sum(fake.calls_count() for fake in fakes.values())
+    calls_by_endpoint = {}
+    for fake in fakes.values():
+        for (endpoint, count) in fake.calls.items():
+            calls_by_endpoint[endpoint] = calls_by_endpoint.get(endpoint, 0) + count
+    return {
+        "step": type(step).__name__,
+        "model": model,
+        "objects": len(objects),
+        "wall_time": wall_time,
+        "objects_per_second": len(objects) / wall_time if wall_time else None,
+        "rest_calls": calls,
+        "calls_per_object": float(calls) / len(objects) if objects else None,
+        "calls": calls_by_endpoint,
+        "wall_time_by_onos": completed,
+        "outcomes": outcomes,
+        "errors": errors,
+    }
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    # don't let the logging of every REST call skew the measurements
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+    setup_config(args)
+    modelaccessor = setup_model_accessor()
+
+    from sync_onos_app import SyncONOSApp
+    from sync_onos_service import SyncONOSService
+    from onos.inventory import app_inventory
+    from onos.app_graph import app_graph
+    from onos.session import session_pool
+
+    fakes = {}
+    services = []
+    apps = []
+    attrs = []
+    for i in range(args.onos):
+        name = "onos%d" % i
+        latency = args.slow_latency if i == 0 and args.slow_latency is not None else args.latency
+        fakes[name] = FakeONOS(latency=latency / 1000.0, error_rate=args.error_rate, seed=args.seed + i)
+        port = fakes[name].start()
+
+        (onos, onos_apps, onos_attrs) = generate_models(args, name, fakes[name], port, rng)
+        services.append((name, onos))
+        apps.extend((name, app) for app in onos_apps)
+        attrs.extend((name, attr) for attr in onos_attrs)
+    app_graph.reset()
+
+    # the synchronizer doesn't process the models in any particular order
+    rng.shuffle(apps)
+    rng.shuffle(attrs)
+
+    cycles = []
+    for cycle in range(1, args.cycles + 1):
+        # the synchronizer starts every cycle from a fresh snapshot of the ONOS applications
+        app_inventory.new_cycle()
+
+        steps = [
+            run_step(fakes, SyncONOSApp(model_accessor=modelaccessor.model_accessor), "ONOSApp", apps, args.workers,
+                     args.cohorts),
+            run_step(fakes, SyncONOSApp(model_accessor=modelaccessor.model_accessor), "ServiceInstanceAttribute",
+                     attrs, args.workers, args.cohorts),
+            run_step(fakes, SyncONOSService(model_accessor=modelaccessor.model_accessor), "ONOSService", services,
+                     args.workers, args.cohorts),
+        ]
+        cycles.append({
+            "cycle": cycle,
+            "wall_time": sum(s["wall_time"] for s in steps),
+            "rest_calls": sum(s["rest_calls"] for s in steps),
+            "steps": steps,
+        })
+
+    for fake in fakes.values():
+        fake.stop()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "parameters": vars(args),
+        "sessions": session_pool.stats(),
+        "cycles": cycles,
+    }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print output
+
+
+if __name__ == "__main__":
+    main()
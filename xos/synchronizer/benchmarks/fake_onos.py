@@ -0,0 +1,244 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import random
+import urllib
+import threading
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+APPLICATIONS_PATH = "/onos/v1/applications"
+NETCFG_PATH = "/onos/v1/network/configuration"
+CLUSTER_PATH = "/onos/v1/cluster"
+
+
+class FakeONOS(object):
+    """
+    In process ONOS REST API, implementing the application and network configuration endpoints the synchronizer
+    uses. Every call waits for latency seconds, and fails with a 503 with probability error_rate.
+    """
+
+    def __init__(self, latency=0, error_rate=0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.apps = {}  # app_id -> {"name": ..., "version": ..., "state": ...}
+        self.artifacts = {}  # url -> (app_id, version)
+        self.netcfg = {}
+        self.calls = {}  # "METHOD endpoint" -> count
+        self.server = None
+
+    def add_bundled_app(self, app_id, version):
+        """
+        An application shipped with ONOS, that only needs to be activated
+        """
+        self.apps[app_id] = {"name": app_id, "version": version, "state": "INSTALLED"}
+
+    def add_artifact(self, url, app_id, version):
+        """
+        An application archive that ONOS can download
+        """
+        self.artifacts[url] = (app_id, version)
+
+    def start(self):
+        self.server = FakeONOSServer(("127.0.0.1", 0), self)
+        thread = threading.Thread(target=self.server.serve_forever, name="fake-onos")
+        thread.daemon = True
+        thread.start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls = {}
+
+    def calls_count(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def handle(self, method, path, query, body):
+        """
+        :return: (status code, JSON body or None)
+        """
+        endpoint = self.endpoint(path)
+        with self.lock:
+            name = "%s %s" % (method, endpoint)
+            self.calls[name] = self.calls.get(name, 0) + 1
+            fail = self.random.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return (503, {"message": "injected failure"})
+
+        with self.lock:
+            if endpoint == "cluster":
+                return (200, {"nodes": [{"id": "127.0.0.1", "status": "READY"}]})
+            if endpoint.startswith("applications"):
+                return self.handle_app(method, path[len(APPLICATIONS_PATH):].strip("/").split("/"), query, body)
+            if endpoint == "netcfg":
+                return self.handle_netcfg(method, [urllib.unquote(k) for k in path[len(NETCFG_PATH):].split("/") if k],
+                                          body)
+        return (404, None)
+
+    @staticmethod
+    def endpoint(path):
+        """
+        Group the calls by endpoint, eg: "applications/app/active" for /onos/v1/applications/<app_id>/active
+        """
+        if path.startswith(CLUSTER_PATH):
+            return "cluster"
+        if path.startswith(NETCFG_PATH):
+            return "netcfg"
+        if path.startswith(APPLICATIONS_PATH):
+            parts = [p for p in path[len(APPLICATIONS_PATH):].split("/") if p]
+            if not parts:
+                return "applications"
+            return "/".join(["applications", "app"] + parts[1:])
+        return "unknown"
+
+    def handle_app(self, method, parts, query, body):
+        parts = [p for p in parts if p]
+
+        if not parts:
+            if method == "GET":
+                return (200, {"applications": self.apps.values()})
+            if method == "POST":
+                return self.install(query, body)
+            return (405, None)
+
+        app = self.apps.get(parts[0])
+        if app is None:
+            return (404, {"message": "App %s not found" % parts[0]})
+
+        if parts[1:] == ["active"]:
+            if method == "POST":
+                app["state"] = "ACTIVE"
+                return (200, app)
+            if method == "DELETE":
+                app["state"] = "INSTALLED"
+                return (204, None)
+        elif not parts[1:]:
+            if method == "GET":
+                return (200, app)
+            if method == "DELETE":
+                del self.apps[parts[0]]
+                return (204, None)
+        return (405, None)
+
+    def install(self, query, body):
+        # NOTE archives uploaded by the synchronizer (see onos.artifacts) are not supported, ONOS downloads them
+        data = json.loads(body)
+        url = data.get("url")
+        activate = data.get("activate", False)
+
+        if url not in self.artifacts:
+            return (400, {"message": "Can't download %s" % url})
+        (app_id, version) = self.artifacts[url]
+        if app_id in self.apps:
+            return (409, {"message": "App %s already installed" % app_id})
+
+        app = {"name": app_id, "version": version, "state": "ACTIVE" if activate else "INSTALLED"}
+        self.apps[app_id] = app
+        return (200, app)
+
+    def handle_netcfg(self, method, keys, body):
+        if method == "GET":
+            current = self.netcfg
+            for key in keys:
+                if not isinstance(current, dict) or key not in current:
+                    return (404, None)
+                current = current[key]
+            return (200, current)
+
+        if method == "POST":
+            if not self.post_netcfg(keys, json.loads(body)):
+                return (400, {"message": "Invalid configuration"})
+            return (200, None)
+
+        if not keys:
+            return (405, None)
+
+        parent = self.netcfg
+        for key in keys[:-1]:
+            parent = parent.setdefault(key, {})
+
+        if method == "DELETE":
+            if keys[-1] not in parent:
+                return (404, None)
+            del parent[keys[-1]]
+            return (204, None)
+        return (405, None)
+
+    def post_netcfg(self, keys, value):
+        """
+        As ONOS does, replace the configurations (subject class / subject / config key) found in value, and keep
+        the others
+        :return: False if value is not a valid network configuration
+        """
+        if len(keys) < 3:
+            if not isinstance(value, dict):
+                return False
+            return all([self.post_netcfg(keys + [k], v) for (k, v) in value.items()])
+
+        parent = self.netcfg
+        for key in keys[:-1]:
+            parent = parent.setdefault(key, {})
+        parent[keys[-1]] = value
+        return True
+
+
+class FakeONOSHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # keep-alive, as ONOS does
+    protocol_version = "HTTP/1.1"
+    # send the whole response at once, small writes would be delayed by the Nagle algorithm
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def serve(self):
+        url = urlparse.urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+
+        (status, data) = self.server.onos.handle(self.command, url.path, urlparse.parse_qs(url.query), body)
+
+        payload = json.dumps(data) if data is not None else ""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = serve
+    do_POST = serve
+    do_DELETE = serve
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeONOSServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, onos):
+        BaseHTTPServer.HTTPServer.__init__(self, address, FakeONOSHandler)
+        self.onos = onos
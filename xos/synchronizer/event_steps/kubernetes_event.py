@@ -14,14 +14,32 @@
 # limitations under the License.
 
 
+import os
+import sys
 import json
+import threading
 from xossynchronizer.event_steps.eventstep import EventStep
-from xossynchronizer.modelaccessor import ONOSApp, ONOSService
+from xossynchronizer.modelaccessor import ONOSService
 from xosconfig import Config
 from multistructlog import create_logger
 
+# the helpers shared by the steps live in the onos package
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from onos.coalescer import EventCoalescer  # noqa: E402
+from onos.probe import StateProbe  # noqa: E402
+from onos.session import session_pool  # noqa: E402
+from onos.readiness import readiness_gates  # noqa: E402
+from onos.applied import applied_state  # noqa: E402
+from onos.resync import service_models, dirty  # noqa: E402
+from onos.helpers import Helpers  # noqa: E402
+
 log = create_logger(Config().get('logging'))
 
+RESYNC_STATUS = "resynchronize due to kubernetes event"
+
+# a new step is created for every event, the pending events are tracked across steps
+pod_events = EventCoalescer("kubernetes-pod-details")
+
 
 class KubernetesPodDetailsEventStep(EventStep):
     topics = ["xos.kubernetes.pod-details"]
@@ -45,29 +63,67 @@ class KubernetesPodDetailsEventStep(EventStep):
             return
 
         log.info("Looking for ONOSServices", name=xos_service)
-        for service in ONOSService.objects.all():
-
-            if service.name.lower() != xos_service.lower():
-                continue
-
-            log.info("Dirtying ONOS Service", service=service)
-            service.backend_code = 0
-            service.backend_status = "resynchronize due to kubernetes event"
-            service.save(update_fields=["updated", "backend_code", "backend_status"], always_update_timestamp=True)
-
-            for app in service.service_instances.all():
-                log.info("Dirtying ONOS App", app=app)
-                app.backend_code = 0
-                app.backend_status = "resynchronize due to kubernetes event"
-                app.save(update_fields=["updated", "backend_code", "backend_status"], always_update_timestamp=True)
-
-                for attr in app.service_instance_attributes.all():
-                    log.info("Dirtying ServiceInstanceAttributes for App", app=app, attr=attr)
-                    attr.backend_code = 0
-                    attr.backend_status = "resynchronize due to kubernetes event"
-                    attr.save(
-                        update_fields=[
-                            "updated",
-                            "backend_code",
-                            "backend_status"],
-                        always_update_timestamp=True)
+        # let the core do the (case insensitive) lookup, instead of listing all the services
+        services = list(ONOSService.objects.filter(name__iexact=xos_service))
+        for service in services:
+            # ONOS is restarting, hold the sync steps until its REST API is serving again, right away even if the
+            # resynchronization is delayed by the coalescing window
+            readiness_gates.close(session_pool.get(service))
+
+        # during a rolling restart or a crash loop many events are received for the same service in a few seconds,
+        # resynchronize the service only once
+        pod_events.submit(xos_service.lower(), lambda: self.dirty_services(services),
+                          Helpers.get_onos_config("events", "coalesce_window", 0))
+
+    def dirty_services(self, services):
+        for service in services:
+            # ONOS may have lost the configs that have been applied
+            applied_state.clear(service.id)
+            self.dirty_service(service)
+
+    def dirty_service(self, service):
+        """
+        Reset the backend status of an ONOSService and of the models that depend on it, so that they are pushed
+        again to the ONOS instance that restarted
+        """
+        (apps, attrs) = service_models(service)
+
+        if Helpers.get_onos_config("events", "probe", False):
+            # waiting for ONOS to be ready can take minutes, don't hold the thread delivering the events
+            t = threading.Thread(target=self.probe_service, args=(service, apps, attrs),
+                                 name="onos-probe-%s" % service.name)
+            t.daemon = True
+            t.start()
+            return
+
+        self.dirty_models(service, apps, attrs, [service] + apps + attrs)
+
+    def probe_service(self, service, apps, attrs):
+        """
+        Wait for a restarted ONOS to be ready, and reset the backend status of the models it is missing.
+        ONOS may have restored most of its state from its own persistence, only what is actually missing is
+        resynchronized.
+        """
+        models = [service] + apps + attrs
+        try:
+            if not readiness_gates.wait_ready(session_pool.get(service)):
+                raise Exception("ONOS is not ready")
+            models = [m for (m, reason) in StateProbe.diverged_models(service, apps, attrs)]
+        except Exception as e:
+            log.warning("Failed to probe ONOS, resynchronizing everything", service=service, error=str(e))
+
+        try:
+            self.dirty_models(service, apps, attrs, models)
+        except Exception as e:
+            # nobody is waiting for the result
+            log.error("Failed to dirty ONOS Service", service=service, error=str(e))
+
+    def dirty_models(self, service, apps, attrs, models):
+        models = [m for m in models if not self.is_dirty(m)]
+        log.info("Dirtying ONOS Service", service=service, apps=len(apps), attrs=len(attrs), saves=len(models))
+        dirty(models, RESYNC_STATUS)
+
+    @staticmethod
+    def is_dirty(model):
+        # a reset that has not been picked up by the sync steps yet, no need to save the model again
+        return model.backend_code == 0 and model.backend_status == RESYNC_STATUS
@@ -14,6 +14,7 @@
 
 import unittest
 import json
+import threading
 from mock import patch, call, Mock
 
 import os
@@ -48,9 +49,15 @@ class TestKubernetesEvent(unittest.TestCase):
 
         self.model_accessor = model_accessor
 
-        from mock_modelaccessor import MockObjectList
-
+        import onos.resync as onos_resync
+        reload(onos_resync)  # pick up the model classes of the reloaded model accessor
+        import kubernetes_event
+        reload(kubernetes_event)
         from kubernetes_event import KubernetesPodDetailsEventStep
+        from onos.readiness import readiness_gates
+
+        self.readiness_gates = readiness_gates
+        readiness_gates.reset()
 
         # import all class names to globals
         for (k, v) in model_accessor.all_model_classes.items():
@@ -58,7 +65,8 @@ class TestKubernetesEvent(unittest.TestCase):
 
         self.event_step = KubernetesPodDetailsEventStep
 
-        self.onos = ONOSService(name="myonos",
+        self.onos = ONOSService(id=1,
+                                name="myonos",
                                 rest_hostname="onos-url",
                                 rest_port="8181",
                                 rest_username="karaf",
@@ -66,40 +74,85 @@ class TestKubernetesEvent(unittest.TestCase):
                                 backend_code=1,
                                 backend_status="succeeded")
 
-        self.attr = ServiceInstanceAttribute(
-            name="foo",
-            value="bar"
-        )
-
-        self.mockAllAttr = Mock()
-        self.mockAllAttr.all.return_value = [self.attr]
-
-        self.app1 = ONOSApp(name="myapp1",
+        self.app1 = ONOSApp(id=10,
+                            name="myapp1",
                             owner=self.onos,
+                            owner_id=self.onos.id,
                             backend_code=1,
-                            backend_status="succeeded",
-                            service_instance_attributes=self.mockAllAttr)
+                            backend_status="succeeded")
 
-        self.app2 = ONOSApp(name="myapp2",
+        self.app2 = ONOSApp(id=11,
+                            name="myapp2",
                             owner=self.onos,
+                            owner_id=self.onos.id,
                             backend_code=1,
-                            backend_status="succeeded",
-                            service_instance_attributes=self.mockAllAttr)
+                            backend_status="succeeded")
+
+        self.attr1 = ServiceInstanceAttribute(
+            name="foo",
+            value="bar",
+            service_instance_id=self.app1.id
+        )
 
-        self.onos.service_instances = MockObjectList([self.app1, self.app2])
+        self.attr2 = ServiceInstanceAttribute(
+            name="foo",
+            value="bar",
+            service_instance_id=self.app2.id
+        )
+
+        # attribute of a ServiceInstance unrelated to ONOS
+        self.other_attr = ServiceInstanceAttribute(
+            name="foo",
+            value="bar",
+            backend_code=1,
+            service_instance_id=99
+        )
+
+        # ONOSApp of another ONOSService
+        self.other_app = ONOSApp(id=12,
+                                 name="otherapp",
+                                 owner_id=2,
+                                 backend_code=1,
+                                 backend_status="succeeded")
+
+        self.app_patch = patch.object(ONOSApp.objects, "get_items",
+                                      return_value=[self.app1, self.other_app, self.app2])
+        self.app_patch.start()
+        # the mock model accessor only filters on equality, the attributes are read with a range query
+        self.attr_filter_patch = patch.object(
+            ServiceInstanceAttribute.objects, "filter",
+            side_effect=lambda service_instance_id__gte, service_instance_id__lte: [
+                a for a in ServiceInstanceAttribute.objects.get_items()
+                if service_instance_id__gte <= a.service_instance_id <= service_instance_id__lte])
+        self.attr_filter = self.attr_filter_patch.start()
 
         self.log = Mock()
 
     def tearDown(self):
+        self.attr_filter_patch.stop()
+        self.app_patch.stop()
+        self.readiness_gates.reset()
         self.onos = None
         sys.path = self.sys_path_save
 
+    @staticmethod
+    def join_probes():
+        for t in threading.enumerate():
+            if t.name.startswith("onos-probe-"):
+                t.join(5)
+
     def test_process_event(self):
-        with patch.object(ONOSService.objects, "get_items") as service_objects, \
+        from onos.applied import applied_state, APPLIED
+        applied_state.record(self.onos.id, "http://onos-url:8181", "onos/v1/network/configuration/apps/foo", "hash",
+                             APPLIED)
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
                 patch.object(ONOSService, "save", autospec=True) as service_save, \
                 patch.object(ONOSApp, "save", autospec=True) as app_save, \
                 patch.object(ServiceInstanceAttribute, "save", autospec=True) as attr_save:
             service_objects.return_value = [self.onos]
+            attr_objects.return_value = [self.attr1, self.attr2, self.other_attr]
 
             event_dict = {"status": "created",
                           "labels": {"xos_service": "myonos"}}
@@ -127,12 +180,184 @@ class TestKubernetesEvent(unittest.TestCase):
             app_save.assert_has_calls([call(self.app1, update_fields=["updated", "backend_code", "backend_status"],
                                             always_update_timestamp=True),
                                        call(self.app2, update_fields=["updated", "backend_code", "backend_status"],
-                                            always_update_timestamp=True)])
+                                            always_update_timestamp=True)], any_order=True)
+
+            service_objects.assert_called_with(name__iexact="myonos")
+            self.assertFalse(self.readiness_gates.gates["http://onos-url:8181"].ready)
+            # the configs are pushed again
+            self.assertFalse(applied_state.is_applied(self.onos.id, "http://onos-url:8181",
+                                                      "onos/v1/network/configuration/apps/foo", "hash"))
+
+            self.assertEqual(self.attr1.backend_code, 0)
+            self.assertEqual(self.attr1.backend_status, "resynchronize due to kubernetes event")
+            self.assertEqual(self.attr2.backend_code, 0)
+            self.assertEqual(self.attr2.backend_status, "resynchronize due to kubernetes event")
+            self.assertEqual(self.other_attr.backend_code, 1)
+            self.assertEqual(attr_save.call_count, 2)
+            self.assertEqual(self.other_app.backend_code, 1)
+            # the attributes of all the apps are read at once
+            self.attr_filter.assert_called_once_with(service_instance_id__gte=10, service_instance_id__lte=11)
+
+    def test_process_event_already_dirty(self):
+        self.app2.backend_code = 0
+        self.app2.backend_status = "resynchronize due to kubernetes event"
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
+                patch.object(ONOSService, "save", autospec=True) as service_save, \
+                patch.object(ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True) as attr_save:
+            service_objects.return_value = [self.onos]
+            attr_objects.return_value = [self.attr1, self.attr2, self.other_attr]
+
+            event = Mock()
+            event.value = json.dumps({"status": "created", "labels": {"xos_service": "MyONOS"}})
+
+            step = self.event_step(log=self.log, model_accessor=self.model_accessor)
+            step.process_event(event)
+
+            service_objects.assert_called_with(name__iexact="MyONOS")
+            self.assertEqual(service_save.call_count, 1)
+            app_save.assert_called_once_with(self.app1, update_fields=["updated", "backend_code", "backend_status"],
+                                             always_update_timestamp=True)
+            self.assertEqual(attr_save.call_count, 2)
+
+    def test_process_event_burst(self):
+        from onos.helpers import Helpers
+        import kubernetes_event
+
+        def get_onos_config(section, key, default=None):
+            if (section, key) == ("events", "coalesce_window"):
+                return 60
+            return default
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
+                patch.object(Helpers, "get_onos_config", side_effect=get_onos_config), \
+                patch.object(ONOSService, "save", autospec=True) as service_save, \
+                patch.object(ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True):
+            service_objects.return_value = [self.onos]
+            attr_objects.return_value = []
+
+            for name in ["myonos", "MyONOS", "myonos"]:
+                event = Mock()
+                event.value = json.dumps({"status": "created", "labels": {"xos_service": name}})
+                self.event_step(log=self.log, model_accessor=self.model_accessor).process_event(event)
+
+            service_save.assert_not_called()
+            # the sync steps are held while the window is open
+            self.assertFalse(self.readiness_gates.gates["http://onos-url:8181"].ready)
+
+            kubernetes_event.pod_events.flush()
+
+            service_objects.assert_called_with(name__iexact="myonos")
+            self.assertEqual(service_save.call_count, 1)
+            self.assertEqual(app_save.call_count, 2)
+            self.assertEqual(kubernetes_event.pod_events.stats["absorbed"], 2)
+            self.assertEqual(kubernetes_event.pod_events.stats["executed"], 1)
+
+    def test_process_event_probe(self):
+        from onos.helpers import Helpers
+        from onos.probe import StateProbe
+
+        def get_onos_config(section, key, default=None):
+            if (section, key) == ("events", "probe"):
+                return True
+            return default
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
+                patch.object(Helpers, "get_onos_config", side_effect=get_onos_config), \
+                patch.object(StateProbe, "diverged_models") as diverged_models, \
+                patch.object(self.readiness_gates, "wait_ready", return_value=True), \
+                patch.object(ONOSService, "save", autospec=True) as service_save, \
+                patch.object(ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True) as attr_save:
+            service_objects.return_value = [self.onos]
+            attr_objects.return_value = [self.attr1, self.attr2, self.other_attr]
+            diverged_models.return_value = [(self.app2, "not installed"), (self.attr1, "missing")]
+
+            event = Mock()
+            event.value = json.dumps({"status": "created", "labels": {"xos_service": "myonos"}})
+            self.event_step(log=self.log, model_accessor=self.model_accessor).process_event(event)
+            self.join_probes()
+
+            diverged_models.assert_called_with(self.onos, [self.app1, self.app2], [self.attr1, self.attr2])
+            service_save.assert_not_called()
+            app_save.assert_called_once_with(self.app2, update_fields=["updated", "backend_code", "backend_status"],
+                                             always_update_timestamp=True)
+            attr_save.assert_called_once_with(self.attr1, update_fields=["updated", "backend_code", "backend_status"],
+                                              always_update_timestamp=True)
+            self.assertEqual(self.app1.backend_code, 1)
+
+    def test_process_event_probe_failure(self):
+        from onos.helpers import Helpers
+        from onos.probe import StateProbe
+
+        def get_onos_config(section, key, default=None):
+            if (section, key) == ("events", "probe"):
+                return True
+            return default
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
+                patch.object(Helpers, "get_onos_config", side_effect=get_onos_config), \
+                patch.object(StateProbe, "diverged_models") as diverged_models, \
+                patch.object(self.readiness_gates, "wait_ready", return_value=True), \
+                patch.object(ONOSService, "save", autospec=True) as service_save, \
+                patch.object(ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True) as attr_save:
+            service_objects.return_value = [self.onos]
+            attr_objects.return_value = [self.attr1, self.attr2, self.other_attr]
+            diverged_models.side_effect = Exception("Failed to read applications from ONOS")
+
+            event = Mock()
+            event.value = json.dumps({"status": "created", "labels": {"xos_service": "myonos"}})
+            self.event_step(log=self.log, model_accessor=self.model_accessor).process_event(event)
+            self.join_probes()
 
-            self.assertEqual(self.attr.backend_code, 0)
-            self.assertEqual(self.attr.backend_status, "resynchronize due to kubernetes event")
+            # everything is resynchronized
+            self.assertEqual(service_save.call_count, 1)
+            self.assertEqual(app_save.call_count, 2)
             self.assertEqual(attr_save.call_count, 2)
 
+    def test_process_event_probe_waits_in_background(self):
+        from onos.helpers import Helpers
+        from onos.probe import StateProbe
+
+        def get_onos_config(section, key, default=None):
+            if (section, key) == ("events", "probe"):
+                return True
+            return default
+
+        ready = threading.Event()
+
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
+                patch.object(ServiceInstanceAttribute.objects, "get_items") as attr_objects, \
+                patch.object(Helpers, "get_onos_config", side_effect=get_onos_config), \
+                patch.object(StateProbe, "diverged_models") as diverged_models, \
+                patch.object(self.readiness_gates, "wait_ready", side_effect=lambda session: ready.wait(5)), \
+                patch.object(ONOSService, "save", autospec=True), \
+                patch.object(ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True):
+            service_objects.return_value = [self.onos]
+            attr_objects.return_value = []
+            diverged_models.return_value = [(self.app2, "not installed")]
+
+            event = Mock()
+            event.value = json.dumps({"status": "created", "labels": {"xos_service": "myonos"}})
+            self.event_step(log=self.log, model_accessor=self.model_accessor).process_event(event)
+
+            # the event has been processed while ONOS is still restarting
+            self.assertFalse(self.readiness_gates.gates["http://onos-url:8181"].ready)
+            app_save.assert_not_called()
+
+            ready.set()
+            self.join_probes()
+            app_save.assert_called_once_with(self.app2, update_fields=["updated", "backend_code", "backend_status"],
+                                             always_update_timestamp=True)
+
     def test_process_event_unknownstatus(self):
         with patch.object(ONOSService.objects, "get_items") as service_objects, \
                 patch.object(ONOSService, "save") as service_save, \
@@ -159,10 +384,10 @@ class TestKubernetesEvent(unittest.TestCase):
             self.assertEqual(self.app2.backend_status, "succeeded")
 
     def test_process_event_unknownservice(self):
-        with patch.object(ONOSService.objects, "get_items") as service_objects, \
+        with patch.object(ONOSService.objects, "filter") as service_objects, \
                 patch.object(ONOSService, "save") as service_save, \
                 patch.object(ONOSApp, "save") as app_save:
-            service_objects.return_value = [self.onos]
+            service_objects.return_value = []
 
             event_dict = {"status": "created",
                           "labels": {"xos_service": "some_other_service"}}
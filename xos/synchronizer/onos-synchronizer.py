@@ -22,10 +22,11 @@ from xosconfig import Config
 
 base_config_file = os.path.abspath(os.path.dirname(os.path.realpath(__file__)) + '/config.yaml')
 mounted_config_file = os.path.abspath(os.path.dirname(os.path.realpath(__file__)) + '/mounted_config.yaml')
+config_schema_file = os.path.abspath(os.path.dirname(os.path.realpath(__file__)) + '/onos-config-schema.yaml')
 
 if os.path.isfile(mounted_config_file):
-    Config.init(base_config_file, 'synchronizer-config-schema.yaml', mounted_config_file)
+    Config.init(base_config_file, config_schema_file, mounted_config_file)
 else:
-    Config.init(base_config_file, 'synchronizer-config-schema.yaml')
+    Config.init(base_config_file, config_schema_file)
 
 Synchronizer().run()
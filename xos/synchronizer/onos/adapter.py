@@ -0,0 +1,203 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import datetime
+import threading
+from io import BytesIO
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+
+from twisted.internet import defer, error, task
+from twisted.internet.selectreactor import SelectReactor
+from twisted.internet.threads import blockingCallFromThread
+from twisted.web.client import Agent, HTTPConnectionPool, FileBodyProducer, readBody, PartialDownloadError
+from twisted.web.client import ResponseFailed, RequestTransmissionFailed
+from twisted.web.http_headers import Headers
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+log = create_logger(Config().get('logging'))
+
+# headers that are computed by the twisted Agent itself
+SKIPPED_HEADERS = ["host", "content-length"]
+
+
+class EventLoop(object):
+    """
+    A twisted reactor running in a dedicated thread, shared by all the TwistedAdapters.
+
+    NOTE the global reactor can't be used: the XOS model accessor stops it once the models are loaded, and a stopped
+    reactor can't be started again, so the synchronizer uses a private one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reactor = None
+
+    def get(self):
+        with self.lock:
+            if self.reactor is None:
+                self.reactor = SelectReactor()
+                t = threading.Thread(target=self.reactor.run, kwargs={"installSignalHandlers": False},
+                                     name="onos-event-loop")
+                t.daemon = True
+                t.start()
+                log.info("Started ONOS event loop")
+            return self.reactor
+
+
+event_loop = EventLoop()
+
+
+class TwistedAdapter(BaseAdapter):
+    """
+    requests transport adapter that performs the HTTP calls on the event loop, so that many calls can be in flight
+    at the same time without using a thread for each of them.
+
+    NOTE the calls are made with the default TLS settings of twisted and without proxies: the verify, cert and
+    proxies settings of requests are not supported (see TwistedAdapter.unsupported).
+    """
+
+    def __init__(self, max_in_flight=100, pool_maxsize=10, loop=None):
+        super(TwistedAdapter, self).__init__()
+        self.reactor = (loop or event_loop).get()
+        self.pool = HTTPConnectionPool(self.reactor, persistent=True)
+        self.pool.maxPersistentPerHost = pool_maxsize
+        self.agent = Agent(self.reactor, pool=self.pool)
+        self.semaphore = defer.DeferredSemaphore(max(max_in_flight, 1))
+        # the default cooperator, used to write the request bodies, is bound to the global reactor
+        self.cooperator = task.Cooperator(scheduler=lambda work: self.reactor.callLater(0, work))
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        """
+        Blocking send, used by the requests.Session API
+        """
+        unsupported = self.unsupported(request.url, verify, cert, proxies)
+        if unsupported:
+            raise Exception("The twisted backend doesn't support the %s settings of the request to %s" %
+                            (", ".join(unsupported), request.url))
+        return blockingCallFromThread(self.reactor, self.send_deferred, request, timeout)
+
+    @staticmethod
+    def unsupported(url, verify=True, cert=None, proxies=None):
+        """
+        :param url: url of the request
+        :param verify, cert, proxies: the settings of the request, as passed by requests.Session to the adapters
+        :return: the names of the settings that the adapter would ignore
+        """
+        settings = []
+        if url.lower().startswith("https://"):
+            if verify is not True:
+                settings.append("verify")
+            if cert:
+                settings.append("cert")
+        if select_proxy(url, proxies or {}):
+            settings.append("proxies")
+        return settings
+
+    def send_many(self, prepared, timeout=None):
+        """
+        Send many requests concurrently and wait for all of them to complete
+        :param prepared: list of requests.PreparedRequest
+        :param timeout: timeout for each request, in seconds
+        :return: list containing a requests.Response or an exception for each request, in the same order
+        """
+        def send_all():
+            deferreds = [self.send_deferred(r, timeout) for r in prepared]
+            return defer.DeferredList(deferreds, consumeErrors=True)
+
+        results = blockingCallFromThread(self.reactor, send_all)
+        return [value if success else value.value for (success, value) in results]
+
+    def send_deferred(self, request, timeout=None):
+        """
+        Must be called from the event loop thread
+        :return: Deferred firing with a requests.Response
+        """
+        return self.semaphore.run(self._send, request, timeout)
+
+    def _send(self, request, timeout):
+        headers = Headers()
+        for (name, value) in request.headers.items():
+            if name.lower() not in SKIPPED_HEADERS:
+                headers.addRawHeader(self._bytes(name), self._bytes(value))
+
+        body = None
+        if hasattr(request.body, "read"):
+            # stream file uploads
+            body = FileBodyProducer(request.body, cooperator=self.cooperator)
+        elif request.body is not None:
+            body = FileBodyProducer(BytesIO(self._bytes(request.body)), cooperator=self.cooperator)
+
+        started = time.time()
+        d = self.agent.request(self._bytes(request.method), self._bytes(request.url), headers, body)
+        d.addCallback(lambda response: self._read(request, response, started))
+        if timeout is not None:
+            if isinstance(timeout, tuple):
+                timeout = max(t for t in timeout if t is not None)
+            d.addTimeout(timeout, self.reactor)
+        d.addErrback(self._translate_error, request)
+        return d
+
+    def _read(self, request, tx_response, started):
+        def build(body):
+            response = requests.Response()
+            response.status_code = tx_response.code
+            response.reason = tx_response.phrase
+            response.headers = CaseInsensitiveDict(
+                (name, ", ".join(values)) for (name, values) in tx_response.headers.getAllRawHeaders())
+            response.encoding = get_encoding_from_headers(response.headers)
+            response._content = body
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            response.elapsed = datetime.timedelta(seconds=time.time() - started)
+            return response
+
+        def partial(failure):
+            # the server closed the connection without declaring the length of the body
+            failure.trap(PartialDownloadError)
+            return failure.value.response
+
+        d = readBody(tx_response)
+        d.addErrback(partial)
+        d.addCallback(build)
+        return d
+
+    @staticmethod
+    def _translate_error(failure, request):
+        """
+        Raise the same exceptions the blocking backend would raise, so callers don't need to know the backend
+        """
+        if failure.check(defer.TimeoutError, defer.CancelledError):
+            raise requests.exceptions.Timeout("Request to %s timed out" % request.url, request=request)
+        if failure.check(error.ConnectError, error.ConnectionLost, error.DNSLookupError, ResponseFailed,
+                         RequestTransmissionFailed):
+            raise requests.exceptions.ConnectionError("Failed to connect to %s: %s" % (request.url, failure.value),
+                                                      request=request)
+        return failure
+
+    @staticmethod
+    def _bytes(value):
+        if isinstance(value, unicode):
+            return value.encode("utf-8")
+        return value
+
+    def close(self):
+        self.reactor.callFromThread(self.pool.closeCachedConnections)
@@ -0,0 +1,194 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from xossynchronizer.modelaccessor import ONOSApp
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+log = create_logger(Config().get('logging'))
+
+
+class AppDependencyGraph(object):
+    """
+    In memory graph of the dependencies between ONOSApps.
+
+    Applications are identified by (owner_id, app_id), as the same application can be installed in different ONOS
+    instances. The graph is loaded once from the ONOSApp models and then updated as the models change.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.apps = {}  # (owner_id, app_id) -> ONOSApp
+            self.keys = {}  # ONOSApp id -> (owner_id, app_id)
+
+    @staticmethod
+    def parse_dependencies(deps):
+        """
+        :param deps: comma separated list of application names
+        :return: list of application names
+        """
+        if not deps:
+            return []
+        return [x.strip() for x in deps.split(',') if x.strip() != ""]
+
+    def load(self, apps):
+        """
+        Rebuild the whole graph
+        :param apps: list of ONOSApp models
+        """
+        with self.lock:
+            self.reset()
+            self.update(apps)
+            self.loaded = True
+            log.debug("Loaded ONOSApp dependency graph", apps=len(self.apps))
+
+    def ensure_loaded(self):
+        with self.lock:
+            if not self.loaded:
+                self.load(ONOSApp.objects.all())
+
+    def update(self, apps):
+        """
+        Add or update applications in the graph
+        :param apps: list of ONOSApp models
+        """
+        with self.lock:
+            for app in apps:
+                self._remove(app.id)
+                key = (app.owner_id, app.app_id)
+                self.apps[key] = app
+                self.keys[app.id] = key
+
+    def remove(self, apps):
+        """
+        Remove deleted applications from the graph
+        :param apps: list of ONOSApp models
+        """
+        with self.lock:
+            for app in apps:
+                self._remove(app.id)
+
+    def _remove(self, id):
+        key = self.keys.pop(id, None)
+        if key is not None and self.apps.get(key) is not None and self.apps[key].id == id:
+            del self.apps[key]
+
+    def dependencies(self, owner_id, app_id):
+        """
+        :return: list of the app_ids directly required by an application
+        """
+        with self.lock:
+            app = self.apps.get((owner_id, app_id))
+            if app is None:
+                return []
+            return self.parse_dependencies(app.dependencies)
+
+    def missing_dependencies(self, owner_id, app_id):
+        """
+        Look for dependencies, direct or indirect, that don't have a corresponding ONOSApp
+        :return: list of app_ids
+        """
+        with self.lock:
+            missing = []
+            for dep in self._walk(owner_id, app_id):
+                if (owner_id, dep) not in self.apps and dep not in missing:
+                    missing.append(dep)
+            return missing
+
+    def find_cycle(self, owner_id, app_id):
+        """
+        Look for a dependency cycle reachable from an application
+        :return: the list of app_ids forming the cycle (first and last items are the same) or None
+        """
+        with self.lock:
+            path = []
+            visited = set()
+
+            def visit(node):
+                if node in path:
+                    return path[path.index(node):] + [node]
+                if node in visited:
+                    return None
+                visited.add(node)
+                path.append(node)
+                for dep in self.dependencies(owner_id, node):
+                    cycle = visit(dep)
+                    if cycle:
+                        return cycle
+                path.pop()
+                return None
+
+            return visit(app_id)
+
+    def install_order(self, owner_id, app_id):
+        """
+        Topologically sorted list of the applications required, directly or indirectly, by an application.
+        Dependencies come before the applications that require them, the application itself is not included.
+        NOTE the graph is expected to be free of cycles and missing dependencies
+        :return: list of ONOSApp models
+        """
+        with self.lock:
+            return [self.apps[(owner_id, dep)] for dep in self._walk(owner_id, app_id)
+                    if (owner_id, dep) in self.apps]
+
+    def levels(self, owner_id):
+        """
+        Group the applications of an ONOS instance by dependency level: applications in the first level have no
+        dependencies, applications in the second level depend only on applications in the first one, and so on.
+        Applications that are part of a cycle or that require missing applications are not included.
+        :return: list of lists of ONOSApp models
+        """
+        with self.lock:
+            pending = dict((app_id, set(self.parse_dependencies(app.dependencies)))
+                           for ((owner, app_id), app) in self.apps.items() if owner == owner_id)
+            levels = []
+            done = set()
+            while pending:
+                level = sorted([app_id for (app_id, deps) in pending.items() if deps <= done])
+                if not level:
+                    break
+                levels.append([self.apps[(owner_id, app_id)] for app_id in level])
+                for app_id in level:
+                    del pending[app_id]
+                done.update(level)
+            return levels
+
+    def _walk(self, owner_id, app_id):
+        """
+        Post-order visit of the dependencies of an application
+        :return: list of app_ids
+        """
+        visited = set([app_id])
+        result = []
+
+        def visit(node):
+            for dep in self.dependencies(owner_id, node):
+                if dep in visited:
+                    continue
+                visited.add(dep)
+                visit(dep)
+                result.append(dep)
+
+        visit(app_id)
+        return result
+
+
+app_graph = AppDependencyGraph()
@@ -0,0 +1,334 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+APPLIED = "applied"
+FAILED = "failed"
+
+MEMORY = ":memory:"
+
+# bumped when the tables change, the ledger written by a previous version is discarded
+SCHEMA_VERSION = 2
+# the tables that are dropped when the schema changes
+TABLES = ["configs", "subjects"]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS configs (
+        onos_id INTEGER NOT NULL,
+        endpoint TEXT NOT NULL,
+        model TEXT NOT NULL,
+        model_id INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        error TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (onos_id, endpoint, model, model_id, path)
+    )""",
+    """CREATE TABLE IF NOT EXISTS apps (
+        onos_id INTEGER NOT NULL,
+        endpoint TEXT NOT NULL,
+        app_id TEXT NOT NULL,
+        version TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (onos_id, endpoint, app_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS subjects (
+        onos_id INTEGER NOT NULL,
+        endpoint TEXT NOT NULL,
+        model TEXT NOT NULL,
+        model_id INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (onos_id, endpoint, model, model_id, path, subject)
+    )""",
+]
+
+
+def content_hash(value):
+    """
+    :param value: a configuration, as decoded from JSON
+    :return: a digest of the configuration that doesn't depend on the order of its keys
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"))).hexdigest()
+
+
+def format_summary(summary):
+    return "%(applied)d applied, %(pending)d pending, %(failed)d failed" % summary
+
+
+class AppliedState(object):
+    """
+    Ledger of what has been applied to each ONOS instance: for every config pushed by the sync steps the hash of its
+    content and the outcome of the last push, the hash of each of its subjects that has been applied (for the
+    network configurations pushed subject by subject), and the version of every application installed and activated.
+    The sync steps use it to skip the work that has been done already, eg: to push only the configs that failed or
+    changed since they have been applied.
+
+    The configs of the ServiceAttributes are identified by their path, an ONOSService has a single ServiceAttribute
+    for each path. The configs of the ServiceInstanceAttributes are identified by the id of the attribute too
+    (model_id), as the attributes of different ONOSApps can push to the same path.
+
+    The ledger is kept in a SQLite database (see onos.ledger.path) so that it survives the restarts of the
+    synchronizer, that would otherwise push everything again to every ONOS instance. When no path is configured the
+    ledger is kept in memory. It has to be cleared when ONOS restarts, as ONOS may have lost its state
+    (see kubernetes_event).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.summaries = {}  # ONOSService id -> {"applied": ..., "pending": ..., "failed": ...}
+
+    def open(self, path=None):
+        """
+        Open the ledger, by default the one configured in onos.ledger.path. If it can't be opened the ledger is
+        kept in memory.
+        :param path: path of the SQLite database, or ":memory:"
+        """
+        path = path or Helpers.get_onos_config("ledger", "path", None) or MEMORY
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = self._connect(path)
+            self.summaries = {}
+
+    @staticmethod
+    def _connect(path):
+        try:
+            if path != MEMORY and not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # the connection is shared by all the threads, and serialized by the lock
+            connection = sqlite3.connect(path, check_same_thread=False)
+            if path != MEMORY:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            AppliedState._create(connection)
+            log.info("Opened the ledger", path=path)
+            return connection
+        except Exception as e:
+            log.error("Failed to open the ledger, keeping it in memory", path=path, error=str(e))
+            connection = sqlite3.connect(MEMORY, check_same_thread=False)
+            AppliedState._create(connection)
+            return connection
+
+    @staticmethod
+    def _create(connection):
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            if version:
+                # the configs are pushed again, once
+                log.info("Discarding the ledger written by a previous version", version=version)
+            for table in TABLES:
+                connection.execute("DROP TABLE IF EXISTS %s" % table)
+            connection.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+
+    def _query(self, statement, args=()):
+        """
+        Must be called holding the lock
+        :return: list of rows
+        """
+        if self.connection is None:
+            self.connection = self._connect(Helpers.get_onos_config("ledger", "path", None) or MEMORY)
+        return self.connection.execute(statement, args).fetchall()
+
+    def _update(self, statement, args=()):
+        """
+        Must be called holding the lock
+        """
+        self._query(statement, args)
+        self.connection.commit()
+
+    def is_applied(self, onos_id, base_url, path, digest, model="ServiceAttribute", model_id=0):
+        """
+        :param onos_id: id of the ONOSService
+        :param base_url: url of the ONOS instance the config is pushed to
+        :param path: url the config is pushed to, relative to base_url
+        :param digest: hash of the config (see content_hash)
+        :param model: name of the model class the config comes from, ServiceAttribute or ServiceInstanceAttribute
+        :param model_id: id of the ServiceInstanceAttribute the config comes from, 0 for the ServiceAttributes
+        :return: True if the config has been applied, with the same content
+        """
+        with self.lock:
+            rows = self._query("SELECT hash, outcome FROM configs "
+                               "WHERE onos_id = ? AND endpoint = ? AND model = ? AND model_id = ? AND path = ?",
+                               (onos_id, base_url, model, model_id, path))
+        return bool(rows) and rows[0][0] == digest and rows[0][1] == APPLIED
+
+    def record(self, onos_id, base_url, path, digest, outcome, error=None, model="ServiceAttribute", model_id=0):
+        """
+        Record the outcome of a push
+        :param outcome: APPLIED or FAILED
+        :param error: why the push failed
+        """
+        with self.lock:
+            self._update("INSERT OR REPLACE INTO configs "
+                         "(onos_id, endpoint, model, model_id, path, hash, outcome, error, updated) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (onos_id, base_url, model, model_id, path, digest, outcome, error, time.time()))
+
+    def forget(self, onos_id, base_url, path, model="ServiceAttribute", model_id=0):
+        """
+        Forget a config and its subjects, eg: because it has been removed from ONOS
+        """
+        with self.lock:
+            for table in TABLES:
+                self._query("DELETE FROM %s WHERE onos_id = ? AND endpoint = ? AND model = ? AND model_id = ? "
+                            "AND path = ?" % table, (onos_id, base_url, model, model_id, path))
+            self.connection.commit()
+
+    def retain(self, onos_id, base_url, paths, model="ServiceAttribute"):
+        """
+        Forget the configs of an ONOSService that are not in paths, eg: the ServiceAttributes that have been deleted
+        """
+        paths = set(paths)
+        with self.lock:
+            for table in TABLES:
+                rows = self._query("SELECT DISTINCT path FROM %s WHERE onos_id = ? AND endpoint = ? AND model = ?"
+                                   % table, (onos_id, base_url, model))
+                for (path,) in rows:
+                    if path not in paths:
+                        self._query("DELETE FROM %s WHERE onos_id = ? AND endpoint = ? AND model = ? AND path = ?"
+                                    % table, (onos_id, base_url, model, path))
+            self.connection.commit()
+
+    def subjects(self, onos_id, base_url, path, model="ServiceAttribute", model_id=0):
+        """
+        :param path: url the config is pushed to, relative to base_url
+        :return: dict subject -> hash of the subjects of a config that have been applied
+        """
+        with self.lock:
+            rows = self._query("SELECT subject, hash FROM subjects "
+                               "WHERE onos_id = ? AND endpoint = ? AND model = ? AND model_id = ? AND path = ?",
+                               (onos_id, base_url, model, model_id, path))
+        return dict(rows)
+
+    def shared_subjects(self, onos_id, base_url, path, model="ServiceAttribute", model_id=0):
+        """
+        :param path: url the config is pushed to, relative to base_url
+        :return: set of the subjects applied on the same path by the configs of the other models
+        """
+        with self.lock:
+            rows = self._query("SELECT DISTINCT subject FROM subjects "
+                               "WHERE onos_id = ? AND endpoint = ? AND path = ? AND NOT (model = ? AND model_id = ?)",
+                               (onos_id, base_url, path, model, model_id))
+        return set(subject for (subject,) in rows)
+
+    def record_subjects(self, onos_id, base_url, path, subjects, model="ServiceAttribute", model_id=0):
+        """
+        Record the subjects of a config that are applied, replacing the ones recorded before
+        :param subjects: dict subject -> hash
+        """
+        now = time.time()
+        with self.lock:
+            self._query("DELETE FROM subjects "
+                        "WHERE onos_id = ? AND endpoint = ? AND model = ? AND model_id = ? AND path = ?",
+                        (onos_id, base_url, model, model_id, path))
+            for (subject, digest) in subjects.items():
+                self._query("INSERT INTO subjects (onos_id, endpoint, model, model_id, path, subject, hash, updated) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (onos_id, base_url, model, model_id, path, subject, digest, now))
+            self.connection.commit()
+
+    def app_version(self, onos_id, base_url, app_id):
+        """
+        :return: the version of an application installed and activated in ONOS, or None
+        """
+        with self.lock:
+            rows = self._query("SELECT version FROM apps WHERE onos_id = ? AND endpoint = ? AND app_id = ?",
+                               (onos_id, base_url, app_id))
+        return rows[0][0] if rows else None
+
+    def record_app(self, onos_id, base_url, app_id, version):
+        """
+        Record that an application is installed and active in ONOS
+        """
+        with self.lock:
+            self._update("INSERT OR REPLACE INTO apps (onos_id, endpoint, app_id, version, updated) "
+                         "VALUES (?, ?, ?, ?, ?)", (onos_id, base_url, app_id, version, time.time()))
+
+    def forget_app(self, onos_id, base_url, app_id):
+        """
+        Forget an application, eg: because it has been deactivated or uninstalled
+        """
+        with self.lock:
+            self._update("DELETE FROM apps WHERE onos_id = ? AND endpoint = ? AND app_id = ?",
+                         (onos_id, base_url, app_id))
+
+    def clear(self, onos_id=None):
+        """
+        Forget what has been applied to an ONOSService, or to all of them
+        :param onos_id: id of the ONOSService, if None everything is forgotten
+        """
+        with self.lock:
+            if onos_id is None:
+                self._query("DELETE FROM configs")
+                self._query("DELETE FROM subjects")
+                self._update("DELETE FROM apps")
+                self.summaries = {}
+                return
+            self._query("DELETE FROM configs WHERE onos_id = ?", (onos_id,))
+            self._query("DELETE FROM subjects WHERE onos_id = ?", (onos_id,))
+            self._update("DELETE FROM apps WHERE onos_id = ?", (onos_id,))
+            self.summaries.pop(onos_id, None)
+
+    def summarize(self, onos_id, base_url, desired):
+        """
+        Count the ServiceAttributes of an ONOSService that are applied, pending (never pushed, or changed since)
+        and failed
+        :param desired: dict path -> hash of the configs the ONOSService should have
+        :return: dict, also returned by summary until the next call
+        """
+        summary = {"applied": 0, "pending": 0, "failed": 0}
+        with self.lock:
+            rows = self._query("SELECT path, hash, outcome FROM configs "
+                               "WHERE onos_id = ? AND endpoint = ? AND model = 'ServiceAttribute'",
+                               (onos_id, base_url))
+            entries = dict((path, (digest, outcome)) for (path, digest, outcome) in rows)
+            for (path, digest) in desired.items():
+                entry = entries.get(path)
+                if entry is None or entry[0] != digest:
+                    summary["pending"] += 1
+                else:
+                    summary[entry[1]] += 1
+            self.summaries[onos_id] = summary
+        return summary
+
+    def summary(self, onos_id):
+        """
+        :return: the last summary of an ONOSService (see summarize), or None
+        """
+        with self.lock:
+            return self.summaries.get(onos_id)
+
+
+applied_state = AppliedState()
@@ -0,0 +1,265 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import requests
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+import onos.deadline as onos_deadline
+from onos.helpers import Helpers
+from onos.workers import KeyedLocks
+
+log = create_logger(Config().get('logging'))
+
+CHUNK_SIZE = 64 * 1024
+
+# (connect, read) timeouts in seconds, a revalidation only waits for the headers
+DOWNLOAD_TIMEOUT = (10, 60)
+REVALIDATE_TIMEOUT = (2, 5)
+
+
+class ArtifactCache(object):
+    """
+    On disk cache of the application archives (.oar) downloaded from the artifact repositories.
+
+    Archives are stored by their sha256 under <directory>/objects, while <directory>/index.json maps every url to
+    the hash of its content and to the validators (ETag, Last-Modified) returned by the artifact repository.
+    A released archive never changes, so an url that is already in the index is served from the cache without
+    contacting the repository; a new url (eg: the version of the ONOSApp changed) is downloaded. Only the SNAPSHOT
+    archives, that can be published again under the same url, are revalidated with a conditional GET, with a short
+    timeout bounded by the deadline of the sync. If the repository can't be reached the cached archive is used.
+    The content of an archive is checked against its hash the first time it is used after the synchronizer started.
+    When the cache grows beyond max_size the least recently used archives are evicted.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.objects = os.path.join(directory, "objects")
+        self.index_file = os.path.join(directory, "index.json")
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.url_locks = KeyedLocks()
+        self.http = requests.Session()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "stale": 0}
+        # the archives whose content has been checked, or downloaded, by this process
+        self.verified = set()
+
+        if not os.path.isdir(self.objects):
+            os.makedirs(self.objects)
+        self.index = self._read_index()
+
+    def _read_index(self):
+        """
+        :return: dict url -> {"sha256": ..., "etag": ..., "last_modified": ...}
+        """
+        try:
+            with open(self.index_file) as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        # the index written by the previous versions only held the hash, the archives will be revalidated
+        return dict((url, entry if isinstance(entry, dict) else {"sha256": entry}) for (url, entry) in index.items())
+
+    def _write_index(self):
+        # write and rename, so that a crash never leaves a truncated index behind
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.index, f)
+        os.rename(tmp, self.index_file)
+
+    def path(self, digest):
+        return os.path.join(self.objects, digest)
+
+    @staticmethod
+    def hash_file(path):
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def get(self, url):
+        """
+        Return the archive downloaded from url, downloading it if it is not in the cache
+        :param url: location of the .oar
+        :return: path of the archive on disk
+        """
+        with self.url_locks.get(url):
+            with self.lock:
+                cached = self.index.get(url)
+
+            if cached is not None and not self.is_intact(cached["sha256"]):
+                log.warning("Application archive in cache is corrupted, downloading it again", url=url)
+                cached = None
+
+            if cached is not None and not self.needs_revalidation(url):
+                entry = cached
+            else:
+                try:
+                    entry = self._download(url, cached)
+                except Exception as e:
+                    if cached is None:
+                        raise
+                    log.warning("Failed to revalidate application archive, using the cached one", url=url,
+                                error=str(e))
+                    with self.lock:
+                        self.stats["stale"] += 1
+                    entry = cached
+
+            if entry is cached:
+                # mark the archive as recently used
+                os.utime(self.path(entry["sha256"]), None)
+                log.debug("Application archive found in cache", url=url, sha256=entry["sha256"])
+
+            with self.lock:
+                self.stats["hits" if entry is cached else "misses"] += 1
+                self.index[url] = entry
+                self._evict(keep=entry["sha256"])
+                self._write_index()
+            return self.path(entry["sha256"])
+
+    def is_intact(self, digest):
+        """
+        An archive is hashed only the first time it is used, afterwards it is enough that it is still on disk
+        """
+        if not os.path.isfile(self.path(digest)):
+            return False
+        if digest in self.verified:
+            return True
+        if self.hash_file(self.path(digest)) != digest:
+            return False
+        with self.lock:
+            self.verified.add(digest)
+        return True
+
+    @staticmethod
+    def needs_revalidation(url):
+        """
+        :return: True if the archive can be published again under the same url
+        """
+        return "SNAPSHOT" in url
+
+    @staticmethod
+    def timeout(timeout):
+        """
+        Reduce a (connect, read) timeout to the time left to the sync
+        """
+        deadline = onos_deadline.current()
+        if deadline is None:
+            return timeout
+        deadline.check()
+        return deadline.clip(timeout)
+
+    def _download(self, url, cached=None):
+        """
+        Download an archive, unless the cached one is still current
+        :param url: location of the .oar
+        :param cached: index entry of the archive in the cache, if any
+        :return: the index entry of the archive, cached itself if it didn't change
+        """
+        headers = {}
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached is not None and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        if cached is not None and not headers:
+            log.debug("Application archive can't be revalidated, downloading it again", url=url)
+
+        timeout = self.timeout(REVALIDATE_TIMEOUT if cached is not None else DOWNLOAD_TIMEOUT)
+        response = self.http.get(url, stream=True, timeout=timeout, headers=headers)
+        if response.status_code == 304 and headers:
+            response.close()
+            return cached
+        if response.status_code != 200:
+            response.close()
+            raise Exception("Failed to download application archive %s: %s" % (url, response.status_code))
+
+        log.info("Downloading application archive", url=url)
+        sha = hashlib.sha256()
+        (fd, tmp) = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    sha.update(chunk)
+                    f.write(chunk)
+            digest = sha.hexdigest()
+            os.rename(tmp, self.path(digest))
+            with self.lock:
+                self.verified.add(digest)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        log.debug("Application archive downloaded", url=url, sha256=digest)
+        return {
+            "sha256": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    def _evict(self, keep):
+        """
+        Remove the least recently used archives until the cache fits in max_size
+        NOTE must be called with self.lock held
+        """
+        entries = []
+        for digest in os.listdir(self.objects):
+            stat = os.stat(self.path(digest))
+            entries.append((stat.st_mtime, stat.st_size, digest))
+
+        total = sum(e[1] for e in entries)
+        for (mtime, size, digest) in sorted(entries):
+            if total <= self.max_size:
+                break
+            if digest == keep:
+                continue
+            os.remove(self.path(digest))
+            total -= size
+            self.stats["evictions"] += 1
+            for url in [u for (u, e) in self.index.items() if e["sha256"] == digest]:
+                del self.index[url]
+            log.debug("Evicted application archive from cache", sha256=digest)
+
+
+class ArtifactCacheHolder(object):
+    """
+    Create the cache the first time it is needed, so that the configuration is read after the synchronizer started
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache = None
+
+    def get(self):
+        """
+        :return: ArtifactCache or None if the cache is disabled
+        """
+        if not Helpers.get_onos_config("artifacts", "enabled", False):
+            return None
+        with self.lock:
+            if self.cache is None:
+                self.cache = ArtifactCache(
+                    Helpers.get_onos_config("artifacts", "directory", "/tmp/onos-artifacts"),
+                    Helpers.get_onos_config("artifacts", "max_size_mb", 512) * 1024 * 1024)
+            return self.cache
+
+
+artifact_cache = ArtifactCacheHolder()
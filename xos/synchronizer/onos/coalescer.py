@@ -0,0 +1,105 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+log = create_logger(Config().get('logging'))
+
+
+class EventCoalescer(object):
+    """
+    Collapse bursts of events about the same key into a single action.
+
+    The first event for a key opens a window, the events received while the window is open are absorbed, and
+    the action is executed once when the window closes, using the most recent event.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.pending = {}  # key -> (threading.Timer, function to call)
+        self.stats = {
+            "received": 0,
+            "absorbed": 0,
+            "executed": 0,
+            "failed": 0,
+        }
+
+    def submit(self, key, fn, window):
+        """
+        :param key: what the event is about, eg: the name of a service
+        :param fn: action to execute for the event
+        :param window: seconds to wait for more events about the same key, if 0 fn is called right away
+        :return: True if the event opened a new window (or has been executed), False if it has been absorbed
+        """
+        with self.lock:
+            self.stats["received"] += 1
+
+            if key in self.pending:
+                self.stats["absorbed"] += 1
+                (timer, _) = self.pending[key]
+                self.pending[key] = (timer, fn)
+                log.debug("Event absorbed", coalescer=self.name, key=key, absorbed=self.stats["absorbed"])
+                return False
+
+            if window <= 0:
+                timer = None
+            else:
+                timer = threading.Timer(window, self._fire, args=(key,))
+                timer.daemon = True
+                self.pending[key] = (timer, fn)
+
+        if timer is None:
+            self._execute(key, fn)
+        else:
+            timer.start()
+        return True
+
+    def flush(self):
+        """
+        Execute all the pending actions without waiting for their windows to close
+        """
+        with self.lock:
+            keys = list(self.pending.keys())
+        for key in keys:
+            self._fire(key)
+
+    def _fire(self, key):
+        with self.lock:
+            (timer, fn) = self.pending.pop(key, (None, None))
+        if fn is None:
+            # already executed by flush
+            return
+        timer.cancel()
+        try:
+            self._execute(key, fn)
+        except Exception as e:
+            # nobody is waiting for the result
+            log.error("Failed to process event", coalescer=self.name, key=key, error=str(e))
+
+    def _execute(self, key, fn):
+        try:
+            fn()
+        except Exception:
+            with self.lock:
+                self.stats["failed"] += 1
+            raise
+
+        with self.lock:
+            self.stats["executed"] += 1
+            stats = dict(self.stats)
+        log.info("Event processed", coalescer=self.name, key=key, **stats)
@@ -0,0 +1,120 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+from xossynchronizer.steps.syncstep import DeferredException
+
+from onos.helpers import Helpers
+
+# classes of REST calls that can have their own timeouts
+OPERATIONS = ["default", "install", "activate", "netcfg"]
+
+_local = threading.local()
+
+
+class DeadlineExceeded(DeferredException):
+    pass
+
+
+def operation_timeout(operation):
+    """
+    :param operation: one of OPERATIONS
+    :return: (connect timeout, read timeout) in seconds
+    """
+    if operation not in OPERATIONS:
+        raise Exception("Unknown ONOS operation: %s" % operation)
+
+    timeouts = Helpers.get_onos_config("timeouts", operation) or Helpers.get_onos_config("timeouts", "default") or {}
+    return (timeouts.get("connect", 10), timeouts.get("read", 60))
+
+
+class Deadline(object):
+    """
+    Time budget shared by all the REST calls made to synchronize a model.
+
+    The deadline is bound to the thread doing the work (see Deadline.wrap) and ONOSSession.request reads it with
+    current(): it never waits for ONOS longer than the remaining time and raises DeadlineExceeded once the
+    deadline expired.
+    """
+
+    def __init__(self, seconds, name=None):
+        """
+        :param seconds: time budget, None or 0 for no deadline
+        :param name: what the deadline is for, used in the error messages
+        """
+        self.expires_at = time.time() + seconds if seconds else None
+        self.seconds = seconds
+        self.name = name
+
+    @staticmethod
+    def for_sync(name):
+        return Deadline(Helpers.get_onos_config("deadline", "sync", 0), name)
+
+    def remaining(self):
+        """
+        :return: seconds before the deadline expires, None if there's no deadline
+        """
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.time(), 0)
+
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("Deferring %s as it did not complete in %ss" % (self.name, self.seconds))
+
+    def clip(self, timeout):
+        """
+        Reduce a timeout, or a (connect, read) timeout, to the remaining time
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if isinstance(timeout, tuple):
+            return tuple(self.clip(t) for t in timeout)
+        # no timeout means waiting forever
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def wrap(self, fn):
+        """
+        :return: a function that calls fn with the deadline bound to the thread running it
+        """
+        def bound(*args, **kwargs):
+            previous = current()
+            _local.deadline = self
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _local.deadline = previous
+        return bound
+
+
+def current():
+    """
+    :return: the Deadline bound to the running thread, or None
+    """
+    return getattr(_local, "deadline", None)
+
+
+def propagate(fn):
+    """
+    Bind the deadline of the running thread to fn, eg: when fn is going to be called by other threads
+    """
+    deadline = current()
+    if deadline is None:
+        return fn
+    return deadline.wrap(fn)
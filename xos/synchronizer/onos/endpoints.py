@@ -0,0 +1,116 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+from requests.auth import HTTPBasicAuth
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+
+class ONOSEndpoint(object):
+    """
+    The REST endpoint of an ONOSService, resolved from the model. It can be used in place of the ONOSService model
+    to get a session (see onos.session.ONOSSessionPool.get).
+    """
+
+    def __init__(self, onos):
+        self.id = onos.id
+        self.base_url = "%s:%s" % (Helpers.format_url(onos.rest_hostname), onos.rest_port)
+        self.port = onos.rest_port
+        self.username = onos.rest_username
+        self.password = onos.rest_password
+        self.auth = HTTPBasicAuth(self.username, self.password)
+        self.resolved = time.time()
+
+    @property
+    def key(self):
+        """
+        :return: (base_url, username, password), see onos.session.ONOSSession.key_for
+        """
+        return (self.base_url, self.username, self.password)
+
+    def __repr__(self):
+        return "ONOSEndpoint(%s, %s)" % (self.id, self.base_url)
+
+
+class EndpointCache(object):
+    """
+    Resolved endpoints of the ONOSServices, keyed by the ONOSService id.
+
+    Reaching the ONOSService from an ONOSApp or from one of its attributes takes a few leaf_model hops, each of them
+    possibly a call to the XOS core. The steps resolve the endpoint once, the following synchronizations reuse it.
+    An entry is refreshed every time the ONOSService is synchronized (ie: when the model changes), and in any case
+    after ttl seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}  # ONOSService id -> ONOSEndpoint
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, onos_id, fetch):
+        """
+        Get the endpoint of an ONOSService
+        :param onos_id: id of the ONOSService
+        :param fetch: function returning the ONOSService model, called only if the endpoint is not cached
+        :return: ONOSEndpoint
+        """
+        ttl = Helpers.get_onos_config("endpoints", "ttl", 60)
+        with self.lock:
+            endpoint = self.endpoints.get(onos_id)
+            if endpoint is not None and time.time() - endpoint.resolved < ttl:
+                self.hits += 1
+                return endpoint
+            self.misses += 1
+
+        return self.update(fetch())
+
+    def update(self, onos):
+        """
+        Resolve again the endpoint of an ONOSService, eg: because the model changed
+        :param onos: ONOSService model
+        :return: ONOSEndpoint
+        """
+        endpoint = ONOSEndpoint(onos)
+        with self.lock:
+            previous = self.endpoints.get(onos.id)
+            self.endpoints[onos.id] = endpoint
+        if previous is not None and previous.key != endpoint.key:
+            log.info("ONOSService endpoint changed", onos=onos.id, previous=previous.base_url, url=endpoint.base_url)
+        return endpoint
+
+    def invalidate(self, onos_id=None):
+        """
+        Forget the endpoint of an ONOSService, or all of them
+        :param onos_id: id of the ONOSService, if None all the endpoints are forgotten
+        """
+        with self.lock:
+            if onos_id is None:
+                self.endpoints = {}
+            else:
+                self.endpoints.pop(onos_id, None)
+
+    def stats(self):
+        with self.lock:
+            return {"endpoints": len(self.endpoints), "hits": self.hits, "misses": self.misses}
+
+
+endpoint_cache = EndpointCache()
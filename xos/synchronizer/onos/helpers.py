@@ -0,0 +1,38 @@
+# Copyright 2017-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from xossynchronizer.modelaccessor import Service
+from xosconfig import Config
+
+
+class Helpers():
+    @staticmethod
+    def format_url(url):
+        if 'http' in url:
+            return url
+        else:
+            return 'http://%s' % url
+
+    @staticmethod
+    def get_onos_config(section, key, default=None):
+        """
+        Read an ONOS specific tunable from the synchronizer config
+        :param section: name of the section in the "onos" config map (eg: sessions)
+        :param key: name of the option in that section
+        :param default: value to use if the option is not configured
+        :return: the configured value or the default
+        """
+        # NOTE Config.get returns None for falsy values, so read the whole section
+        values = Config.get("onos.%s" % section) or {}
+        return values.get(key, default)
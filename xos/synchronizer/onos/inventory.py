@@ -0,0 +1,166 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+log = create_logger(Config().get('logging'))
+
+
+class ApplicationInventory(object):
+    """
+    Snapshot of the applications installed in each ONOS instance.
+
+    The snapshot is read with a single GET /onos/v1/applications per ONOS instance and it is shared by all the
+    SyncONOSApp steps running in the same sync cycle. Every time the synchronizer changes the state of an
+    application in ONOS it has to invalidate the corresponding entry, that is then refreshed on its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshots = {}  # base_url -> {app_id: {"state": ..., "version": ...}}
+        self.stale = {}  # base_url -> set of app_ids that need to be read again
+        self.fetch_locks = {}  # base_url -> lock held while reading from ONOS
+
+    def new_cycle(self):
+        """
+        Forget all the snapshots, they'll be read again the first time they are needed
+        """
+        with self.lock:
+            self.snapshots = {}
+            self.stale = {}
+
+    def invalidate(self, session, app_id=None):
+        """
+        Invalidate the information about an application, or about all the applications of an ONOS instance
+        :param session: ONOSSession towards the ONOS instance
+        :param app_id: application identifier, if None the whole snapshot is discarded
+        """
+        with self.lock:
+            if app_id is None:
+                self.snapshots.pop(session.base_url, None)
+                self.stale.pop(session.base_url, None)
+            elif session.base_url in self.snapshots:
+                self.snapshots[session.base_url].pop(app_id, None)
+                self.stale[session.base_url].add(app_id)
+
+    def get(self, session, app_id):
+        """
+        Read the state of an application
+        :param session: ONOSSession towards the ONOS instance
+        :param app_id: application identifier
+        :return: dict containing "state" and "version" or None if the application is not installed
+        """
+        with self._fetch_lock(session):
+            snapshot = self._get_snapshot(session)
+
+            for stale_id in self._take_stale(session, [app_id]):
+                self._refresh(session, snapshot, stale_id)
+
+            with self.lock:
+                return snapshot.get(app_id)
+
+    def snapshot(self, session):
+        """
+        Read the state of all the applications
+        :param session: ONOSSession towards the ONOS instance
+        :return: dict app_id -> {"state": ..., "version": ...}
+        """
+        with self._fetch_lock(session):
+            snapshot = self._get_snapshot(session)
+
+            for stale_id in self._take_stale(session):
+                self._refresh(session, snapshot, stale_id)
+
+            with self.lock:
+                return dict((app_id, state) for (app_id, state) in snapshot.items() if state is not None)
+
+    def _take_stale(self, session, app_ids=None):
+        """
+        The stale entries are shared with new_cycle and invalidate, that may be called by other threads
+        (eg: a new sync cycle starting while the cohorts of another ONOS instance are still reading)
+        :param app_ids: the applications the caller is interested in, if None all of them
+        :return: the applications that have to be read again, they are not stale anymore
+        """
+        with self.lock:
+            stale = self.stale.get(session.base_url, set())
+            taken = set(stale) if app_ids is None else stale & set(app_ids)
+            stale -= taken
+            return sorted(taken)
+
+    def _refresh(self, session, snapshot, app_id):
+        try:
+            state = self._read_app(session, app_id)
+        except Exception:
+            with self.lock:
+                if session.base_url in self.stale:
+                    # read it again next time
+                    self.stale[session.base_url].add(app_id)
+            raise
+        with self.lock:
+            snapshot[app_id] = state
+
+    def _fetch_lock(self, session):
+        with self.lock:
+            if session.base_url not in self.fetch_locks:
+                self.fetch_locks[session.base_url] = threading.Lock()
+            return self.fetch_locks[session.base_url]
+
+    def _get_snapshot(self, session):
+        with self.lock:
+            snapshot = self.snapshots.get(session.base_url)
+        if snapshot is not None:
+            return snapshot
+
+        url = '%s/onos/v1/applications' % session.base_url
+        request = session.get(url)
+
+        if request.status_code != 200:
+            log.error("Request failed", response=request.text)
+            raise Exception("Failed to read applications %s from ONOS: %s" % (url, request.text))
+
+        snapshot = {}
+        for app in request.json().get("applications", []):
+            snapshot[app["name"]] = self._app_state(app)
+
+        log.debug("Read applications from ONOS", url=session.base_url, apps=len(snapshot))
+
+        with self.lock:
+            self.snapshots[session.base_url] = snapshot
+            self.stale[session.base_url] = set()
+        return snapshot
+
+    def _read_app(self, session, app_id):
+        url = '%s/onos/v1/applications/%s' % (session.base_url, app_id)
+        request = session.get(url)
+
+        if request.status_code == 404:
+            # app is not installed at all
+            return None
+        if request.status_code != 200:
+            log.error("Request failed", response=request.text)
+            raise Exception("Failed to read application %s from ONOS: %s" % (url, request.text))
+        return self._app_state(request.json())
+
+    @staticmethod
+    def _app_state(app):
+        return {
+            "state": app.get("state"),
+            "version": app.get("version")
+        }
+
+
+app_inventory = ApplicationInventory()
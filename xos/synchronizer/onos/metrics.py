@@ -0,0 +1,248 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+import functools
+import BaseHTTPServer
+import SocketServer
+from xossynchronizer.steps.syncstep import DeferredException
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+# seconds, from a cached GET to the installation of a large application
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = zip(names, values) + (extra or [])
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, escape(value)) for (name, value) in pairs)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}  # label values -> count
+
+    def inc(self, values, amount=1):
+        self.values[values] = self.values.get(values, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s counter" % self.name]
+        for (values, count) in sorted(self.values.items()):
+            lines.append("%s%s %s" % (self.name, format_labels(self.labels, values), format_value(count)))
+        return lines
+
+
+class Histogram(object):
+
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = list(buckets) + [float("inf")]
+        self.values = {}  # label values -> [count per bucket, sum, count]
+
+    def observe(self, values, amount):
+        if values not in self.values:
+            self.values[values] = [[0] * len(self.buckets), 0.0, 0]
+        series = self.values[values]
+        for (i, bound) in enumerate(self.buckets):
+            if amount <= bound:
+                series[0][i] += 1
+                break
+        series[1] += amount
+        series[2] += 1
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s histogram" % self.name]
+        for (values, (counts, total, count)) in sorted(self.values.items()):
+            cumulative = 0
+            for (bound, bucket_count) in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append("%s_bucket%s %s" % (self.name,
+                                                 format_labels(self.labels, values, [("le", format_value(bound))]),
+                                                 cumulative))
+            lines.append("%s_sum%s %s" % (self.name, format_labels(self.labels, values), format_value(total)))
+            lines.append("%s_count%s %s" % (self.name, format_labels(self.labels, values), count))
+        return lines
+
+
+class Metrics(object):
+    """
+    Latency and outcome of the REST calls towards ONOS and of the synchronization of the models,
+    exposed in the Prometheus text format by a local HTTP endpoint (see Metrics.start)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.server = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter("onos_requests_total", "REST calls towards ONOS",
+                                    ["endpoint", "operation", "method", "status"])
+            self.request_latency = Histogram("onos_request_duration_seconds", "Latency of the REST calls towards ONOS",
+                                             ["endpoint", "operation", "method"])
+            self.syncs = Counter("onos_syncs_total", "Synchronizations of the models",
+                                 ["model", "action", "outcome"])
+            self.sync_latency = Histogram("onos_sync_duration_seconds", "Duration of the synchronizations",
+                                          ["model", "action"])
+
+    def observe_request(self, endpoint, operation, method, result, latency):
+        """
+        :param endpoint: base url of the ONOS instance
+        :param operation: class of the call (see onos.deadline.OPERATIONS)
+        :param method: HTTP method
+        :param result: requests.Response or the exception raised by the call
+        :param latency: seconds
+        """
+        if isinstance(result, Exception):
+            status = type(result).__name__
+        else:
+            status = result.status_code
+        with self.lock:
+            self.requests.inc((endpoint, operation, method, status))
+            self.request_latency.observe((endpoint, operation, method), latency)
+        self.start()
+
+    def observe_sync(self, model, action, outcome, latency):
+        """
+        :param model: name of the model class, eg: ONOSApp
+        :param action: "sync" or "delete"
+        :param outcome: "success", "deferred" or "failure"
+        :param latency: seconds
+        """
+        with self.lock:
+            self.syncs.inc((model, action, outcome))
+            self.sync_latency.observe((model, action), latency)
+        self.start()
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in [self.requests, self.request_latency, self.syncs, self.sync_latency]:
+                lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """
+        Start the metrics endpoint, if it is enabled and it is not running yet
+        """
+        if self.server is not None or not Helpers.get_onos_config("metrics", "enabled", False):
+            return
+
+        with self.lock:
+            if self.server is not None:
+                return
+            address = Helpers.get_onos_config("metrics", "address", "127.0.0.1")
+            port = Helpers.get_onos_config("metrics", "port", 9101)
+            try:
+                self.server = MetricsServer((address, port), self)
+            except Exception as e:
+                # don't try again at every call
+                self.server = False
+                log.error("Failed to start the metrics endpoint", address=address, port=port, error=str(e))
+                return
+
+        thread = threading.Thread(target=self.server.serve_forever, name="onos-metrics")
+        thread.daemon = True
+        thread.start()
+        log.info("Metrics endpoint started", address=address, port=self.server.server_address[1])
+
+    def stop(self):
+        with self.lock:
+            server = self.server
+            self.server = None
+        if server:
+            server.shutdown()
+            server.server_close()
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, metrics):
+        BaseHTTPServer.HTTPServer.__init__(self, address, MetricsHandler)
+        self.metrics = metrics
+
+
+metrics = Metrics()
+
+
+def model_name(o):
+    return getattr(o, "leaf_model_name", type(o).__name__)
+
+
+def instrument_sync(action):
+    """
+    Decorate SyncStep.sync_record or SyncStep.delete_record to count the synchronizations and their outcome
+    :param action: "sync" or "delete"
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def instrumented(self, o):
+            started = time.time()
+            outcome = "failure"
+            try:
+                result = fn(self, o)
+                outcome = "success"
+                return result
+            except DeferredException:
+                outcome = "deferred"
+                raise
+            finally:
+                metrics.observe_sync(model_name(o), action, outcome, time.time() - started)
+        return instrumented
+    return decorator
@@ -0,0 +1,109 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import urllib
+
+NETCFG_PATH = "onos/v1/network/configuration"
+
+# the configurations are applied by ONOS subject by subject: subject class, subject and config key
+SUBJECT_DEPTH = 3
+
+
+def netcfg_keys(path):
+    """
+    Locate a configuration in the network configuration tree of ONOS
+    :param path: url the configuration is pushed to, eg: /onos/v1/network/configuration/apps/org.opencord.olt
+    :return: the keys leading to the configuration, eg: ["apps", "org.opencord.olt"], or None if the url is not
+             part of the network configuration API
+    """
+    path = path.strip("/")
+    if path != NETCFG_PATH and not path.startswith(NETCFG_PATH + "/"):
+        return None
+    return [k for k in path[len(NETCFG_PATH):].split("/") if k]
+
+
+def split_subjects(keys, value):
+    """
+    Split a configuration in the units ONOS applies on their own, one for each config key of each subject
+    :param keys: location of the configuration in the network configuration tree (see netcfg_keys)
+    :param value: the configuration
+    :return: dict subject -> config, where subject is the url of the unit relative to NETCFG_PATH,
+             eg: "devices/of%3A0001/basic", or None if the configuration is not above the subjects
+    """
+    if len(keys) >= SUBJECT_DEPTH:
+        return None
+
+    subjects = {}
+    pending = [(keys, value)]
+    while pending:
+        (current_keys, current) = pending.pop()
+        if len(current_keys) == SUBJECT_DEPTH:
+            # the subject keys may contain slashes, eg: the ports
+            subjects["/".join(urllib.quote(k, safe=":") for k in current_keys)] = current
+            continue
+        if not isinstance(current, dict):
+            return None
+        for (k, v) in current.items():
+            pending.append((current_keys + [k], v))
+    return subjects
+
+
+def _compatible(current, value):
+    if isinstance(current, dict) and isinstance(value, dict):
+        return all(k not in current or _compatible(current[k], v) for (k, v) in value.items())
+    return current == value
+
+
+def _merge(current, value):
+    for (k, v) in value.items():
+        if isinstance(v, dict) and isinstance(current.get(k), dict):
+            _merge(current[k], v)
+        else:
+            current[k] = copy.deepcopy(v)
+
+
+def merge(document, keys, value):
+    """
+    Deep merge a configuration in a network configuration document
+    :param document: dict, the network configuration document, updated in place
+    :param keys: location of the configuration in the document (see netcfg_keys)
+    :param value: the configuration
+    :return: False, leaving the document untouched, if the configuration conflicts with what is already in it
+    """
+    current = document
+    for key in keys:
+        if not isinstance(current, dict):
+            return False
+        if key not in current:
+            break
+        current = current[key]
+    else:
+        if not _compatible(current, value):
+            return False
+
+    if not keys:
+        if not isinstance(value, dict):
+            return False
+        _merge(document, value)
+        return True
+
+    parent = document
+    for key in keys[:-1]:
+        parent = parent.setdefault(key, {})
+    if isinstance(value, dict) and isinstance(parent.get(keys[-1]), dict):
+        _merge(parent[keys[-1]], value)
+    else:
+        parent[keys[-1]] = copy.deepcopy(value)
+    return True
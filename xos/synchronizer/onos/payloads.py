@@ -0,0 +1,116 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import hashlib
+import threading
+import collections
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.applied import content_hash
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+# the payloads are sent as they are stored in the models
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class Payload(object):
+    """
+    The JSON config of an attribute, validated
+    """
+
+    def __init__(self, raw, sha):
+        self.raw = raw
+        self.sha = sha
+        self.value = None
+        self.error = None
+        try:
+            # shared by all the synchronizations of the attribute, never modify it
+            self.value = json.loads(raw)
+            self.digest = content_hash(self.value)
+        except ValueError as e:
+            self.error = str(e)
+            self.digest = sha
+
+    def post_kwargs(self):
+        """
+        :return: the arguments of ONOSSession.post sending the payload as it is
+        """
+        return {"data": self.raw, "headers": JSON_HEADERS}
+
+
+class PayloadCache(object):
+    """
+    Configs of the ServiceAttributes and ServiceInstanceAttributes, parsed and validated once.
+
+    Every retry of a synchronization would otherwise parse the config again (and encode it again to send it to ONOS),
+    which is expensive for the large network configurations. The cache keeps, for every attribute, the payload of its
+    current content: the raw bytes, sent to ONOS as they are, the decoded config and its hash (see
+    onos.applied.content_hash). A malformed config is rejected once, the following retries get the same error.
+    At most max_entries attributes are kept, the least recently used are evicted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.payloads = collections.OrderedDict()  # key -> Payload
+        self.stats = {"hits": 0, "misses": 0, "invalid": 0}
+
+    def get(self, key, value):
+        """
+        :param key: identifies the attribute, eg: ("ServiceInstanceAttribute", id)
+        :param value: the JSON config, as stored in the model
+        :return: Payload, check its error before using it
+        """
+        raw = value.encode("utf-8") if isinstance(value, unicode) else value
+        sha = hashlib.sha256(raw).hexdigest()
+
+        with self.lock:
+            payload = self.payloads.pop(key, None)
+            if payload is not None and payload.sha == sha:
+                self.payloads[key] = payload
+                self.stats["hits"] += 1
+                return payload
+
+        payload = Payload(raw, sha)
+        if payload.error:
+            log.warning("Invalid JSON config", key=key, error=payload.error)
+
+        max_entries = Helpers.get_onos_config("payloads", "max_entries", 1000)
+        with self.lock:
+            self.stats["misses"] += 1
+            if payload.error:
+                self.stats["invalid"] += 1
+            self.payloads[key] = payload
+            while len(self.payloads) > max_entries:
+                self.payloads.popitem(last=False)
+        return payload
+
+    def forget(self, key):
+        """
+        Forget the payload of an attribute, eg: because it has been deleted
+        """
+        with self.lock:
+            self.payloads.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.payloads = collections.OrderedDict()
+            self.stats = {"hits": 0, "misses": 0, "invalid": 0}
+
+
+payload_cache = PayloadCache()
@@ -0,0 +1,129 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from xossynchronizer.modelaccessor import ServiceAttribute
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.session import session_pool
+from onos.inventory import app_inventory
+from onos.netcfg import NETCFG_PATH, netcfg_keys
+
+log = create_logger(Config().get('logging'))
+
+
+def contains(actual, desired):
+    """
+    Check that a configuration read from ONOS contains the desired one, ONOS may add fields on its own
+    """
+    if isinstance(desired, dict):
+        if not isinstance(actual, dict):
+            return False
+        return all(k in actual and contains(actual[k], v) for (k, v) in desired.items())
+    return actual == desired
+
+
+class StateProbe(object):
+    """
+    Compare the state of an ONOS instance with the desired state described by the XOS models.
+    The application inventory and the network configuration are read from ONOS only once per probe.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.netcfg = None
+
+    def read_netcfg(self):
+        if self.netcfg is None:
+            url = '%s/%s' % (self.session.base_url, NETCFG_PATH)
+            request = self.session.get(url)
+
+            if request.status_code != 200:
+                log.error("Request failed", response=request.text)
+                raise Exception("Failed to read network configuration from ONOS: %s" % request.text)
+            self.netcfg = request.json()
+        return self.netcfg
+
+    def app_diverged(self, app):
+        """
+        :param app: ONOSApp model
+        :return: the reason why the application is not in the desired state, or None
+        """
+        state = app_inventory.get(self.session, app.app_id)
+        if state is None:
+            return "not installed"
+        if state["state"] != "ACTIVE":
+            return "not active"
+        if app.url and app.version and state["version"] != app.version:
+            return "version %s installed, %s requested" % (state["version"], app.version)
+        return None
+
+    def config_diverged(self, path, value):
+        """
+        :param path: url the configuration is pushed to, eg: /onos/v1/network/configuration/apps/org.opencord.olt
+        :param value: the configuration, as a JSON string
+        :return: the reason why the configuration is not in the desired state, or None
+        """
+        keys = netcfg_keys(path)
+        if keys is None:
+            return "not a network configuration"
+
+        current = self.read_netcfg()
+        for key in keys:
+            if not isinstance(current, dict) or key not in current:
+                return "missing"
+            current = current[key]
+
+        desired = json.loads(value) if isinstance(value, basestring) else value
+        if not contains(current, desired):
+            return "different"
+        return None
+
+    @staticmethod
+    def diverged_models(onos, apps, attrs):
+        """
+        Find the models that are not in the desired state in an ONOS instance
+        :param onos: ONOSService model
+        :param apps: ONOSApp models of the ONOSService, not their ServiceInstance base models
+        :param attrs: ServiceInstanceAttribute models of the ONOSApps
+        :return: list of (model, reason)
+        """
+        session = session_pool.get(onos)
+        # the state of ONOS is probably changed, don't trust what has been read before
+        app_inventory.invalidate(session)
+        probe = StateProbe(session)
+
+        diverged = []
+        for attr in ServiceAttribute.objects.filter(service_id=onos.id):
+            reason = probe.config_diverged(attr.name, attr.value)
+            if reason:
+                # the configurations of the service are pushed all together by SyncONOSService
+                diverged.append((onos, "%s: %s" % (attr.name, reason)))
+                break
+
+        for app in apps:
+            reason = probe.app_diverged(app)
+            if reason:
+                diverged.append((app, reason))
+
+        for attr in attrs:
+            reason = probe.config_diverged(attr.name, attr.value)
+            if reason:
+                diverged.append((attr, reason))
+
+        for (model, reason) in diverged:
+            log.info("Model diverged from ONOS", model=model, reason=reason)
+        return diverged
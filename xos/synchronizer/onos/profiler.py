@@ -0,0 +1,254 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import collections
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+# where the time of a synchronization goes, recognized by the path of the module running the code
+CATEGORIES = collections.OrderedDict([
+    ("orm", ["xosapi", "modelaccessor", "grpc"]),
+    ("http", ["requests", "urllib3", "httplib", "socket.py", "ssl.py", "twisted"]),
+    ("json", ["json"]),
+    ("logging", ["multistructlog", "structlog", "logging"]),
+])
+
+_local = threading.local()
+
+
+def categorize(function):
+    """
+    :param function: (filename, line, name) as found in pstats
+    :return: the category the function belongs to, or None
+    """
+    filename = function[0].replace("\\", "/")
+    for (category, patterns) in CATEGORIES.items():
+        for pattern in patterns:
+            if "/%s" % pattern in filename:
+                return category
+    return None
+
+
+def breakdown(stats):
+    """
+    Time spent in each category: the time spent in the functions of the category itself (not in the functions
+    they call), plus the time of the builtins they call directly, eg: reading from a socket or the C JSON encoder.
+    The categories never overlap.
+    :param stats: pstats.Stats
+    :return: dict category -> seconds
+    """
+    times = dict((category, 0.0) for category in CATEGORIES)
+    for (function, (_, _, own_time, _, callers)) in stats.stats.items():
+        category = categorize(function)
+        if category is not None:
+            times[category] += own_time
+        elif function[0] == "~":
+            for (caller, caller_stats) in callers.items():
+                caller_category = categorize(caller)
+                if caller_category is not None:
+                    times[caller_category] += caller_stats[2]
+    return times
+
+
+class ProfiledCall(object):
+    """
+    A profiled sync_record or delete_record. The work can continue in other threads (eg: run_concurrently),
+    each of them profiles its own part (see Profiler.propagate).
+    """
+
+    def __init__(self, step, model, action, id):
+        self.step = step
+        self.model = model
+        self.action = action
+        self.id = id
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.done = False
+
+    def add(self, profile):
+        with self.lock:
+            if not self.done:
+                # the work that outlives the call is not accounted
+                self.profiles.append(profile)
+
+    def finish(self):
+        with self.lock:
+            self.done = True
+            return list(self.profiles)
+
+
+class Profiler(object):
+    """
+    Opt-in profiling of the sync steps. When enabled every sync_record and delete_record runs under cProfile:
+    the stats are aggregated by step and model class, and a breakdown of the time of every call is kept.
+    Everything is periodically written to disk.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.aggregates = {}  # (step, model) -> pstats.Stats
+            self.calls = collections.deque(maxlen=Helpers.get_onos_config("profiling", "max_calls", 1000))
+            self.last_dump = time.time()
+
+    @staticmethod
+    def enabled():
+        return Helpers.get_onos_config("profiling", "enabled", False)
+
+    @staticmethod
+    def current():
+        """
+        :return: the ProfiledCall the running thread is working for, or None
+        """
+        return getattr(_local, "call", None)
+
+    def run(self, call, fn):
+        """
+        Call fn, profiling the running thread on behalf of call
+        """
+        if getattr(_local, "profiling", False):
+            # the thread is already profiled, eg: run_concurrently calling fn in the same thread
+            return fn()
+
+        previous = self.current()
+        _local.call = call
+        _local.profiling = True
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn()
+        finally:
+            profile.disable()
+            _local.profiling = False
+            _local.call = previous
+            call.add(profile)
+
+    def propagate(self, fn):
+        """
+        Profile fn on behalf of the call the running thread is working for, eg: when fn is going to be called by
+        other threads. When the profiler is disabled fn is returned as is.
+        """
+        call = self.current()
+        if call is None:
+            return fn
+
+        def profiled(*args, **kwargs):
+            return self.run(call, lambda: fn(*args, **kwargs))
+        return profiled
+
+    def record(self, call, wall, cpu):
+        """
+        Aggregate the stats of a call that completed
+        :param wall: seconds the call lasted
+        :param cpu: CPU seconds used by the synchronizer process during the call
+        """
+        profiles = call.finish()
+        if not profiles:
+            return
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+
+        entry = {
+            "step": call.step,
+            "model": call.model,
+            "action": call.action,
+            "id": call.id,
+            "started": time.time() - wall,
+            "wall": wall,
+            "cpu": cpu,
+        }
+        entry.update(breakdown(stats))
+
+        with self.lock:
+            key = (call.step, call.model)
+            if key in self.aggregates:
+                self.aggregates[key].add(stats)
+            else:
+                self.aggregates[key] = stats
+            self.calls.append(entry)
+
+            interval = Helpers.get_onos_config("profiling", "dump_interval", 60)
+            dump = time.time() - self.last_dump >= interval
+            if dump:
+                self.last_dump = time.time()
+
+        if dump:
+            self.dump()
+
+    def dump(self, directory=None):
+        """
+        Write the aggregated stats, one <step>.<model>.prof file for each step and model class (they can be read
+        with the pstats module), and the breakdown of the recent calls in calls.json
+        """
+        directory = directory or Helpers.get_onos_config("profiling", "directory", "/tmp/onos-profiles")
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            with self.lock:
+                for ((step, model), stats) in self.aggregates.items():
+                    stats.dump_stats(os.path.join(directory, "%s.%s.prof" % (step, model)))
+                calls = list(self.calls)
+
+            path = os.path.join(directory, "calls.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(calls, f, indent=2)
+            os.rename(path + ".tmp", path)
+        except Exception as e:
+            log.error("Failed to write profiling data", directory=directory, error=str(e))
+            return
+        log.info("Profiling data written", directory=directory, profiles=len(self.aggregates), calls=len(calls))
+
+
+profiler = Profiler()
+
+
+def profile_sync(action):
+    """
+    Decorate SyncStep.sync_record or SyncStep.delete_record to profile it when the profiling is enabled
+    :param action: "sync" or "delete"
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def profiled(self, o):
+            if not profiler.enabled():
+                return fn(self, o)
+
+            call = ProfiledCall(type(self).__name__, getattr(o, "leaf_model_name", type(o).__name__), action,
+                                getattr(o, "id", None))
+            started = time.time()
+            cpu = time.clock()
+            try:
+                return profiler.run(call, lambda: fn(self, o))
+            finally:
+                profiler.record(call, time.time() - started, time.clock() - cpu)
+        return profiled
+    return decorator
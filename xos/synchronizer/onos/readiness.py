@@ -0,0 +1,174 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import random
+import threading
+from xossynchronizer.steps.syncstep import DeferredException
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+
+class ReadinessGate(object):
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.ready = True
+        self.closed_at = None
+        self.attempts = 0
+        self.next_probe = 0
+        self.probing = False
+        self.expired = False
+
+
+class ReadinessGates(object):
+    """
+    A gate for every ONOS endpoint, closed when ONOS is (re)starting and opened as soon as its REST API answers.
+
+    While the gate is closed the work directed to that ONOS is deferred, and the REST API is probed with
+    exponential backoff (with jitter), so that a restarting ONOS is not flooded with requests that are going to fail.
+    After max_wait seconds the gate is opened anyway, and the sync steps report their errors as usual.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.gates = {}  # base_url -> ReadinessGate
+            self.stats = {"closed": 0, "probes": 0, "failed_probes": 0, "deferred": 0, "expired": 0}
+
+    def get(self, session):
+        with self.lock:
+            if session.base_url not in self.gates:
+                self.gates[session.base_url] = ReadinessGate(session.base_url)
+            return self.gates[session.base_url]
+
+    def close(self, session):
+        """
+        Hold the work directed to an ONOS instance until it is ready, eg: because it is restarting
+        :param session: ONOSSession towards the ONOS instance
+        """
+        gate = self.get(session)
+        with self.lock:
+            if not gate.ready:
+                return
+            gate.ready = False
+            gate.expired = False
+            gate.closed_at = time.time()
+            gate.attempts = 0
+            gate.next_probe = gate.closed_at
+            self.stats["closed"] += 1
+        log.info("Waiting for ONOS to be ready", url=session.base_url)
+
+    def check(self, session):
+        """
+        Raise DeferredException if the ONOS instance is not ready yet, never waits longer than a probe
+        :param session: ONOSSession towards the ONOS instance
+        """
+        if not self.is_ready(session):
+            with self.lock:
+                self.stats["deferred"] += 1
+            raise DeferredException("Deferring synchronization as ONOS %s is not ready yet" % session.base_url)
+
+    def wait_ready(self, session):
+        """
+        Block until the ONOS instance is ready, or the gate expires
+        :param session: ONOSSession towards the ONOS instance
+        :return: True if ONOS is ready, False if the gate expired
+        """
+        gate = self.get(session)
+        while not self.is_ready(session):
+            with self.lock:
+                delay = gate.next_probe - time.time()
+            time.sleep(min(max(delay, 0.1), 1))
+        return not gate.expired
+
+    def is_ready(self, session):
+        gate = self.get(session)
+        now = time.time()
+
+        with self.lock:
+            if gate.ready:
+                return True
+
+            max_wait = Helpers.get_onos_config("readiness", "max_wait", 300)
+            if now - gate.closed_at > max_wait:
+                log.warning("ONOS is not ready, giving up waiting", url=session.base_url, max_wait=max_wait)
+                self._open(gate, expired=True)
+                return True
+
+            if gate.probing or now < gate.next_probe:
+                return False
+
+            # only one thread probes ONOS, the others are deferred
+            gate.probing = True
+            gate.attempts += 1
+            self.stats["probes"] += 1
+
+        ready = self._probe(session)
+
+        with self.lock:
+            gate.probing = False
+            if ready:
+                log.info("ONOS is ready", url=session.base_url, attempts=gate.attempts,
+                         waited=now - gate.closed_at)
+                self._open(gate)
+                return True
+
+            self.stats["failed_probes"] += 1
+            gate.next_probe = time.time() + self.backoff(gate.attempts)
+            return False
+
+    def _open(self, gate, expired=False):
+        gate.ready = True
+        gate.expired = expired
+        if expired:
+            self.stats["expired"] += 1
+
+    @staticmethod
+    def backoff(attempts):
+        """
+        Exponential backoff with jitter: the delay is doubled after every failed probe, up to max_backoff,
+        and then randomized so that the probes towards different ONOS instances don't happen at the same time
+        """
+        initial = Helpers.get_onos_config("readiness", "initial_backoff", 1)
+        maximum = Helpers.get_onos_config("readiness", "max_backoff", 30)
+        delay = min(initial * (2 ** (attempts - 1)), maximum)
+        return delay / 2.0 + random.uniform(0, delay / 2.0)
+
+    @staticmethod
+    def _probe(session):
+        url = '%s%s' % (session.base_url, Helpers.get_onos_config("readiness", "probe_path", "/onos/v1/cluster"))
+        try:
+            # the probe is not retried, and it is not held by the circuit breaker
+            request = session.get(url, timeout=Helpers.get_onos_config("readiness", "probe_timeout", 5), retry=False)
+        except Exception as e:
+            log.debug("ONOS is not ready", url=session.base_url, error=str(e))
+            return False
+        if request.status_code != 200:
+            log.debug("ONOS is not ready", url=session.base_url, status_code=request.status_code)
+            return False
+        # ONOS is serving again, there's no reason to wait for the circuit to be half-open
+        session.breaker.record(True)
+        return True
+
+
+readiness_gates = ReadinessGates()
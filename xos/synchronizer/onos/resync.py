@@ -0,0 +1,58 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from xossynchronizer.modelaccessor import ONOSApp, ServiceInstanceAttribute
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.workers import run_concurrently
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+
+def service_models(service):
+    """
+    Read the models pushed to an ONOS instance through its ONOSApps
+    :param service: ONOSService model
+    :return: (list of ONOSApp, list of ServiceInstanceAttribute)
+    """
+    # service_instances would return the ServiceInstance base models, without the ONOSApp fields
+    apps = list(ONOSApp.objects.filter(owner_id=service.id))
+    if not apps:
+        return (apps, [])
+
+    # the core can't filter on a list of ids, the attributes are read with a single range query on the ids of the
+    # apps, then the ones of the other ServiceInstances in that range are discarded
+    ids = set(app.id for app in apps)
+    attrs = ServiceInstanceAttribute.objects.filter(service_instance_id__gte=min(ids),
+                                                    service_instance_id__lte=max(ids))
+    return (apps, [a for a in attrs if a.service_instance_id in ids])
+
+
+def dirty(models, status):
+    """
+    Reset the backend status of the models, so that the sync steps push them again
+    :param models: list of models
+    :param status: backend_status explaining why the models are synchronized again
+    """
+    def save(model):
+        model.backend_code = 0
+        model.backend_status = status
+        model.save(update_fields=["updated", "backend_code", "backend_status"], always_update_timestamp=True)
+
+    # the core has no bulk update, the saves are sent as a batch of concurrent calls
+    errors = run_concurrently(save, models, Helpers.get_onos_config("events", "workers", 4))
+    for (model, e) in errors:
+        log.error("Failed to dirty model", model=model, error=str(e))
@@ -0,0 +1,154 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+import requests
+from xossynchronizer.steps.syncstep import DeferredException
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+SUCCESS = "success"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+# ONOS is overloaded, restarting or behind a proxy that can't reach it
+RETRYABLE_STATUS_CODES = [429, 500, 502, 503, 504]
+
+
+def classify(result):
+    """
+    Classify the outcome of a REST call towards ONOS
+    :param result: requests.Response or the exception raised by the call
+    :return: SUCCESS, RETRYABLE (the same call may succeed later) or FATAL (the call is wrong, don't retry it)
+    """
+    if isinstance(result, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return RETRYABLE
+    if isinstance(result, Exception):
+        return FATAL
+    if result.status_code in RETRYABLE_STATUS_CODES:
+        return RETRYABLE
+    if 400 <= result.status_code < 500 and result.status_code not in [404, 409]:
+        # 404 and 409 are expected answers (eg: application not installed, already installed)
+        return FATAL
+    return SUCCESS
+
+
+class CircuitOpenException(DeferredException):
+    pass
+
+
+class RetryPolicy(object):
+    """
+    How many times a retryable call is attempted, and how long to wait between the attempts
+    """
+
+    def __init__(self, max_attempts=1, initial_backoff=0.5, max_backoff=5):
+        self.max_attempts = max(max_attempts, 1)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+    @staticmethod
+    def from_config():
+        return RetryPolicy(
+            max_attempts=Helpers.get_onos_config("retry", "max_attempts", 1),
+            initial_backoff=Helpers.get_onos_config("retry", "initial_backoff", 0.5),
+            max_backoff=Helpers.get_onos_config("retry", "max_backoff", 5))
+
+    def backoff(self, attempt):
+        """
+        Capped exponential backoff
+        :param attempt: number of the attempt that failed, starting from 1
+        :return: seconds to wait before the next attempt
+        """
+        return min(self.initial_backoff * (2 ** (attempt - 1)), self.max_backoff)
+
+
+class CircuitBreaker(object):
+    """
+    Stop calling an ONOS instance that is failing.
+
+    After failure_threshold consecutive retryable failures the circuit opens and all the calls fail fast with
+    CircuitOpenException, that defers the models. After reset_timeout seconds the circuit is half-open: a single
+    call is let through, if it succeeds the circuit closes, otherwise it opens again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self):
+        """
+        Raise CircuitOpenException if the call should not be attempted
+        """
+        threshold = Helpers.get_onos_config("circuit", "failure_threshold", 0)
+        if threshold <= 0:
+            return
+
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at >= Helpers.get_onos_config("circuit", "reset_timeout", 30):
+                    log.info("Circuit half-open, trying ONOS again", url=self.name)
+                    self.state = self.HALF_OPEN
+                    self.trial_in_flight = False
+
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+
+            self.stats["rejected"] += 1
+        raise CircuitOpenException("Deferring synchronization as ONOS %s is failing, circuit is %s" %
+                                   (self.name, self.state))
+
+    def record(self, success):
+        """
+        Record the outcome of a call
+        :param success: False if the call failed in a retryable way
+        """
+        threshold = Helpers.get_onos_config("circuit", "failure_threshold", 0)
+        if threshold <= 0:
+            return
+
+        with self.lock:
+            if success:
+                if self.state != self.CLOSED:
+                    log.info("Circuit closed, ONOS is answering again", url=self.name)
+                self.state = self.CLOSED
+                self.failures = 0
+                self.trial_in_flight = False
+                return
+
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= threshold):
+                log.warning("Circuit open, ONOS is failing", url=self.name, failures=self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.trial_in_flight = False
+                self.stats["opened"] += 1
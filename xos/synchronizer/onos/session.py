@@ -0,0 +1,358 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import urlparse
+import threading
+import six
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+from onos.adapter import TwistedAdapter
+from onos.endpoints import ONOSEndpoint
+from onos.retry import RetryPolicy, CircuitBreaker, classify, RETRYABLE, SUCCESS
+import onos.deadline as onos_deadline
+from onos.workers import run_concurrently, bind_context
+from onos.metrics import metrics
+from onos.tracing import tracer, OK, ERROR
+
+log = create_logger(Config().get('logging'))
+
+
+class ONOSSession(requests.Session):
+    """
+    A keep-alive HTTP session towards a single ONOS REST endpoint.
+    All the REST calls made by the sync steps go through ONOSSession.request or ONOSSession.request_many
+
+    The calls are performed either by the blocking requests backend, or by the "twisted" backend that runs them on
+    an event loop (see onos.adapter.TwistedAdapter).
+    """
+
+    def __init__(self, key, pool_connections=1, pool_maxsize=10, backend="requests", max_in_flight=100):
+        super(ONOSSession, self).__init__()
+        self.key = key
+        (self.base_url, self.username, self.password) = key
+        self.auth = HTTPBasicAuth(self.username, self.password)
+        self.requests_count = 0
+        self.retries_count = 0
+        self.breaker = CircuitBreaker(self.base_url)
+
+        if backend == "twisted":
+            # eg: a CA bundle or a proxy set in the environment
+            settings = self.merge_environment_settings(self.base_url, {}, None, None, None)
+            unsupported = TwistedAdapter.unsupported(self.base_url, settings["verify"], settings["cert"],
+                                                     settings["proxies"])
+            if unsupported:
+                log.warning("The twisted backend doesn't support the settings of the ONOS endpoint, using the "
+                            "requests backend", endpoint=self.base_url, settings=unsupported)
+                backend = "requests"
+        self.backend = backend
+
+        if backend == "twisted":
+            adapter = TwistedAdapter(max_in_flight=max_in_flight, pool_maxsize=pool_maxsize)
+        elif backend == "requests":
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        else:
+            raise Exception("Unknown ONOS client backend: %s" % backend)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    @staticmethod
+    def key_for(onos):
+        """
+        Build the key identifying the endpoint of an ONOSService
+        :param onos: ONOSService model or its ONOSEndpoint
+        :return: (base_url, username, password)
+        """
+        if isinstance(onos, ONOSEndpoint):
+            return onos.key
+        onos_url = "%s:%s" % (Helpers.format_url(onos.rest_hostname), onos.rest_port)
+        return (onos_url, onos.rest_username, onos.rest_password)
+
+    def request(self, method, url, **kwargs):
+        """
+        Perform a REST call, retrying it if it fails in a retryable way (see onos.retry.classify).
+        Pass retry=False to perform the call only once and bypass the circuit breaker (eg: for health probes).
+
+        Unless a timeout is given, the call uses the timeouts of its operation (see onos.deadline.OPERATIONS),
+        eg: operation="install". The call never outlives the deadline bound to the thread, if any.
+        """
+        operation = kwargs.pop("operation", "default")
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = onos_deadline.operation_timeout(operation)
+        timeout = kwargs["timeout"]
+        deadline = onos_deadline.current()
+
+        if not kwargs.pop("retry", True):
+            return self.send_request(method, url, operation, **kwargs)
+
+        policy = RetryPolicy.from_config()
+        attempt = 0
+        while True:
+            attempt += 1
+            if deadline is not None:
+                deadline.check()
+                kwargs["timeout"] = deadline.clip(timeout)
+            self.breaker.allow()
+
+            data = kwargs.get("data")
+            if hasattr(data, "seek"):
+                # a file upload, send it from the beginning
+                data.seek(0)
+
+            error = None
+            try:
+                result = self.send_request(method, url, operation, **kwargs)
+            except Exception as e:
+                result = e
+                error = sys.exc_info()
+
+            retryable = classify(result) == RETRYABLE
+            self.breaker.record(not retryable)
+
+            if error and deadline is not None:
+                # eg: the read timeout has been reduced to the remaining time
+                deadline.check()
+
+            if retryable and attempt < policy.max_attempts:
+                delay = policy.backoff(attempt)
+                log.debug("Retrying ONOS request", method=method, url=url, attempt=attempt, delay=delay,
+                          error=str(result) if error else result.status_code)
+                self.retries_count += 1
+                if deadline is not None:
+                    delay = deadline.clip(delay)
+                time.sleep(delay)
+                continue
+
+            if error:
+                six.reraise(*error)
+            return result
+
+    def send_request(self, method, url, operation, **kwargs):
+        """
+        Perform a single REST call, measure and trace it
+        """
+        self.requests_count += 1
+        with tracer.span("%s %s" % (method, urlparse.urlparse(url).path), endpoint=self.base_url,
+                         operation=operation) as span:
+            started = time.time()
+            try:
+                result = super(ONOSSession, self).request(method, url, **kwargs)
+            except Exception as e:
+                metrics.observe_request(self.base_url, operation, method, e, time.time() - started)
+                raise
+            metrics.observe_request(self.base_url, operation, method, result, time.time() - started)
+
+            if span is not None:
+                span.set(status_code=result.status_code)
+                if classify(result) != SUCCESS:
+                    span.fail(error=result.reason)
+            return result
+
+    def request_many(self, calls, timeout=None, operation="default", workers=1):
+        """
+        Perform many REST calls. With the twisted backend all the calls are in flight at the same time (up to
+        max_in_flight), with the requests backend they are performed by up to workers threads.
+        :param calls: list of (method, url, kwargs), kwargs are passed to requests.Request (eg: json)
+        :param timeout: timeout for each call, in seconds, by default the timeouts of the operation
+        :param operation: class of the calls (see onos.deadline.OPERATIONS)
+        :param workers: concurrent calls with the requests backend, 1 to perform them one after the other
+        :return: list containing a requests.Response or an exception for each call, in the same order
+        """
+        if self.backend != "twisted":
+            results = [None] * len(calls)
+
+            def call(i):
+                (method, url, kwargs) = calls[i]
+                results[i] = self.request(method, url, timeout=timeout, operation=operation, **kwargs)
+
+            for (i, e) in run_concurrently(bind_context(call), range(len(calls)), workers):
+                results[i] = e
+            return results
+
+        if timeout is None:
+            timeout = onos_deadline.operation_timeout(operation)
+        deadline = onos_deadline.current()
+
+        policy = RetryPolicy.from_config()
+        results = [None] * len(calls)
+        pending = range(len(calls))
+        attempt = 0
+        while pending:
+            attempt += 1
+            try:
+                if deadline is not None:
+                    deadline.check()
+                self.breaker.allow()
+            except Exception as e:
+                for i in pending:
+                    results[i] = e
+                break
+            attempt_timeout = deadline.clip(timeout) if deadline is not None else timeout
+
+            self.requests_count += len(pending)
+            prepared = [self.prepare_request(requests.Request(calls[i][0], calls[i][1], **calls[i][2]))
+                        for i in pending]
+            started = time.time()
+            for (i, result) in zip(pending, self.get_adapter(self.base_url).send_many(prepared,
+                                                                                      timeout=attempt_timeout)):
+                results[i] = result
+                # failed calls are not timed individually, they count as long as the whole batch
+                latency = result.elapsed.total_seconds() if hasattr(result, "elapsed") else time.time() - started
+                metrics.observe_request(self.base_url, operation, calls[i][0], result, latency)
+                self.trace_result(calls[i][0], calls[i][1], operation, result, started, latency)
+
+            retryable = [i for i in pending if classify(results[i]) == RETRYABLE]
+            # the circuit counts a batch as failed only if none of its calls succeeded
+            self.breaker.record(len(retryable) < len(pending))
+            if not retryable or attempt >= policy.max_attempts:
+                break
+
+            self.retries_count += len(retryable)
+            delay = policy.backoff(attempt)
+            if deadline is not None:
+                delay = deadline.clip(delay)
+            time.sleep(delay)
+            pending = retryable
+        return results
+
+    def trace_result(self, method, url, operation, result, started, latency):
+        """
+        Trace a REST call that has been performed together with others
+        """
+        attributes = {"endpoint": self.base_url, "operation": operation}
+        if isinstance(result, Exception):
+            (status, error) = (ERROR, str(result))
+        else:
+            attributes["status_code"] = result.status_code
+            (status, error) = (OK, None) if classify(result) == SUCCESS else (ERROR, result.reason)
+        tracer.record("%s %s" % (method, urlparse.urlparse(url).path), started, latency, status, error, **attributes)
+
+    def connections_count(self):
+        """
+        Number of TCP connections the underlying urllib3 pools had to open
+        """
+        count = 0
+        for adapter in set(self.adapters.values()):
+            if not isinstance(adapter, HTTPAdapter):
+                # connections of the twisted backend are not tracked
+                continue
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    count += pool.num_connections
+        return count
+
+    def stats(self):
+        connections = self.connections_count()
+        return {
+            "requests": self.requests_count,
+            "retries": self.retries_count,
+            "connections": connections,
+            "reused": max(self.requests_count - connections, 0)
+        }
+
+
+class ONOSSessionPool(object):
+    """
+    Registry of ONOSSessions, keyed by the resolved ONOS endpoint (url, username, password).
+    Sessions are dropped as soon as the ONOSService they have been created for points somewhere else.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}  # endpoint key -> ONOSSession
+        self.bindings = {}  # ONOSService id -> endpoint key
+        self.created = 0
+        self.dropped = 0
+        self.closed_stats = {"requests": 0, "retries": 0, "connections": 0, "reused": 0}
+
+    def get(self, onos):
+        """
+        Return the session to use to talk with an ONOSService
+        :param onos: ONOSService model or its ONOSEndpoint (see onos.endpoints.EndpointCache)
+        :return: ONOSSession
+        """
+        key = ONOSSession.key_for(onos)
+
+        with self.lock:
+            previous = self.bindings.get(onos.id)
+            if previous is not None and previous != key:
+                log.info("ONOSService endpoint changed, dropping session", onos=onos.id, url=previous[0])
+                self._unbind(onos.id)
+
+            session = self.sessions.get(key)
+            if session is None:
+                session = ONOSSession(
+                    key,
+                    pool_connections=Helpers.get_onos_config("sessions", "pool_connections", 1),
+                    pool_maxsize=Helpers.get_onos_config("sessions", "pool_maxsize", 10),
+                    backend=Helpers.get_onos_config("client", "backend", "requests"),
+                    max_in_flight=Helpers.get_onos_config("client", "max_in_flight", 100))
+                self.sessions[key] = session
+                self.created += 1
+                log.debug("Created session", url=key[0])
+
+            self.bindings[onos.id] = key
+            return session
+
+    def drop(self, onos_id):
+        """
+        Forget the session used by an ONOSService, eg: because the model has been updated
+        :param onos_id: id of the ONOSService model
+        """
+        with self.lock:
+            self._unbind(onos_id)
+
+    def _unbind(self, onos_id):
+        key = self.bindings.pop(onos_id, None)
+        if key is None or key in self.bindings.values():
+            # the session is still in use by another ONOSService
+            return
+
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            for (k, v) in session.stats().items():
+                self.closed_stats[k] += v
+            session.close()
+            self.dropped += 1
+            log.info("Dropped session", url=key[0], **session.stats())
+
+    def stats(self):
+        """
+        Reuse counters, useful to see how many TCP handshakes have been saved
+        :return: dict
+        """
+        with self.lock:
+            totals = dict(self.closed_stats)
+            endpoints = {}
+            for (key, session) in self.sessions.items():
+                session_stats = session.stats()
+                endpoints[key[0]] = session_stats
+                for (k, v) in session_stats.items():
+                    totals[k] += v
+            totals["sessions_created"] = self.created
+            totals["sessions_dropped"] = self.dropped
+            totals["endpoints"] = endpoints
+            return totals
+
+
+session_pool = ONOSSessionPool()
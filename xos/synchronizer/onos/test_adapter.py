@@ -0,0 +1,184 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import json
+from mock import patch
+import socket
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+import os
+import sys
+
+import requests
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class FakeONOS(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FakeONOSHandler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0
+        self.received = []
+
+
+class FakeONOSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, code, body=None):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+
+        self.send_response(code)
+        if body is not None:
+            data = json.dumps(body)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def do_GET(self):
+        self.server.received.append(("GET", self.path, self.headers.get("Authorization")))
+        self.reply(200, {"applications": [{"name": "org.onosproject.olt", "state": "ACTIVE"}]})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.received.append(("POST", self.path, json.loads(body)))
+        self.reply(200, {})
+
+    def do_DELETE(self):
+        self.server.received.append(("DELETE", self.path, None))
+        self.reply(204)
+
+
+class TestTwistedBackend(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.session import ONOSSession
+
+        self.server = FakeONOS()
+        t = threading.Thread(target=self.server.serve_forever)
+        t.daemon = True
+        t.start()
+
+        self.base_url = "http://127.0.0.1:%s" % self.server.server_port
+        self.session = ONOSSession((self.base_url, "karaf", "karaf"), backend="twisted", max_in_flight=5)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        sys.path = self.sys_path_save
+
+    def test_blocking_api(self):
+        res = self.session.get("%s/onos/v1/applications" % self.base_url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["applications"][0]["state"], "ACTIVE")
+
+        res = self.session.post("%s/onos/v1/network/configuration/apps/org.onosproject.olt" % self.base_url,
+                                json={"foo": "bar"})
+        self.assertEqual(res.status_code, 200)
+
+        res = self.session.delete("%s/onos/v1/network/configuration/apps/org.onosproject.olt" % self.base_url)
+        self.assertEqual(res.status_code, 204)
+
+        self.assertEqual([(r[0], r[1]) for r in self.server.received], [
+            ("GET", "/onos/v1/applications"),
+            ("POST", "/onos/v1/network/configuration/apps/org.onosproject.olt"),
+            ("DELETE", "/onos/v1/network/configuration/apps/org.onosproject.olt"),
+        ])
+        self.assertEqual(self.server.received[0][2], "Basic a2FyYWY6a2FyYWY=")
+        self.assertEqual(self.server.received[1][2], {"foo": "bar"})
+
+    def test_request_many_is_bounded(self):
+        self.server.delay = 0.1
+        calls = [("POST", "%s/onos/v1/network/configuration/apps/app%d" % (self.base_url, i), {"json": {"id": i}})
+                 for i in range(20)]
+
+        results = self.session.request_many(calls)
+
+        self.assertEqual([r.status_code for r in results], [200] * 20)
+        self.assertEqual(sorted(r[2]["id"] for r in self.server.received), range(20))
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 5)
+        self.assertEqual(self.session.stats()["requests"], 20)
+
+    def test_connection_error(self):
+        from onos.session import ONOSSession
+
+        # find a port nobody is listening on
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        url = "http://127.0.0.1:%s" % s.getsockname()[1]
+        s.close()
+
+        session = ONOSSession((url, "karaf", "karaf"), backend="twisted")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            session.get("%s/onos/v1/applications" % url)
+
+        [result] = session.request_many([("GET", "%s/onos/v1/applications" % url, {})])
+        self.assertIsInstance(result, requests.exceptions.ConnectionError)
+
+    def test_unsupported_settings(self):
+        from onos.session import ONOSSession
+
+        with self.assertRaises(Exception) as e:
+            self.session.get("%s/onos/v1/applications" % self.base_url, proxies={"http": "http://proxy:3128"})
+        self.assertEqual(e.exception.message, "The twisted backend doesn't support the proxies settings of the "
+                                              "request to %s/onos/v1/applications" % self.base_url)
+
+        # the settings of the endpoint are not supported, the calls are made by the requests backend
+        with patch.dict(os.environ, {"HTTP_PROXY": "http://proxy:3128", "NO_PROXY": ""}):
+            self.assertEqual(ONOSSession((self.base_url, "karaf", "karaf"), backend="twisted").backend, "requests")
+        with patch.dict(os.environ, {"REQUESTS_CA_BUNDLE": "/etc/onos/ca.pem"}):
+            self.assertEqual(ONOSSession(("https://onos:8181", "karaf", "karaf"), backend="twisted").backend,
+                             "requests")
+            # no TLS, the CA bundle doesn't matter
+            self.assertEqual(ONOSSession((self.base_url, "karaf", "karaf"), backend="twisted").backend, "twisted")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import Mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestAppDependencyGraph(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        from onos.app_graph import AppDependencyGraph
+
+        self.graph = AppDependencyGraph()
+
+        self.sadis = self.create_app(1, "org.opencord.sadis")
+        self.olt = self.create_app(2, "org.opencord.olt", "org.opencord.sadis")
+        self.aaa = self.create_app(3, "org.opencord.aaa", "org.opencord.olt, org.opencord.sadis")
+        self.dhcpl2relay = self.create_app(4, "org.opencord.dhcpl2relay", "org.opencord.aaa")
+        self.kafka = self.create_app(5, "org.opencord.kafka")
+
+        self.graph.load([self.dhcpl2relay, self.aaa, self.olt, self.sadis, self.kafka])
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def create_app(self, id, app_id, dependencies=None, owner_id=1):
+        app = Mock()
+        app.id = id
+        app.app_id = app_id
+        app.dependencies = dependencies
+        app.owner_id = owner_id
+        return app
+
+    def test_install_order(self):
+        order = self.graph.install_order(1, "org.opencord.dhcpl2relay")
+        self.assertEqual([a.app_id for a in order], ["org.opencord.sadis", "org.opencord.olt", "org.opencord.aaa"])
+        self.assertEqual(self.graph.install_order(1, "org.opencord.sadis"), [])
+
+    def test_levels(self):
+        levels = [[a.app_id for a in level] for level in self.graph.levels(1)]
+        self.assertEqual(levels, [
+            ["org.opencord.kafka", "org.opencord.sadis"],
+            ["org.opencord.olt"],
+            ["org.opencord.aaa"],
+            ["org.opencord.dhcpl2relay"]
+        ])
+        self.assertEqual(self.graph.levels(2), [])
+
+    def test_apps_are_scoped_by_owner(self):
+        other_olt = self.create_app(6, "org.opencord.olt", "org.opencord.sadis", owner_id=2)
+        self.graph.update([other_olt])
+
+        self.assertEqual(self.graph.missing_dependencies(2, "org.opencord.olt"), ["org.opencord.sadis"])
+        self.assertEqual(self.graph.missing_dependencies(1, "org.opencord.olt"), [])
+
+    def test_find_cycle(self):
+        self.assertIsNone(self.graph.find_cycle(1, "org.opencord.dhcpl2relay"))
+
+        self.sadis.dependencies = "org.opencord.aaa"
+        self.graph.update([self.sadis])
+
+        self.assertEqual(self.graph.find_cycle(1, "org.opencord.dhcpl2relay"),
+                         ["org.opencord.aaa", "org.opencord.olt", "org.opencord.sadis", "org.opencord.aaa"])
+        self.assertIsNone(self.graph.find_cycle(1, "org.opencord.kafka"))
+        self.assertEqual([[a.app_id for a in level] for level in self.graph.levels(1)], [["org.opencord.kafka"]])
+
+    def test_update_and_remove(self):
+        self.graph.remove([self.olt])
+        self.assertEqual(self.graph.missing_dependencies(1, "org.opencord.dhcpl2relay"), ["org.opencord.olt"])
+
+        # the app_id of a model can change
+        renamed = self.create_app(5, "org.opencord.olt", "org.opencord.sadis")
+        self.graph.update([renamed])
+        self.assertEqual(self.graph.missing_dependencies(1, "org.opencord.dhcpl2relay"), [])
+        self.assertNotIn((1, "org.opencord.kafka"), self.graph.apps)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import shutil
+import tempfile
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+URL = "http://onos-url:8181"
+OLT = "onos/v1/network/configuration/apps/org.opencord.olt"
+DHCP = "onos/v1/network/configuration/apps/org.opencord.dhcpl2relay"
+SADIS = "onos/v1/network/configuration/apps/org.opencord.sadis"
+
+
+class TestAppliedState(unittest.TestCase):
+
+    def setUp(self):
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.applied import AppliedState
+        self.state = AppliedState()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        sys.path = self.sys_path_save
+
+    def test_content_hash(self):
+        from onos.applied import content_hash
+
+        self.assertEqual(content_hash({"a": 1, "b": [1, 2]}), content_hash({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(content_hash({"a": 1}), content_hash({"a": 2}))
+
+    def test_summarize(self):
+        from onos.applied import APPLIED, FAILED, format_summary
+
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.state.record(1, URL, DHCP, "h2", FAILED, "Invalid config")
+        self.state.record(1, URL, SADIS, "h3", APPLIED)
+
+        self.assertTrue(self.state.is_applied(1, URL, OLT, "h1"))
+        self.assertFalse(self.state.is_applied(1, URL, DHCP, "h2"))
+        # the config changed since it has been applied
+        self.assertFalse(self.state.is_applied(1, URL, SADIS, "h4"))
+        # ONOS has been moved somewhere else
+        self.assertFalse(self.state.is_applied(1, "http://other-onos:8181", OLT, "h1"))
+
+        summary = self.state.summarize(1, URL, {OLT: "h1", DHCP: "h2", SADIS: "h4"})
+        self.assertEqual(summary, {"applied": 1, "pending": 1, "failed": 1})
+        self.assertEqual(self.state.summary(1), summary)
+        self.assertEqual(format_summary(summary), "1 applied, 1 pending, 1 failed")
+        self.assertIsNone(self.state.summary(2))
+
+    def test_retain(self):
+        from onos.applied import APPLIED
+
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.state.record(1, URL, DHCP, "h2", APPLIED)
+        self.state.retain(1, URL, [OLT])
+
+        self.assertTrue(self.state.is_applied(1, URL, OLT, "h1"))
+        self.assertFalse(self.state.is_applied(1, URL, DHCP, "h2"))
+
+    def test_models(self):
+        from onos.applied import APPLIED
+
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.state.record(1, URL, DHCP, "h2", APPLIED, model="ServiceInstanceAttribute")
+        self.state.retain(1, URL, [])
+
+        # the configs of the ServiceInstanceAttributes are not affected
+        self.assertFalse(self.state.is_applied(1, URL, OLT, "h1"))
+        self.assertTrue(self.state.is_applied(1, URL, DHCP, "h2", model="ServiceInstanceAttribute"))
+        self.assertFalse(self.state.is_applied(1, URL, DHCP, "h2"))
+
+    def test_model_ids(self):
+        from onos.applied import APPLIED
+
+        # the attributes of two ONOSApps push to the same path
+        self.state.record(1, URL, DHCP, "h1", APPLIED, model="ServiceInstanceAttribute", model_id=10)
+        self.state.record(1, URL, DHCP, "h2", APPLIED, model="ServiceInstanceAttribute", model_id=11)
+        self.state.record_subjects(1, URL, DHCP, {"apps/a": "h3"}, model="ServiceInstanceAttribute", model_id=10)
+        self.state.record_subjects(1, URL, DHCP, {"apps/b": "h4"}, model="ServiceInstanceAttribute", model_id=11)
+
+        self.assertTrue(self.state.is_applied(1, URL, DHCP, "h1", model="ServiceInstanceAttribute", model_id=10))
+        self.assertTrue(self.state.is_applied(1, URL, DHCP, "h2", model="ServiceInstanceAttribute", model_id=11))
+
+        self.state.forget(1, URL, DHCP, model="ServiceInstanceAttribute", model_id=10)
+        self.assertFalse(self.state.is_applied(1, URL, DHCP, "h1", model="ServiceInstanceAttribute", model_id=10))
+        self.assertEqual(self.state.subjects(1, URL, DHCP, model="ServiceInstanceAttribute", model_id=10), {})
+
+        self.assertEqual(self.state.shared_subjects(1, URL, DHCP, model="ServiceInstanceAttribute", model_id=10),
+                         set(["apps/b"]))
+        self.assertEqual(self.state.shared_subjects(1, URL, DHCP, model="ServiceInstanceAttribute", model_id=11),
+                         set())
+
+        # the config of the other attribute is still applied
+        self.assertTrue(self.state.is_applied(1, URL, DHCP, "h2", model="ServiceInstanceAttribute", model_id=11))
+        self.assertEqual(self.state.subjects(1, URL, DHCP, model="ServiceInstanceAttribute", model_id=11),
+                         {"apps/b": "h4"})
+
+    def test_subjects(self):
+        from onos.applied import APPLIED
+
+        devices = "onos/v1/network/configuration/devices"
+        self.assertEqual(self.state.subjects(1, URL, devices), {})
+
+        self.state.record(1, URL, devices, "h1", APPLIED)
+        self.state.record_subjects(1, URL, devices, {"devices/of:01/basic": "h2", "devices/of:02/basic": "h3"})
+        self.state.record_subjects(1, URL, devices, {"devices/of:01/basic": "h4"})
+        self.assertEqual(self.state.subjects(1, URL, devices), {"devices/of:01/basic": "h4"})
+        self.assertEqual(self.state.subjects(1, URL, devices, model="ServiceInstanceAttribute"), {})
+
+        self.state.forget(1, URL, devices)
+        self.assertEqual(self.state.subjects(1, URL, devices), {})
+
+        self.state.record_subjects(1, URL, devices, {"devices/of:01/basic": "h4"})
+        self.state.retain(1, URL, [])
+        self.assertEqual(self.state.subjects(1, URL, devices), {})
+
+    def test_apps(self):
+        self.assertIsNone(self.state.app_version(1, URL, "org.opencord.olt"))
+
+        self.state.record_app(1, URL, "org.opencord.olt", "3.0.0")
+        self.assertEqual(self.state.app_version(1, URL, "org.opencord.olt"), "3.0.0")
+        self.assertIsNone(self.state.app_version(1, "http://other-onos:8181", "org.opencord.olt"))
+
+        self.state.forget_app(1, URL, "org.opencord.olt")
+        self.assertIsNone(self.state.app_version(1, URL, "org.opencord.olt"))
+
+    def test_persistence(self):
+        from onos.applied import AppliedState, APPLIED
+
+        path = os.path.join(self.directory, "ledger", "ledger.db")
+        self.state.open(path)
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.state.record_app(1, URL, "org.opencord.olt", "3.0.0")
+
+        # the synchronizer restarts
+        restarted = AppliedState()
+        restarted.open(path)
+        self.assertTrue(restarted.is_applied(1, URL, OLT, "h1"))
+        self.assertEqual(restarted.app_version(1, URL, "org.opencord.olt"), "3.0.0")
+
+    def test_previous_schema(self):
+        import sqlite3
+        from onos.applied import AppliedState, APPLIED
+
+        path = os.path.join(self.directory, "ledger.db")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE configs (onos_id INTEGER NOT NULL, endpoint TEXT NOT NULL, "
+                           "model TEXT NOT NULL, path TEXT NOT NULL, hash TEXT NOT NULL, outcome TEXT NOT NULL, "
+                           "error TEXT, updated REAL NOT NULL, PRIMARY KEY (onos_id, endpoint, model, path))")
+        connection.execute("INSERT INTO configs VALUES (1, ?, 'ServiceAttribute', ?, 'h1', ?, NULL, 0)",
+                           (URL, OLT, APPLIED))
+        connection.commit()
+        connection.close()
+
+        # the configs recorded by the previous version are pushed again
+        self.state.open(path)
+        self.assertFalse(self.state.is_applied(1, URL, OLT, "h1"))
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+
+        restarted = AppliedState()
+        restarted.open(path)
+        self.assertTrue(restarted.is_applied(1, URL, OLT, "h1"))
+
+    def test_open_failure(self):
+        from onos.applied import APPLIED
+
+        # the directory can't be created
+        path = os.path.join(self.directory, "file")
+        open(path, "w").close()
+        self.state.open(os.path.join(path, "ledger.db"))
+
+        # the ledger is kept in memory
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.assertTrue(self.state.is_applied(1, URL, OLT, "h1"))
+
+    def test_clear(self):
+        from onos.applied import APPLIED
+
+        self.state.record(1, URL, OLT, "h1", APPLIED)
+        self.state.record(2, URL, OLT, "h1", APPLIED)
+        self.state.record_app(1, URL, "org.opencord.olt", "3.0.0")
+        self.state.summarize(1, URL, {OLT: "h1"})
+        self.state.clear(1)
+
+        self.assertFalse(self.state.is_applied(1, URL, OLT, "h1"))
+        self.assertIsNone(self.state.app_version(1, URL, "org.opencord.olt"))
+        self.assertIsNone(self.state.summary(1))
+        self.assertTrue(self.state.is_applied(2, URL, OLT, "h1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import requests_mock
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestArtifactCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.artifacts import ArtifactCache
+
+        self.directory = tempfile.mkdtemp()
+        self.cache = ArtifactCache(self.directory, 25)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        sys.path = self.sys_path_save
+
+    def mock_artifact(self, m, url, content, etag='"v1"'):
+        def reply(request, context):
+            if request.headers.get("If-None-Match") == etag:
+                context.status_code = 304
+                return b""
+            context.status_code = 200
+            context.headers["ETag"] = etag
+            return content
+
+        m.get(url, content=reply)
+
+    @requests_mock.Mocker()
+    def test_download_once(self, m):
+        self.mock_artifact(m, "http://artifacts/olt.oar", b"olt archive")
+
+        path = self.cache.get("http://artifacts/olt.oar")
+        self.assertEqual(os.path.basename(path), hashlib.sha256(b"olt archive").hexdigest())
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"olt archive")
+
+        # a released archive doesn't change, the repository is not contacted again
+        self.assertEqual(self.cache.get("http://artifacts/olt.oar"), path)
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+        # the version changed
+        self.mock_artifact(m, "http://artifacts/olt-2.0.oar", b"olt 2.0 archive")
+        self.assertNotEqual(self.cache.get("http://artifacts/olt-2.0.oar"), path)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    @requests_mock.Mocker()
+    def test_republished_archive(self, m):
+        self.mock_artifact(m, "http://artifacts/olt-SNAPSHOT.oar", b"olt archive")
+        path = self.cache.get("http://artifacts/olt-SNAPSHOT.oar")
+
+        self.assertEqual(self.cache.get("http://artifacts/olt-SNAPSHOT.oar"), path)
+        self.assertEqual(m.request_history[1].headers["If-None-Match"], '"v1"')
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+        # the same url is published again
+        self.mock_artifact(m, "http://artifacts/olt-SNAPSHOT.oar", b"new archive", etag='"v2"')
+        updated = self.cache.get("http://artifacts/olt-SNAPSHOT.oar")
+
+        self.assertNotEqual(updated, path)
+        with open(updated, "rb") as f:
+            self.assertEqual(f.read(), b"new archive")
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+        # without validators a SNAPSHOT is downloaded every time
+        m.get("http://artifacts/aaa-SNAPSHOT.oar", status_code=200, content=b"aaa archive")
+        self.cache.get("http://artifacts/aaa-SNAPSHOT.oar")
+        self.cache.get("http://artifacts/aaa-SNAPSHOT.oar")
+        self.assertEqual(self.cache.stats["misses"], 4)
+
+    @requests_mock.Mocker()
+    def test_repository_unreachable(self, m):
+        import requests
+
+        self.mock_artifact(m, "http://artifacts/olt-SNAPSHOT.oar", b"olt archive")
+        path = self.cache.get("http://artifacts/olt-SNAPSHOT.oar")
+
+        m.get("http://artifacts/olt-SNAPSHOT.oar", exc=requests.exceptions.ConnectionError)
+        self.assertEqual(self.cache.get("http://artifacts/olt-SNAPSHOT.oar"), path)
+        self.assertEqual(self.cache.stats["stale"], 1)
+
+    @requests_mock.Mocker()
+    def test_revalidation_deadline(self, m):
+        from onos.deadline import Deadline
+        from onos.artifacts import REVALIDATE_TIMEOUT
+
+        self.mock_artifact(m, "http://artifacts/olt-SNAPSHOT.oar", b"olt archive")
+        path = self.cache.get("http://artifacts/olt-SNAPSHOT.oar")
+
+        # the revalidation doesn't outlive the sync
+        Deadline(3).wrap(self.cache.get)("http://artifacts/olt-SNAPSHOT.oar")
+        (connect, read) = m.request_history[1].timeout
+        self.assertLessEqual(connect, REVALIDATE_TIMEOUT[0])
+        self.assertLessEqual(read, 3)
+
+        # with the deadline expired the cached archive is used
+        deadline = Deadline(1)
+        deadline.expires_at = time.time() - 1
+        self.assertEqual(deadline.wrap(self.cache.get)("http://artifacts/olt-SNAPSHOT.oar"), path)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self.cache.stats["stale"], 1)
+
+    @requests_mock.Mocker()
+    def test_index_is_persisted(self, m):
+        from onos.artifacts import ArtifactCache
+
+        self.mock_artifact(m, "http://artifacts/olt.oar", b"olt archive")
+        path = self.cache.get("http://artifacts/olt.oar")
+
+        # eg: the synchronizer restarted
+        cache = ArtifactCache(self.directory, 25)
+        self.assertEqual(cache.get("http://artifacts/olt.oar"), path)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    @requests_mock.Mocker()
+    def test_corrupted_archive(self, m):
+        from onos.artifacts import ArtifactCache
+
+        m.get("http://artifacts/olt.oar", status_code=200, content=b"olt archive")
+        path = self.cache.get("http://artifacts/olt.oar")
+
+        with open(path, "wb") as f:
+            f.write(b"garbage")
+
+        # the archives are checked the first time they are used after a restart
+        cache = ArtifactCache(self.directory, 25)
+        self.assertEqual(cache.get("http://artifacts/olt.oar"), path)
+        self.assertEqual(m.call_count, 2)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"olt archive")
+
+    @requests_mock.Mocker()
+    def test_download_failure(self, m):
+        m.get("http://artifacts/olt.oar", status_code=404)
+
+        with self.assertRaises(Exception) as e:
+            self.cache.get("http://artifacts/olt.oar")
+
+        self.assertEqual(e.exception.message, "Failed to download application archive http://artifacts/olt.oar: 404")
+        self.assertEqual(os.listdir(self.cache.objects), [])
+        self.assertEqual(self.cache.index, {})
+
+    @requests_mock.Mocker()
+    def test_lru_eviction(self, m):
+        m.get("http://artifacts/olt.oar", status_code=200, content=b"olt archive")
+        m.get("http://artifacts/aaa.oar", status_code=200, content=b"aaa archive")
+        m.get("http://artifacts/dhcp.oar", status_code=200, content=b"dhcp archive")
+
+        olt = self.cache.get("http://artifacts/olt.oar")
+        aaa = self.cache.get("http://artifacts/aaa.oar")
+
+        # use olt, so that aaa is the least recently used archive
+        os.utime(aaa, (time.time() - 10, time.time() - 10))
+        self.cache.get("http://artifacts/olt.oar")
+
+        dhcp = self.cache.get("http://artifacts/dhcp.oar")
+
+        self.assertTrue(os.path.exists(olt))
+        self.assertTrue(os.path.exists(dhcp))
+        self.assertFalse(os.path.exists(aaa))
+        self.assertNotIn("http://artifacts/aaa.oar", self.cache.index)
+        self.assertEqual(self.cache.stats["evictions"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
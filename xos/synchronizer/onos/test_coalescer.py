@@ -0,0 +1,92 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+from mock import Mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestEventCoalescer(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.coalescer import EventCoalescer
+
+        self.coalescer = EventCoalescer("test")
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def test_no_window(self):
+        fn = Mock()
+
+        self.assertTrue(self.coalescer.submit("onos", fn, 0))
+        self.assertTrue(self.coalescer.submit("onos", fn, 0))
+
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(self.coalescer.stats["executed"], 2)
+        self.assertEqual(self.coalescer.stats["absorbed"], 0)
+
+    def test_no_window_failure(self):
+        fn = Mock(side_effect=Exception("boom"))
+
+        with self.assertRaises(Exception):
+            self.coalescer.submit("onos", fn, 0)
+        self.assertEqual(self.coalescer.stats["failed"], 1)
+
+    def test_burst(self):
+        done = threading.Event()
+        first = Mock()
+        last = Mock(side_effect=lambda: done.set())
+        other = Mock()
+
+        self.assertTrue(self.coalescer.submit("onos", first, 0.1))
+        self.assertFalse(self.coalescer.submit("onos", first, 0.1))
+        self.assertFalse(self.coalescer.submit("onos", last, 0.1))
+        self.assertTrue(self.coalescer.submit("other-onos", other, 60))
+
+        self.assertTrue(done.wait(5))
+        first.assert_not_called()
+        last.assert_called_once_with()
+        other.assert_not_called()
+        self.assertEqual(self.coalescer.stats["received"], 4)
+        self.assertEqual(self.coalescer.stats["absorbed"], 2)
+
+        self.coalescer.flush()
+        other.assert_called_once_with()
+        self.assertEqual(self.coalescer.stats["executed"], 2)
+        self.assertEqual(self.coalescer.pending, {})
+
+        # a new window is opened after the previous one closed
+        self.assertTrue(self.coalescer.submit("onos", first, 60))
+
+
+if __name__ == '__main__':
+    unittest.main()
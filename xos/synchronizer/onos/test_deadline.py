@@ -0,0 +1,174 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch
+import requests
+import requests_mock
+import threading
+import time
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.helpers import Helpers
+        from onos.session import ONOSSession
+
+        self.config = {
+            ("timeouts", "default"): {"connect": 5, "read": 30},
+            ("timeouts", "install"): {"connect": 5, "read": 120},
+            ("retry", "max_attempts"): 3,
+            ("retry", "initial_backoff"): 0,
+        }
+        self.patcher = patch.object(Helpers, "get_onos_config",
+                                    side_effect=lambda section, key, default=None:
+                                    self.config.get((section, key), default))
+        self.patcher.start()
+
+        self.session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+        self.url = "http://onos-url:8181/onos/v1/applications"
+
+    def tearDown(self):
+        self.patcher.stop()
+        sys.path = self.sys_path_save
+
+    def test_operation_timeout(self):
+        from onos.deadline import operation_timeout
+
+        self.assertEqual(operation_timeout("install"), (5, 120))
+        # operations without their own timeouts use the default ones
+        self.assertEqual(operation_timeout("netcfg"), (5, 30))
+        with self.assertRaises(Exception):
+            operation_timeout("unknown")
+
+    @requests_mock.Mocker()
+    def test_request_timeout(self, m):
+        m.post(self.url, status_code=200, json={})
+
+        self.session.post(self.url, operation="install")
+        self.assertEqual(m.last_request.timeout, (5, 120))
+
+        self.session.post(self.url)
+        self.assertEqual(m.last_request.timeout, (5, 30))
+
+        # an explicit timeout wins
+        self.session.post(self.url, timeout=1, operation="install")
+        self.assertEqual(m.last_request.timeout, 1)
+
+    def test_clip(self):
+        from onos.deadline import Deadline
+
+        self.assertEqual(Deadline(None).clip((5, 30)), (5, 30))
+        self.assertIsNone(Deadline(0).remaining())
+
+        (connect, read) = Deadline(10).clip((5, 30))
+        self.assertEqual(connect, 5)
+        self.assertLessEqual(read, 10)
+        self.assertLessEqual(Deadline(10).clip(30), 10)
+        self.assertLessEqual(Deadline(10).clip(None), 10)
+
+    @requests_mock.Mocker()
+    def test_retry_without_deadline(self, m):
+        from onos.deadline import Deadline
+
+        m.post(self.url, [{"status_code": 503}, {"status_code": 200, "json": {}}])
+
+        # a sync with no deadline configured
+        response = Deadline(0).wrap(lambda: self.session.post(self.url))()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_deadline_clips_request(self, m):
+        from onos.deadline import Deadline
+
+        m.post(self.url, status_code=200, json={})
+
+        Deadline(10).wrap(lambda: self.session.post(self.url, operation="install"))()
+        (connect, read) = m.last_request.timeout
+        self.assertEqual(connect, 5)
+        self.assertLessEqual(read, 10)
+
+    @requests_mock.Mocker()
+    def test_deadline_exceeded(self, m):
+        from onos.deadline import Deadline, DeadlineExceeded
+        from xossynchronizer.steps.syncstep import DeferredException
+
+        m.post(self.url, status_code=200, json={})
+
+        deadline = Deadline(0.01, "sync of app org.onosproject.test")
+        time.sleep(0.02)
+
+        with self.assertRaises(DeadlineExceeded) as e:
+            deadline.wrap(lambda: self.session.post(self.url))()
+        self.assertEqual(m.call_count, 0)
+        self.assertIn("sync of app org.onosproject.test", str(e.exception))
+        # the model is going to be synchronized again
+        self.assertIsInstance(e.exception, DeferredException)
+
+    @requests_mock.Mocker()
+    def test_deadline_stops_retries(self, m):
+        from onos.deadline import Deadline, DeadlineExceeded
+
+        def timeout(request, context):
+            time.sleep(0.05)
+            raise requests.exceptions.ReadTimeout()
+
+        m.post(self.url, text=timeout)
+
+        with self.assertRaises(DeadlineExceeded):
+            Deadline(0.01).wrap(lambda: self.session.post(self.url))()
+        self.assertEqual(m.call_count, 1)
+
+    def test_propagate(self):
+        from onos.deadline import Deadline, current, propagate
+
+        deadline = Deadline(10)
+        seen = []
+
+        def work():
+            seen.append(current())
+
+        def spawn():
+            threads = [threading.Thread(target=work), threading.Thread(target=propagate(work))]
+            for t in threads:
+                t.start()
+                t.join()
+
+        deadline.wrap(spawn)()
+        self.assertEqual(seen, [None, deadline])
+        # the deadline is unbound once the work is done
+        self.assertIsNone(current())
+
+
+if __name__ == '__main__':
+    unittest.main()
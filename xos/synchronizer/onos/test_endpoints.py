@@ -0,0 +1,112 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestEndpointCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.endpoints import EndpointCache, Helpers
+
+        self.cache = EndpointCache()
+        self.config = {}
+        self.config_patch = patch.object(
+            Helpers, "get_onos_config",
+            side_effect=lambda section, key, default=None: self.config.get(key, default))
+        self.config_patch.start()
+
+        self.onos = Mock(spec=["id", "rest_hostname", "rest_port", "rest_username", "rest_password"])
+        self.onos.id = 1
+        self.onos.rest_hostname = "onos-url"
+        self.onos.rest_port = "8181"
+        self.onos.rest_username = "karaf"
+        self.onos.rest_password = "karaf"
+
+        # counts the trips to the XOS core
+        self.fetch = Mock(return_value=self.onos)
+
+    def tearDown(self):
+        self.config_patch.stop()
+        sys.path = self.sys_path_save
+
+    def test_get(self):
+        for _ in range(1000):
+            endpoint = self.cache.get(1, self.fetch)
+
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(endpoint.id, 1)
+        self.assertEqual(endpoint.base_url, "http://onos-url:8181")
+        self.assertEqual(endpoint.port, "8181")
+        self.assertEqual(endpoint.key, ("http://onos-url:8181", "karaf", "karaf"))
+        self.assertEqual((endpoint.auth.username, endpoint.auth.password), ("karaf", "karaf"))
+        self.assertEqual(self.cache.stats(), {"endpoints": 1, "hits": 999, "misses": 1})
+
+    def test_ttl(self):
+        self.config["ttl"] = 0
+
+        self.cache.get(1, self.fetch)
+        self.cache.get(1, self.fetch)
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_update(self):
+        self.cache.get(1, self.fetch)
+
+        # the ONOSService has been changed, and synchronized
+        self.onos.rest_hostname = "onos-new-url"
+        self.cache.update(self.onos)
+
+        endpoint = self.cache.get(1, self.fetch)
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(endpoint.base_url, "http://onos-new-url:8181")
+
+    def test_invalidate(self):
+        self.cache.get(1, self.fetch)
+        self.cache.invalidate(1)
+        self.cache.get(1, self.fetch)
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_session(self):
+        from onos.session import ONOSSessionPool
+
+        pool = ONOSSessionPool()
+        endpoint = self.cache.get(1, self.fetch)
+
+        # the endpoint and the model share the same session
+        self.assertIs(pool.get(endpoint), pool.get(self.onos))
+        self.assertEqual(pool.get(endpoint).base_url, "http://onos-url:8181")
+
+
+if __name__ == '__main__':
+    unittest.main()
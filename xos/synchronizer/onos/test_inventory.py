@@ -0,0 +1,104 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+URL = "http://onos-url:8181"
+
+
+class TestApplicationInventory(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.inventory import ApplicationInventory
+        from onos.session import ONOSSession
+
+        self.inventory = ApplicationInventory()
+        self.session = ONOSSession((URL, "karaf", "karaf"))
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def mock_onos(self, m):
+        m.get("%s/onos/v1/applications" % URL, status_code=200, json={"applications": [
+            {"name": "org.opencord.olt", "state": "INSTALLED", "version": "1.0.0"},
+        ]})
+
+    @requests_mock.Mocker()
+    def test_invalidate(self, m):
+        self.mock_onos(m)
+        m.get("%s/onos/v1/applications/org.opencord.olt" % URL, status_code=200,
+              json={"name": "org.opencord.olt", "state": "ACTIVE", "version": "1.0.0"})
+
+        self.assertEqual(self.inventory.get(self.session, "org.opencord.olt")["state"], "INSTALLED")
+
+        self.inventory.invalidate(self.session, "org.opencord.olt")
+        self.assertEqual(self.inventory.snapshot(self.session),
+                         {"org.opencord.olt": {"state": "ACTIVE", "version": "1.0.0"}})
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_new_cycle_while_reading(self, m):
+        self.mock_onos(m)
+
+        def new_cycle(request, context):
+            # another thread starts a new sync cycle
+            self.inventory.new_cycle()
+            return {"name": "org.opencord.olt", "state": "ACTIVE", "version": "1.0.0"}
+
+        m.get("%s/onos/v1/applications/org.opencord.olt" % URL, status_code=200, json=new_cycle)
+
+        self.inventory.get(self.session, "org.opencord.olt")
+        self.inventory.invalidate(self.session, "org.opencord.olt")
+        self.assertEqual(self.inventory.get(self.session, "org.opencord.olt")["state"], "ACTIVE")
+
+        # the new cycle reads everything again
+        self.assertEqual(self.inventory.get(self.session, "org.opencord.olt")["state"], "INSTALLED")
+
+    @requests_mock.Mocker()
+    def test_read_failure(self, m):
+        self.mock_onos(m)
+        m.get("%s/onos/v1/applications/org.opencord.olt" % URL, [
+            {"status_code": 500, "text": "Internal Server Error"},
+            {"status_code": 200, "json": {"name": "org.opencord.olt", "state": "ACTIVE", "version": "1.0.0"}},
+        ])
+
+        self.inventory.get(self.session, "org.opencord.olt")
+        self.inventory.invalidate(self.session, "org.opencord.olt")
+        with self.assertRaises(Exception):
+            self.inventory.get(self.session, "org.opencord.olt")
+
+        # still stale, it's read again
+        self.assertEqual(self.inventory.get(self.session, "org.opencord.olt")["state"], "ACTIVE")
+
+
+if __name__ == '__main__':
+    unittest.main()
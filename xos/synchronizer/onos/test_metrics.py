@@ -0,0 +1,150 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+import requests
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.helpers import Helpers
+        from onos.session import ONOSSession
+        from onos.metrics import metrics
+
+        self.config = {
+            ("retry", "max_attempts"): 2,
+            ("retry", "initial_backoff"): 0,
+        }
+        self.patcher = patch.object(Helpers, "get_onos_config",
+                                    side_effect=lambda section, key, default=None:
+                                    self.config.get((section, key), default))
+        self.patcher.start()
+
+        self.metrics = metrics
+        self.metrics.reset()
+        self.session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+        self.url = "http://onos-url:8181/onos/v1/applications"
+
+    def tearDown(self):
+        self.metrics.stop()
+        self.metrics.reset()
+        self.patcher.stop()
+        sys.path = self.sys_path_save
+
+    def test_histogram(self):
+        from onos.metrics import Histogram
+
+        histogram = Histogram("latency", "Latency", ["endpoint"], buckets=[0.1, 1])
+        histogram.observe(("onos",), 0.05)
+        histogram.observe(("onos",), 0.5)
+        histogram.observe(("onos",), 5)
+
+        self.assertEqual(histogram.render(), [
+            '# HELP latency Latency',
+            '# TYPE latency histogram',
+            'latency_bucket{endpoint="onos",le="0.1"} 1',
+            'latency_bucket{endpoint="onos",le="1"} 2',
+            'latency_bucket{endpoint="onos",le="+Inf"} 3',
+            'latency_sum{endpoint="onos"} 5.55',
+            'latency_count{endpoint="onos"} 3',
+        ])
+
+    def test_escape(self):
+        from onos.metrics import format_labels
+
+        self.assertEqual(format_labels(["name"], ['a "b"\\\n']), '{name="a \\"b\\"\\\\\\n"}')
+        self.assertEqual(format_labels([], []), "")
+
+    @requests_mock.Mocker()
+    def test_requests(self, m):
+        m.post(self.url, [{"status_code": 503}, {"status_code": 200, "json": {}}])
+        m.delete(self.url, exc=requests.exceptions.ConnectionError)
+
+        self.session.post(self.url, operation="install")
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.session.delete(self.url)
+
+        text = self.metrics.render()
+        endpoint = 'endpoint="http://onos-url:8181"'
+        # every attempt is counted
+        self.assertIn('onos_requests_total{%s,operation="install",method="POST",status="503"} 1' % endpoint, text)
+        self.assertIn('onos_requests_total{%s,operation="install",method="POST",status="200"} 1' % endpoint, text)
+        self.assertIn('onos_requests_total{%s,operation="default",method="DELETE",status="ConnectionError"} 2'
+                      % endpoint, text)
+        self.assertIn('onos_request_duration_seconds_count{%s,operation="install",method="POST"} 2' % endpoint, text)
+
+    def test_instrument_sync(self):
+        from onos.metrics import instrument_sync
+        from xossynchronizer.steps.syncstep import DeferredException
+
+        class Step(object):
+            @instrument_sync("sync")
+            def sync_record(self, o):
+                if o.id == 1:
+                    raise DeferredException("not yet")
+                if o.id == 2:
+                    raise Exception("failed")
+                return "done"
+
+        app = Mock(id=0, leaf_model_name="ONOSApp")
+        self.assertEqual(Step().sync_record(app), "done")
+        with self.assertRaises(DeferredException):
+            Step().sync_record(Mock(id=1, leaf_model_name="ONOSApp"))
+        with self.assertRaises(Exception):
+            Step().sync_record(Mock(id=2, leaf_model_name="ONOSService"))
+
+        text = self.metrics.render()
+        self.assertIn('onos_syncs_total{model="ONOSApp",action="sync",outcome="success"} 1', text)
+        self.assertIn('onos_syncs_total{model="ONOSApp",action="sync",outcome="deferred"} 1', text)
+        self.assertIn('onos_syncs_total{model="ONOSService",action="sync",outcome="failure"} 1', text)
+        self.assertIn('onos_sync_duration_seconds_count{model="ONOSApp",action="sync"} 2', text)
+
+    def test_endpoint(self):
+        self.config[("metrics", "enabled")] = True
+        self.config[("metrics", "port")] = 0
+
+        self.metrics.observe_sync("ONOSApp", "sync", "success", 0.1)
+        self.assertTrue(self.metrics.server)
+
+        port = self.metrics.server.server_address[1]
+        response = requests.get("http://127.0.0.1:%s/metrics" % port)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        self.assertIn('onos_syncs_total{model="ONOSApp",action="sync",outcome="success"} 1', response.text)
+
+        self.assertEqual(requests.get("http://127.0.0.1:%s/other" % port).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestNetcfg(unittest.TestCase):
+
+    def setUp(self):
+        self.sys_path_save = sys.path
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def test_netcfg_keys(self):
+        from onos.netcfg import netcfg_keys
+
+        self.assertEqual(netcfg_keys("/onos/v1/network/configuration/apps/org.opencord.olt/kafka"),
+                         ["apps", "org.opencord.olt", "kafka"])
+        self.assertEqual(netcfg_keys("onos/v1/network/configuration/"), [])
+        self.assertIsNone(netcfg_keys("/onos/v1/network/configurations"))
+        self.assertIsNone(netcfg_keys("/onos/v1/applications/org.opencord.olt"))
+
+    def test_split_subjects(self):
+        from onos.netcfg import split_subjects
+
+        self.assertEqual(split_subjects(["devices"], {
+            "of:0001": {"basic": {"driver": "voltha"}, "ports": {"1": {}}},
+            "of:0002": {"basic": {"driver": "voltha"}},
+        }), {
+            "devices/of:0001/basic": {"driver": "voltha"},
+            "devices/of:0001/ports": {"1": {}},
+            "devices/of:0002/basic": {"driver": "voltha"},
+        })
+        self.assertEqual(split_subjects([], {"ports": {"of:0001/1": {"interfaces": []}}}),
+                         {"ports/of:0001%2F1/interfaces": []})
+        self.assertEqual(split_subjects(["apps", "org.opencord.olt"], {}), {})
+        # a single subject
+        self.assertIsNone(split_subjects(["apps", "org.opencord.olt", "kafka"], {"servers": "kafka:9092"}))
+        # not a network configuration tree
+        self.assertIsNone(split_subjects(["apps"], {"org.opencord.olt": [1, 2]}))
+
+    def test_merge(self):
+        from onos.netcfg import merge
+
+        document = {}
+        self.assertTrue(merge(document, ["apps", "org.opencord.olt"], {"kafka": {"servers": "kafka:9092"}}))
+        self.assertTrue(merge(document, ["apps", "org.opencord.olt", "sadis"], {"entries": [1, 2]}))
+        self.assertTrue(merge(document, ["devices", "of:0001"], {"basic": {"driver": "voltha"}}))
+        self.assertTrue(merge(document, [], {"apps": {"org.opencord.dhcpl2relay": {"enabled": True}}}))
+
+        self.assertEqual(document, {
+            "apps": {
+                "org.opencord.olt": {"kafka": {"servers": "kafka:9092"}, "sadis": {"entries": [1, 2]}},
+                "org.opencord.dhcpl2relay": {"enabled": True}
+            },
+            "devices": {"of:0001": {"basic": {"driver": "voltha"}}}
+        })
+
+    def test_merge_conflict(self):
+        from onos.netcfg import merge
+
+        document = {"apps": {"org.opencord.olt": {"kafka": {"servers": "kafka:9092"}}}}
+        self.assertFalse(merge(document, ["apps", "org.opencord.olt", "kafka", "servers"], "other:9092"))
+        self.assertFalse(merge(document, ["apps", "org.opencord.olt", "kafka", "servers", "host"], "other"))
+        self.assertFalse(merge(document, ["apps"], {"org.opencord.olt": {"kafka": "other"}}))
+        self.assertFalse(merge(document, [], "not an object"))
+        # the document is left untouched
+        self.assertEqual(document, {"apps": {"org.opencord.olt": {"kafka": {"servers": "kafka:9092"}}}})
+
+        # the same value is not a conflict
+        self.assertTrue(merge(document, ["apps", "org.opencord.olt", "kafka", "servers"], "kafka:9092"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestPayloadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.payloads import PayloadCache
+        self.cache = PayloadCache()
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def test_get(self):
+        from onos.applied import content_hash
+
+        payload = self.cache.get(("ServiceInstanceAttribute", 1), u'{"olt": {"vlan": 1}, "name": "\u00e9"}')
+        self.assertIsNone(payload.error)
+        self.assertEqual(payload.value, {"olt": {"vlan": 1}, "name": u"\u00e9"})
+        self.assertEqual(payload.raw, '{"olt": {"vlan": 1}, "name": "\xc3\xa9"}')
+        self.assertEqual(payload.digest, content_hash({"name": u"\u00e9", "olt": {"vlan": 1}}))
+        self.assertEqual(payload.post_kwargs(), {"data": payload.raw, "headers": {"Content-Type": "application/json"}})
+
+        # parsed only once
+        self.assertIs(self.cache.get(("ServiceInstanceAttribute", 1), u'{"olt": {"vlan": 1}, "name": "\u00e9"}'),
+                      payload)
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 1, "invalid": 0})
+
+        # the content changed
+        changed = self.cache.get(("ServiceInstanceAttribute", 1), '{"olt": {"vlan": 2}}')
+        self.assertEqual(changed.value, {"olt": {"vlan": 2}})
+        self.assertEqual(len(self.cache.payloads), 1)
+
+    def test_invalid(self):
+        with patch("onos.payloads.json.loads", side_effect=ValueError("No JSON object could be decoded")) as loads:
+            for _ in range(3):
+                payload = self.cache.get(("ServiceAttribute", 1, "onos/v1/network/configuration"), "{")
+                self.assertEqual(payload.error, "No JSON object could be decoded")
+                self.assertIsNone(payload.value)
+
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(self.cache.stats, {"hits": 2, "misses": 1, "invalid": 1})
+
+    def test_eviction(self):
+        from onos.helpers import Helpers
+
+        def get_onos_config(section, key, default=None):
+            return 2 if (section, key) == ("payloads", "max_entries") else default
+
+        with patch.object(Helpers, "get_onos_config", side_effect=get_onos_config):
+            self.cache.get(1, '{"id": 1}')
+            self.cache.get(2, '{"id": 2}')
+            self.cache.get(1, '{"id": 1}')
+            self.cache.get(3, '{"id": 3}')
+
+        # the least recently used is evicted
+        self.assertEqual(self.cache.payloads.keys(), [1, 3])
+
+        self.cache.forget(1)
+        self.assertEqual(self.cache.payloads.keys(), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
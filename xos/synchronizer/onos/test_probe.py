@@ -0,0 +1,163 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import json
+from mock import patch, Mock
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestStateProbe(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        import onos.probe as onos_probe
+        reload(onos_probe)  # pick up the model classes of the reloaded model accessor
+        from onos.probe import StateProbe
+        from onos.inventory import app_inventory
+        from xossynchronizer.modelaccessor import ServiceAttribute
+
+        app_inventory.new_cycle()
+
+        self.probe = StateProbe
+        self.ServiceAttribute = ServiceAttribute
+
+        self.onos = Mock()
+        self.onos.id = 1
+        self.onos.rest_hostname = "onos-url"
+        self.onos.rest_port = "8181"
+        self.onos.rest_username = "karaf"
+        self.onos.rest_password = "karaf"
+
+        self.apps = [
+            self.create_app("org.opencord.sadis"),
+            self.create_app("org.opencord.olt"),
+            self.create_app("org.opencord.aaa", url="http://artifacts/aaa.oar", version="2.0.0"),
+            self.create_app("org.opencord.kafka"),
+        ]
+
+        self.attrs = [
+            self.create_attr("/onos/v1/network/configuration/apps/org.opencord.sadis", {"sadis": {"url": "x"}}),
+            self.create_attr("/onos/v1/network/configuration/apps/org.opencord.olt", {"olt": {"vlan": 1}}),
+            self.create_attr("/onos/v1/network/configuration/apps/org.opencord.kafka", {"kafka": {"server": "k"}}),
+            self.create_attr("/onos/v1/configuration/org.opencord.olt.impl.Olt", {"enableDhcpOnProvisioning": True}),
+        ]
+
+        self.applications = {"applications": [
+            {"name": "org.opencord.sadis", "state": "ACTIVE", "version": "1.0.0"},
+            {"name": "org.opencord.olt", "state": "INSTALLED", "version": "1.0.0"},
+            {"name": "org.opencord.aaa", "state": "ACTIVE", "version": "1.0.0"},
+        ]}
+
+        self.netcfg = {
+            "apps": {
+                "org.opencord.sadis": {"sadis": {"url": "x", "cache": {"enabled": False}}},
+                "org.opencord.olt": {"olt": {"vlan": 2}},
+            },
+            "devices": {"of:0000000000000001": {"basic": {"driver": "voltha"}}},
+        }
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def create_app(self, app_id, url=None, version=None):
+        app = Mock()
+        app.app_id = app_id
+        app.url = url
+        app.version = version
+        return app
+
+    def create_attr(self, name, value):
+        attr = Mock()
+        attr.name = name
+        attr.value = json.dumps(value)
+        return attr
+
+    @requests_mock.Mocker()
+    def test_diverged_models(self, m):
+        m.get("http://onos-url:8181/onos/v1/applications", status_code=200, json=self.applications)
+        m.get("http://onos-url:8181/onos/v1/network/configuration", status_code=200, json=self.netcfg)
+
+        service_attr = self.create_attr("/onos/v1/network/configuration/devices/of:0000000000000001",
+                                        {"basic": {"driver": "voltha"}})
+
+        with patch.object(self.ServiceAttribute.objects, "filter") as service_attrs:
+            service_attrs.return_value = [service_attr]
+            diverged = self.probe.diverged_models(self.onos, self.apps, self.attrs)
+
+        service_attrs.assert_called_with(service_id=1)
+        self.assertEqual(diverged, [
+            (self.apps[1], "not active"),
+            (self.apps[2], "version 1.0.0 installed, 2.0.0 requested"),
+            (self.apps[3], "not installed"),
+            (self.attrs[1], "different"),
+            (self.attrs[2], "missing"),
+            (self.attrs[3], "not a network configuration"),
+        ])
+
+        # ONOS is read only once
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_service_config_diverged(self, m):
+        m.get("http://onos-url:8181/onos/v1/applications", status_code=200, json=self.applications)
+        m.get("http://onos-url:8181/onos/v1/network/configuration", status_code=200, json=self.netcfg)
+
+        service_attr = self.create_attr("/onos/v1/network/configuration/devices/of:0000000000000001",
+                                        {"basic": {"driver": "default"}})
+
+        with patch.object(self.ServiceAttribute.objects, "filter") as service_attrs:
+            service_attrs.return_value = [service_attr]
+            diverged = self.probe.diverged_models(self.onos, [], [])
+
+        self.assertEqual(diverged, [
+            (self.onos, "/onos/v1/network/configuration/devices/of:0000000000000001: different")
+        ])
+
+    @requests_mock.Mocker()
+    def test_onos_not_ready(self, m):
+        m.get("http://onos-url:8181/onos/v1/applications", status_code=503, text="not ready")
+
+        with patch.object(self.ServiceAttribute.objects, "filter") as service_attrs:
+            service_attrs.return_value = []
+            with self.assertRaises(Exception):
+                self.probe.diverged_models(self.onos, self.apps, self.attrs)
+
+
+if __name__ == '__main__':
+    unittest.main()
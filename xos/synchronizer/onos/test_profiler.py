@@ -0,0 +1,147 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+import requests_mock
+import json
+import pstats
+import shutil
+import tempfile
+import threading
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.helpers import Helpers
+        from onos.profiler import profiler, profile_sync
+        from onos.session import ONOSSession
+
+        self.directory = tempfile.mkdtemp()
+        self.config = {
+            ("profiling", "enabled"): True,
+            ("profiling", "directory"): self.directory,
+            ("profiling", "dump_interval"): 3600,
+        }
+        self.patcher = patch.object(Helpers, "get_onos_config",
+                                    side_effect=lambda section, key, default=None:
+                                    self.config.get((section, key), default))
+        self.patcher.start()
+
+        self.profiler = profiler
+        self.profiler.reset()
+        self.session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+        self.url = "http://onos-url:8181/onos/v1/applications"
+
+        session = self.session
+        url = self.url
+
+        class SyncStep(object):
+            @profile_sync("sync")
+            def sync_record(self, o):
+                # part of the work is done by another thread, as run_concurrently does
+                def work():
+                    json.loads(json.dumps([{"id": i} for i in range(1000)]))
+                    session.get(url)
+                t = threading.Thread(target=profiler.propagate(work))
+                t.start()
+                t.join()
+                return "done"
+
+        self.step = SyncStep()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.profiler.reset()
+        self.patcher.stop()
+        sys.path = self.sys_path_save
+
+    def test_categorize(self):
+        from onos.profiler import categorize
+
+        self.assertEqual(categorize(("/usr/lib/python2.7/json/encoder.py", 1, "encode")), "json")
+        self.assertEqual(categorize(("/site-packages/requests/sessions.py", 1, "request")), "http")
+        self.assertEqual(categorize(("/site-packages/xosapi/orm.py", 1, "__getattr__")), "orm")
+        self.assertEqual(categorize(("/site-packages/multistructlog.py", 1, "info")), "logging")
+        self.assertIsNone(categorize(("/opt/xos/synchronizers/onos/steps/sync_onos_app.py", 1, "sync_record")))
+        self.assertIsNone(categorize(("~", 0, "<method 'recv' of '_socket.socket' objects>")))
+
+    def test_disabled(self):
+        self.config[("profiling", "enabled")] = False
+
+        fn = Mock()
+        self.assertIs(self.profiler.propagate(fn), fn)
+
+        with requests_mock.Mocker() as m:
+            m.get(self.url, status_code=200, json={})
+            self.assertEqual(self.step.sync_record(Mock(id=1, leaf_model_name="ONOSApp")), "done")
+
+        self.assertEqual(self.profiler.aggregates, {})
+        self.assertEqual(len(self.profiler.calls), 0)
+
+    @requests_mock.Mocker()
+    def test_profile(self, m):
+        m.get(self.url, status_code=200, json={})
+
+        self.assertEqual(self.step.sync_record(Mock(id=1, leaf_model_name="ONOSApp")), "done")
+        self.step.sync_record(Mock(id=2, leaf_model_name="ONOSApp"))
+
+        self.assertEqual(self.profiler.aggregates.keys(), [("SyncStep", "ONOSApp")])
+        self.assertEqual(len(self.profiler.calls), 2)
+
+        call = self.profiler.calls[0]
+        self.assertEqual((call["step"], call["model"], call["action"], call["id"]), ("SyncStep", "ONOSApp", "sync", 1))
+        # the work done by the other thread is accounted to the call
+        self.assertGreater(call["json"], 0)
+        self.assertGreater(call["http"], 0)
+        self.assertLessEqual(call["json"] + call["http"], call["wall"])
+
+        # the thread is not profiled anymore
+        self.assertIsNone(self.profiler.current())
+
+    @requests_mock.Mocker()
+    def test_dump(self, m):
+        m.get(self.url, status_code=200, json={})
+        self.config[("profiling", "dump_interval")] = 0
+
+        self.step.sync_record(Mock(id=1, leaf_model_name="ONOSApp"))
+
+        stats = pstats.Stats(os.path.join(self.directory, "SyncStep.ONOSApp.prof"))
+        self.assertTrue(any(name == "loads" for (_, _, name) in stats.stats.keys()))
+
+        with open(os.path.join(self.directory, "calls.json")) as f:
+            calls = json.load(f)
+        self.assertEqual([c["id"] for c in calls], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestReadinessGates(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.steps.syncstep import DeferredException
+        from onos.readiness import ReadinessGates
+        from onos.session import ONOSSession
+
+        self.DeferredException = DeferredException
+        self.gates = ReadinessGates()
+        self.session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    @requests_mock.Mocker()
+    def test_open_by_default(self, m):
+        self.gates.check(self.session)
+        self.assertFalse(m.called)
+
+    @requests_mock.Mocker()
+    def test_closed_until_ready(self, m):
+        m.get("http://onos-url:8181/onos/v1/cluster", [{"status_code": 503}, {"status_code": 200, "json": {}}])
+
+        self.gates.close(self.session)
+
+        with self.assertRaises(self.DeferredException) as e:
+            self.gates.check(self.session)
+        self.assertEqual(e.exception.message,
+                         "Deferring synchronization as ONOS http://onos-url:8181 is not ready yet")
+
+        # ONOS is not probed again before the backoff expires
+        with self.assertRaises(self.DeferredException):
+            self.gates.check(self.session)
+        self.assertEqual(m.call_count, 1)
+
+        self.gates.get(self.session).next_probe = 0
+        self.gates.check(self.session)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self.gates.stats["probes"], 2)
+        self.assertEqual(self.gates.stats["failed_probes"], 1)
+        self.assertEqual(self.gates.stats["deferred"], 2)
+
+    @requests_mock.Mocker()
+    def test_wait_ready(self, m):
+        m.get("http://onos-url:8181/onos/v1/cluster", [{"status_code": 503}, {"status_code": 503},
+                                                       {"status_code": 200, "json": {}}])
+
+        self.gates.close(self.session)
+        with patch.object(self.gates, "backoff", return_value=0):
+            self.assertTrue(self.gates.wait_ready(self.session))
+        self.assertEqual(m.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_max_wait(self, m):
+        m.get("http://onos-url:8181/onos/v1/cluster", status_code=503)
+
+        self.gates.close(self.session)
+        self.gates.get(self.session).closed_at -= 3600
+
+        self.assertFalse(self.gates.wait_ready(self.session))
+        self.gates.check(self.session)
+        self.assertFalse(m.called)
+        self.assertEqual(self.gates.stats["expired"], 1)
+
+    def test_backoff(self):
+        self.assertTrue(0.5 <= self.gates.backoff(1) <= 1)
+        self.assertTrue(4 <= self.gates.backoff(4) <= 8)
+        self.assertTrue(15 <= self.gates.backoff(20) <= 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestResync(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        import onos.resync as onos_resync
+        reload(onos_resync)  # pick up the model classes of the reloaded model accessor
+        from xossynchronizer.modelaccessor import ONOSApp, ONOSService, ServiceInstanceAttribute
+
+        self.resync = onos_resync
+        self.ONOSApp = ONOSApp
+        self.ServiceInstanceAttribute = ServiceInstanceAttribute
+
+        self.onos = ONOSService(id=1, name="myonos")
+        self.olt = ONOSApp(id=10, name="olt", owner_id=1)
+        self.aaa = ONOSApp(id=12, name="aaa", owner_id=1)
+        # app of another ONOSService, between the ids of olt and aaa
+        self.dhcp = ONOSApp(id=11, name="dhcp", owner_id=2)
+
+        self.attrs = [
+            ServiceInstanceAttribute(id=30, service_instance_id=10, name="foo", value="bar"),
+            ServiceInstanceAttribute(id=31, service_instance_id=11, name="foo", value="bar"),
+            ServiceInstanceAttribute(id=32, service_instance_id=12, name="foo", value="bar"),
+        ]
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def test_service_models(self):
+        with patch.object(self.ONOSApp.objects, "get_items") as apps, \
+                patch.object(self.ServiceInstanceAttribute.objects, "filter") as attrs:
+            apps.return_value = [self.olt, self.dhcp, self.aaa]
+            attrs.return_value = self.attrs
+
+            (onos_apps, onos_attrs) = self.resync.service_models(self.onos)
+
+            self.assertEqual(onos_apps, [self.olt, self.aaa])
+            # the attribute of dhcp is in the range, but it belongs to another ONOSService
+            self.assertEqual(onos_attrs, [self.attrs[0], self.attrs[2]])
+            attrs.assert_called_once_with(service_instance_id__gte=10, service_instance_id__lte=12)
+
+    def test_service_models_without_apps(self):
+        with patch.object(self.ONOSApp.objects, "get_items") as apps, \
+                patch.object(self.ServiceInstanceAttribute.objects, "filter") as attrs:
+            apps.return_value = [self.dhcp]
+
+            self.assertEqual(self.resync.service_models(self.onos), ([], []))
+            self.assertFalse(attrs.called)
+
+    def test_dirty(self):
+        failing = Mock(backend_code=1)
+        failing.save.side_effect = Exception("boom")
+
+        with patch.object(self.ONOSApp, "save", autospec=True) as app_save, \
+                patch.object(self.resync, "log") as log:
+            self.resync.dirty([self.olt, failing, self.aaa], "resynchronize")
+
+        for app in (self.olt, self.aaa):
+            self.assertEqual(app.backend_code, 0)
+            self.assertEqual(app.backend_status, "resynchronize")
+        self.assertEqual(app_save.call_count, 2)
+        app_save.assert_called_with(self.aaa, update_fields=["updated", "backend_code", "backend_status"],
+                                    always_update_timestamp=True)
+        log.error.assert_called_once_with("Failed to dirty model", model=failing, error="boom")
+
+
+if __name__ == '__main__':
+    unittest.main()
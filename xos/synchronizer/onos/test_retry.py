@@ -0,0 +1,174 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+import requests
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.helpers import Helpers
+        from onos.session import ONOSSession
+
+        self.config = {
+            ("retry", "max_attempts"): 3,
+            ("retry", "initial_backoff"): 0,
+            ("circuit", "failure_threshold"): 2,
+            ("circuit", "reset_timeout"): 30,
+        }
+        self.patcher = patch.object(Helpers, "get_onos_config",
+                                    side_effect=lambda section, key, default=None:
+                                    self.config.get((section, key), default))
+        self.patcher.start()
+
+        self.session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+        self.url = "http://onos-url:8181/onos/v1/applications"
+
+    def tearDown(self):
+        self.patcher.stop()
+        sys.path = self.sys_path_save
+
+    def response(self, status_code):
+        response = Mock()
+        response.status_code = status_code
+        return response
+
+    def test_classify(self):
+        from onos.retry import classify, SUCCESS, RETRYABLE, FATAL
+
+        self.assertEqual(classify(self.response(200)), SUCCESS)
+        self.assertEqual(classify(self.response(204)), SUCCESS)
+        self.assertEqual(classify(self.response(404)), SUCCESS)
+        self.assertEqual(classify(self.response(409)), SUCCESS)
+        self.assertEqual(classify(self.response(400)), FATAL)
+        self.assertEqual(classify(self.response(401)), FATAL)
+        self.assertEqual(classify(self.response(503)), RETRYABLE)
+        self.assertEqual(classify(self.response(500)), RETRYABLE)
+        self.assertEqual(classify(requests.exceptions.ConnectionError()), RETRYABLE)
+        self.assertEqual(classify(requests.exceptions.ReadTimeout()), RETRYABLE)
+        self.assertEqual(classify(ValueError()), FATAL)
+
+    def test_backoff(self):
+        from onos.retry import RetryPolicy
+
+        policy = RetryPolicy(max_attempts=5, initial_backoff=0.5, max_backoff=3)
+        self.assertEqual([policy.backoff(a) for a in range(1, 6)], [0.5, 1, 2, 3, 3])
+
+    @requests_mock.Mocker()
+    def test_retry(self, m):
+        m.get(self.url, [{"status_code": 503}, {"exc": requests.exceptions.ConnectionError},
+                         {"status_code": 200, "json": {}}])
+
+        self.config[("circuit", "failure_threshold")] = 5
+        self.assertEqual(self.session.get(self.url).status_code, 200)
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(self.session.stats()["retries"], 2)
+        self.assertEqual(self.session.breaker.state, "closed")
+
+    @requests_mock.Mocker()
+    def test_fatal_is_not_retried(self, m):
+        m.get(self.url, status_code=400, text="bad request")
+
+        self.assertEqual(self.session.get(self.url).status_code, 400)
+        self.assertEqual(m.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_retries_exhausted(self, m):
+        m.get(self.url, exc=requests.exceptions.ConnectionError)
+
+        self.config[("circuit", "failure_threshold")] = 0
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.session.get(self.url)
+        self.assertEqual(m.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_file_upload_is_rewound(self, m):
+        received = []
+
+        def read_body(request, context):
+            received.append(request.body.read())
+            context.status_code = 503 if len(received) == 1 else 200
+            return ""
+
+        m.post(self.url, text=read_body)
+
+        from io import BytesIO
+        self.session.post(self.url, data=BytesIO(b"oar content"))
+        self.assertEqual(received, [b"oar content", b"oar content"])
+
+    @requests_mock.Mocker()
+    def test_circuit_breaker(self, m):
+        from onos.retry import CircuitOpenException
+
+        m.get(self.url, status_code=503)
+
+        # the circuit opens after two failures, the third attempt is not performed
+        with self.assertRaises(CircuitOpenException):
+            self.session.get(self.url)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self.session.breaker.state, "open")
+
+        # fail fast
+        with self.assertRaises(CircuitOpenException):
+            self.session.get(self.url)
+        self.assertEqual(m.call_count, 2)
+
+        # half-open, a single trial that fails opens the circuit again
+        self.session.breaker.opened_at -= 60
+        with self.assertRaises(CircuitOpenException):
+            self.session.get(self.url)
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(self.session.breaker.state, "open")
+
+        # half-open, a single trial that succeeds closes the circuit
+        m.get(self.url, status_code=200, json={})
+        self.session.breaker.opened_at -= 60
+        self.assertEqual(self.session.get(self.url).status_code, 200)
+        self.assertEqual(self.session.breaker.state, "closed")
+        self.assertEqual(self.session.breaker.stats["opened"], 2)
+
+    @requests_mock.Mocker()
+    def test_probe_bypasses_the_circuit(self, m):
+        m.get(self.url, status_code=503)
+
+        self.session.breaker.record(False)
+        self.session.breaker.record(False)
+        self.assertEqual(self.session.breaker.state, "open")
+
+        self.assertEqual(self.session.get(self.url, retry=False).status_code, 503)
+        self.assertEqual(m.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import Mock
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestONOSSessionPool(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        from onos.session import ONOSSessionPool
+
+        self.pool = ONOSSessionPool()
+
+        self.onos = self.create_onos(1, "onos-url")
+
+    def tearDown(self):
+        self.onos = None
+        sys.path = self.sys_path_save
+
+    def create_onos(self, id, hostname):
+        onos = Mock()
+        onos.id = id
+        onos.rest_hostname = hostname
+        onos.rest_port = "8181"
+        onos.rest_username = "karaf"
+        onos.rest_password = "karaf"
+        return onos
+
+    def test_session_reuse(self):
+        session = self.pool.get(self.onos)
+
+        self.assertEqual(session.base_url, "http://onos-url:8181")
+        self.assertEqual(session.auth.username, "karaf")
+        self.assertEqual(session.auth.password, "karaf")
+        self.assertIs(self.pool.get(self.onos), session)
+        self.assertEqual(self.pool.stats()["sessions_created"], 1)
+
+    @requests_mock.Mocker()
+    def test_session_stats(self, m):
+        m.get("http://onos-url:8181/onos/v1/applications", status_code=200, json={})
+
+        session = self.pool.get(self.onos)
+        session.get("http://onos-url:8181/onos/v1/applications")
+        self.pool.get(self.onos).get("http://onos-url:8181/onos/v1/applications")
+
+        stats = self.pool.stats()
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["endpoints"]["http://onos-url:8181"]["requests"], 2)
+
+    @requests_mock.Mocker()
+    def test_request_many(self, m):
+        m.post("http://onos-url:8181/onos/v1/network/configuration/devices/of:01", status_code=200)
+        m.delete("http://onos-url:8181/onos/v1/network/configuration/devices/of:02", status_code=204)
+        m.post("http://onos-url:8181/onos/v1/network/configuration/devices/of:03", status_code=404)
+
+        session = self.pool.get(self.onos)
+        calls = [
+            ("POST", "http://onos-url:8181/onos/v1/network/configuration/devices/of:01", {"json": {"foo": "bar"}}),
+            ("DELETE", "http://onos-url:8181/onos/v1/network/configuration/devices/of:02", {}),
+            ("POST", "http://onos-url:8181/onos/v1/network/configuration/devices/of:03", {"json": {}}),
+            ("GET", "http://onos-url:8181/onos/v1/unknown", {}),
+        ]
+        results = session.request_many(calls, operation="netcfg", workers=4)
+
+        # the results are in the order of the calls, whatever the order they completed in
+        self.assertEqual([r.status_code for r in results[:3]], [200, 204, 404])
+        self.assertIsInstance(results[3], Exception)
+        posted = [r for r in m.request_history if r.url.endswith("of:01")]
+        self.assertEqual(posted[0].json(), {"foo": "bar"})
+
+    def test_drop_session_on_endpoint_change(self):
+        session = self.pool.get(self.onos)
+
+        self.onos.rest_password = "changed"
+        new_session = self.pool.get(self.onos)
+
+        self.assertIsNot(new_session, session)
+        self.assertEqual(new_session.auth.password, "changed")
+        self.assertEqual(self.pool.stats()["sessions_dropped"], 1)
+        self.assertEqual(len(self.pool.sessions), 1)
+
+    def test_shared_endpoint_is_not_dropped(self):
+        other = self.create_onos(2, "onos-url")
+
+        session = self.pool.get(self.onos)
+        self.assertIs(self.pool.get(other), session)
+
+        self.pool.drop(self.onos.id)
+        self.assertIs(self.pool.get(other), session)
+        self.assertEqual(self.pool.stats()["sessions_dropped"], 0)
+
+        self.pool.drop(other.id)
+        self.assertEqual(self.pool.stats()["sessions_dropped"], 1)
+        self.assertEqual(self.pool.sessions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from mock import patch, Mock
+import requests_mock
+import json
+import shutil
+import tempfile
+import threading
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from onos.helpers import Helpers
+        from onos.session import ONOSSession
+        from onos.tracing import trace_sync, traced
+        from onos.workers import bind_context
+        from xossynchronizer.steps.syncstep import DeferredException
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "traces.json")
+        self.config = {
+            ("tracing", "enabled"): True,
+            ("tracing", "exporter"): "file",
+            ("tracing", "path"): self.path,
+        }
+        self.patcher = patch.object(Helpers, "get_onos_config",
+                                    side_effect=lambda section, key, default=None:
+                                    self.config.get((section, key), default))
+        self.patcher.start()
+
+        session = ONOSSession(("http://onos-url:8181", "karaf", "karaf"))
+        self.url = "http://onos-url:8181/onos/v1/applications"
+        url = self.url
+
+        class SyncStep(object):
+            @trace_sync("sync")
+            def sync_record(self, o):
+                # the work is done by another thread, as run_concurrently does
+                result = {}
+
+                def install():
+                    try:
+                        result["value"] = self.install_app(o, session)
+                    except Exception as e:
+                        result["error"] = e
+
+                t = threading.Thread(target=bind_context(install))
+                t.start()
+                t.join()
+                if "error" in result:
+                    raise result["error"]
+                return result["value"]
+
+            @traced
+            def install_app(self, o, session):
+                if o.id == 2:
+                    raise DeferredException("not yet")
+                session.get(url)
+                session.post(url, json={"url": o.url})
+                return "done"
+
+        self.step = SyncStep()
+        self.app = Mock(spec=["id", "app_id", "url", "leaf_model_name"])
+        self.app.id = 1
+        self.app.app_id = "org.onosproject.vrouter"
+        self.app.url = "http://artifacts/vrouter.oar"
+        self.app.leaf_model_name = "ONOSApp"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.patcher.stop()
+        sys.path = self.sys_path_save
+
+    def read_spans(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    @requests_mock.Mocker()
+    def test_trace(self, m):
+        m.get(self.url, status_code=200, json={})
+        m.post(self.url, status_code=400, reason="Bad Request")
+
+        self.assertEqual(self.step.sync_record(self.app), "done")
+
+        spans = self.read_spans()
+        self.assertEqual([s["name"] for s in spans],
+                         ["SyncStep.sync_record", "install_app", "GET /onos/v1/applications",
+                          "POST /onos/v1/applications"])
+        self.assertEqual(len(set(s["trace_id"] for s in spans)), 1)
+
+        (root, install, get, post) = spans
+        self.assertIsNone(root["parent_id"])
+        self.assertEqual(install["parent_id"], root["span_id"])
+        self.assertEqual(get["parent_id"], install["span_id"])
+        self.assertEqual(post["parent_id"], install["span_id"])
+
+        self.assertEqual(root["attributes"], {"action": "sync", "model": "ONOSApp", "model_id": 1,
+                                              "app_id": "org.onosproject.vrouter"})
+        self.assertEqual(install["attributes"]["endpoint"], "http://onos-url:8181")
+        self.assertEqual(get["attributes"], {"endpoint": "http://onos-url:8181", "operation": "default",
+                                             "status_code": 200})
+        self.assertEqual(get["status"], "ok")
+        self.assertEqual(post["status"], "error")
+        self.assertEqual(post["error"], "Bad Request")
+        self.assertLessEqual(get["duration"], root["duration"])
+
+    def test_deferred(self):
+        from xossynchronizer.steps.syncstep import DeferredException
+
+        self.app.id = 2
+        with self.assertRaises(DeferredException):
+            self.step.sync_record(self.app)
+
+        (root, install) = self.read_spans()
+        self.assertEqual(root["status"], "deferred")
+        self.assertEqual(install["status"], "deferred")
+        self.assertEqual(install["error"], "not yet")
+
+    @requests_mock.Mocker()
+    def test_min_duration(self, m):
+        m.get(self.url, status_code=200, json={})
+        m.post(self.url, status_code=200, json={})
+        self.config[("tracing", "min_duration")] = 60
+
+        self.step.sync_record(self.app)
+        self.assertFalse(os.path.exists(self.path))
+
+    @requests_mock.Mocker()
+    def test_disabled(self, m):
+        from onos.tracing import tracer
+
+        m.get(self.url, status_code=200, json={})
+        m.post(self.url, status_code=200, json={})
+        self.config[("tracing", "enabled")] = False
+
+        self.assertEqual(self.step.sync_record(self.app), "done")
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIsNone(tracer.current())
+
+
+if __name__ == '__main__':
+    unittest.main()
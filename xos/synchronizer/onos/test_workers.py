@@ -0,0 +1,97 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import threading
+import time
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+# the helpers are imported as the steps import them, from the onos package
+sys.path.append(os.path.join(test_path, ".."))
+
+
+class TestONOSWorkers(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        import onos.workers as onos_workers
+        self.workers = onos_workers
+
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def tearDown(self):
+        sys.path = self.sys_path_save
+
+    def track(self, item, semaphore=None):
+        if semaphore:
+            semaphore.acquire()
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if semaphore:
+            semaphore.release()
+        if item % 2:
+            raise Exception("odd item %s" % item)
+
+    def test_run_concurrently(self):
+        errors = self.workers.run_concurrently(self.track, range(6), 3)
+
+        self.assertEqual(self.max_running, 3)
+        self.assertEqual([(item, str(e)) for (item, e) in errors],
+                         [(1, "odd item 1"), (3, "odd item 3"), (5, "odd item 5")])
+
+    def test_run_sequentially(self):
+        errors = self.workers.run_concurrently(self.track, range(4), 1)
+
+        self.assertEqual(self.max_running, 1)
+        self.assertEqual(len(errors), 2)
+
+    def test_endpoint_limiter(self):
+        limiter = self.workers.EndpointLimiter("install", "max_in_flight", 2)
+        semaphore = limiter.get("http://onos-url:8181")
+
+        self.assertIs(limiter.get("http://onos-url:8181"), semaphore)
+        self.assertIsNot(limiter.get("http://other-onos:8181"), semaphore)
+
+        self.workers.run_concurrently(lambda item: self.track(item, semaphore), range(6), 6)
+        self.assertEqual(self.max_running, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import json
+import time
+import uuid
+import threading
+import functools
+import contextlib
+from xossynchronizer.steps.syncstep import DeferredException
+
+from xosconfig import Config
+from multistructlog import create_logger
+
+from onos.helpers import Helpers
+
+log = create_logger(Config().get('logging'))
+
+OK = "ok"
+ERROR = "error"
+DEFERRED = "deferred"
+
+_local = threading.local()
+
+
+def _new_id():
+    return uuid.uuid4().hex[:16]
+
+
+class Trace(object):
+    """
+    All the spans of a synchronization
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.spans = []
+        self.done = False
+
+    def add(self, span):
+        with self.lock:
+            if not self.done:
+                # the spans that outlive the synchronization are dropped
+                self.spans.append(span)
+
+    def finish(self):
+        with self.lock:
+            self.done = True
+            return list(self.spans)
+
+
+class Span(object):
+
+    def __init__(self, trace, name, parent=None, start=None, **attributes):
+        self.trace = trace
+        self.id = _new_id()
+        self.parent = parent
+        self.name = name
+        self.attributes = attributes
+        self.start = start or time.time()
+        self.duration = None
+        self.status = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, status=ERROR, error=None):
+        self.status = status
+        self.error = error
+
+    def finish(self, duration=None):
+        self.duration = duration if duration is not None else time.time() - self.start
+        if self.status is None:
+            self.status = OK
+        self.trace.add(self)
+
+    def to_dict(self):
+        attributes = {}
+        for (k, v) in self.attributes.items():
+            if v is None:
+                continue
+            attributes[k] = v if isinstance(v, (basestring, int, long, float, bool)) else str(v)
+        return {
+            "trace_id": self.trace.id,
+            "span_id": self.id,
+            "parent_id": self.parent.id if self.parent else None,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": attributes,
+        }
+
+
+class Tracer(object):
+    """
+    Lightweight tracing of the synchronizations. Every sync_record and delete_record opens a trace (see trace_sync),
+    the steps they go through and every REST call towards ONOS are child spans.
+
+    When the synchronization completes its spans are exported as JSON lines, to stdout or to a file, so that slow
+    synchronizations can be inspected offline. Only the traces lasting at least min_duration seconds are exported.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        return Helpers.get_onos_config("tracing", "enabled", False)
+
+    @staticmethod
+    def current():
+        """
+        :return: the Span the running thread is working for, or None
+        """
+        return getattr(_local, "span", None)
+
+    @contextlib.contextmanager
+    def span(self, name, root=False, **attributes):
+        """
+        Trace a block of code, as a child of the current span. Nothing is traced if there's no current span,
+        unless root is True and the tracing is enabled.
+        :return: context manager yielding the Span, or None
+        """
+        parent = self.current()
+        if parent is None and not (root and self.enabled()):
+            yield None
+            return
+
+        span = Span(parent.trace if parent else Trace(), name, parent, **attributes)
+        _local.span = span
+        try:
+            yield span
+        except DeferredException as e:
+            span.fail(DEFERRED, str(e))
+            raise
+        except Exception as e:
+            span.fail(ERROR, str(e))
+            raise
+        finally:
+            _local.span = parent
+            span.finish()
+            if parent is None:
+                self.export(span)
+
+    def record(self, name, start, duration, status=OK, error=None, **attributes):
+        """
+        Add a span that already completed to the current span, eg: one of many REST calls performed concurrently
+        """
+        parent = self.current()
+        if parent is None:
+            return
+        span = Span(parent.trace, name, parent, start=start, **attributes)
+        if status != OK:
+            span.fail(status, error)
+        span.finish(duration)
+
+    def propagate(self, fn):
+        """
+        Bind the current span to fn, eg: when fn is going to be called by other threads
+        """
+        span = self.current()
+        if span is None:
+            return fn
+
+        def bound(*args, **kwargs):
+            previous = self.current()
+            _local.span = span
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _local.span = previous
+        return bound
+
+    def export(self, root):
+        spans = root.trace.finish()
+        if root.duration < Helpers.get_onos_config("tracing", "min_duration", 0):
+            return
+
+        lines = "".join(json.dumps(span.to_dict(), sort_keys=True) + "\n"
+                        for span in sorted(spans, key=lambda s: s.start))
+        exporter = Helpers.get_onos_config("tracing", "exporter", "stdout")
+        try:
+            with self.lock:
+                if exporter == "file":
+                    with open(Helpers.get_onos_config("tracing", "path", "/tmp/onos-traces.json"), "a") as f:
+                        f.write(lines)
+                else:
+                    sys.stdout.write(lines)
+                    sys.stdout.flush()
+        except Exception as e:
+            log.error("Failed to export trace", trace=root.trace.id, error=str(e))
+
+
+tracer = Tracer()
+
+
+def model_attributes(o):
+    attributes = {
+        "model": getattr(o, "leaf_model_name", type(o).__name__),
+        "model_id": getattr(o, "id", None),
+    }
+    if hasattr(o, "app_id"):
+        attributes["app_id"] = o.app_id
+    return attributes
+
+
+def trace_sync(action):
+    """
+    Decorate SyncStep.sync_record or SyncStep.delete_record to open a trace for every synchronization
+    :param action: "sync" or "delete"
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def traced_sync(self, o):
+            if not tracer.enabled():
+                return fn(self, o)
+            with tracer.span("%s.%s" % (type(self).__name__, fn.__name__), root=True, action=action,
+                             **model_attributes(o)):
+                return fn(self, o)
+        return traced_sync
+    return decorator
+
+
+def traced(fn):
+    """
+    Decorate a method of a SyncStep taking a model as first argument (and possibly an ONOSSession) to trace it
+    as a child span of the synchronization
+    """
+    @functools.wraps(fn)
+    def traced_method(self, o, *args, **kwargs):
+        if tracer.current() is None:
+            return fn(self, o, *args, **kwargs)
+
+        attributes = model_attributes(o)
+        for arg in args:
+            endpoint = getattr(arg, "base_url", None)
+            if isinstance(endpoint, basestring):
+                attributes["endpoint"] = endpoint
+        with tracer.span(fn.__name__, **attributes):
+            return fn(self, o, *args, **kwargs)
+    return traced_method
@@ -0,0 +1,110 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import Queue
+
+from onos.helpers import Helpers
+import onos.deadline as onos_deadline
+from onos.profiler import profiler
+from onos.tracing import tracer
+
+
+def bind_context(fn):
+    """
+    Bind the context of the running thread to fn, that is going to be called by other threads: the deadline of the
+    synchronization, and the profiling and tracing of the synchronization
+    """
+    return tracer.propagate(profiler.propagate(onos_deadline.propagate(fn)))
+
+
+def run_concurrently(fn, items, max_workers):
+    """
+    Call fn on every item, using at most max_workers threads
+    :param fn: function to call, it receives an item as argument
+    :param items: list of items
+    :param max_workers: maximum number of concurrent calls
+    :return: list of (item, exception) for the calls that failed
+    """
+    errors = []
+
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                fn(item)
+            except Exception as e:
+                errors.append((item, e))
+        return errors
+
+    queue = Queue.Queue()
+    for item in items:
+        queue.put(item)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                fn(item)
+            except Exception as e:
+                with lock:
+                    errors.append((item, e))
+
+    threads = [threading.Thread(target=worker, name="onos-worker") for _ in range(min(max_workers, len(items)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # keep the same order as the items, to make the result predictable
+    return sorted(errors, key=lambda e: items.index(e[0]))
+
+
+class KeyedLocks(object):
+    """
+    A lock for every key, eg: to make sure the same application is not installed twice at the same time
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def get(self, *key):
+        with self.lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            return self.locks[key]
+
+
+class EndpointLimiter(object):
+    """
+    Cap the number of concurrent operations towards each ONOS instance
+    """
+
+    def __init__(self, section, key, default):
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.section = section
+        self.key = key
+        self.default = default
+
+    def get(self, base_url):
+        with self.lock:
+            if base_url not in self.semaphores:
+                limit = Helpers.get_onos_config(self.section, self.key, self.default)
+                self.semaphores[base_url] = threading.BoundedSemaphore(max(limit, 1))
+            return self.semaphores[base_url]
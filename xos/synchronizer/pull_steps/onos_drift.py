@@ -0,0 +1,232 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import sys
+import time
+import threading
+from xossynchronizer.pull_steps.pullstep import PullStep
+from xossynchronizer.modelaccessor import ONOSApp, ONOSService, ServiceAttribute
+from xosconfig import Config
+from multistructlog import create_logger
+
+# the helpers shared by the steps live in the onos package
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from onos.probe import StateProbe  # noqa: E402
+from onos.session import session_pool  # noqa: E402
+from onos.inventory import app_inventory  # noqa: E402
+from onos.readiness import readiness_gates  # noqa: E402
+from onos.applied import applied_state, content_hash  # noqa: E402
+from onos.netcfg import netcfg_keys  # noqa: E402
+from onos.resync import service_models, dirty  # noqa: E402
+from onos.helpers import Helpers  # noqa: E402
+
+log = create_logger(Config().get('logging'))
+
+DRIFT_STATUS = "resynchronize due to drift from ONOS"
+
+# an audit reads the application inventory and the network configuration of the ONOS instance
+CALLS_PER_AUDIT = 2
+
+APPLICATIONS = "applications"
+
+
+def subtree(path):
+    """
+    :param path: url a configuration is pushed to, eg: /onos/v1/network/configuration/apps/org.opencord.olt
+    :return: the subtree of the network configuration holding the configuration, eg: "apps/org.opencord.olt",
+             or None if the configuration is not below a subtree
+    """
+    keys = netcfg_keys(path)
+    if not keys or len(keys) < 2:
+        return None
+    return "/".join(keys[:2])
+
+
+def fingerprints(applications, netcfg):
+    """
+    Fingerprint the state of an ONOS instance
+    :param applications: dict app_id -> state, see onos.inventory.ApplicationInventory.snapshot
+    :param netcfg: the network configuration tree
+    :return: dict subtree -> hash, for the applications and for every subtree of the network configuration
+    """
+    prints = {APPLICATIONS: content_hash(applications)}
+    for (key, configs) in netcfg.items():
+        if not isinstance(configs, dict):
+            prints[key] = content_hash(configs)
+            continue
+        for (subkey, config) in configs.items():
+            prints["%s/%s" % (key, subkey)] = content_hash(config)
+    return prints
+
+
+class DriftAuditor(object):
+    """
+    Audit of the ONOS instances, to notice the changes that didn't go through XOS, eg: a configuration changed by
+    hand or an application deactivated.
+
+    Every ONOSService is audited every interval seconds: its application inventory and its network configuration
+    are read from ONOS (see onos.probe.StateProbe) and fingerprinted, subtree by subtree. Only the models whose
+    subtree changed since the last audit that found ONOS in sync are compared with ONOS, and only the ones that
+    diverged are resynchronized: they are forgotten by the ledger (see onos.applied) and dirtied.
+
+    An audit costs CALLS_PER_AUDIT REST calls, each cycle audits as many ONOSServices as the budget allows, the
+    least recently audited first.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.audited = {}  # ONOSService id -> time of the last audit
+            # ONOSService id -> (fingerprint of the models, fingerprints of ONOS) of the last audit finding no drift
+            self.in_sync = {}
+            self.stats = {"audits": 0, "postponed": 0, "compared": 0, "diverged": 0}
+
+    def due(self, services):
+        """
+        Pick the ONOSServices to audit in this cycle
+        :param services: all the ONOSService models
+        :return: list of ONOSService models
+        """
+        interval = Helpers.get_onos_config("drift", "interval", 300)
+        count = Helpers.get_onos_config("drift", "budget", 10) // CALLS_PER_AUDIT
+        now = time.time()
+        with self.lock:
+            due = [s for s in services if now - self.audited.get(s.id, 0) >= interval]
+            due.sort(key=lambda s: self.audited.get(s.id, 0))
+            self.stats["postponed"] += max(len(due) - count, 0)
+        return due[:count]
+
+    def audit(self, onos):
+        """
+        Compare an ONOS instance with the models, and dirty the models that diverged
+        :param onos: ONOSService model
+        :return: list of (model, reason)
+        """
+        session = session_pool.get(onos)
+        with self.lock:
+            self.audited[onos.id] = time.time()
+            self.stats["audits"] += 1
+
+        if not readiness_gates.get(session).ready or not self.is_settled(onos):
+            # everything is going to be pushed again anyway
+            return []
+
+        service_attrs = list(ServiceAttribute.objects.filter(service_id=onos.id))
+        (apps, attrs) = service_models(onos)
+
+        desired = content_hash(sorted([[a.name, a.value] for a in service_attrs] +
+                                      [[a.app_id, a.url, a.version] for a in apps] +
+                                      [[a.service_instance_id, a.name, a.value] for a in attrs]))
+
+        # the state of ONOS is probably changed, don't trust what has been read before
+        app_inventory.invalidate(session)
+        probe = StateProbe(session)
+        prints = fingerprints(app_inventory.snapshot(session), probe.read_netcfg())
+
+        with self.lock:
+            previous = self.in_sync.pop(onos.id, None)
+        changed = None  # every subtree, the models changed since the last audit
+        if previous is not None and previous[0] == desired:
+            changed = set(k for k in set(prints) | set(previous[1]) if prints.get(k) != previous[1].get(k))
+
+        # the models the sync steps are working on are expected to differ from ONOS
+        settled = True
+        compared = 0
+        diverged = []
+        for model in service_attrs + attrs + apps:
+            if not self.is_settled(model):
+                settled = False
+                continue
+
+            if isinstance(model, ONOSApp):
+                if changed is not None and APPLICATIONS not in changed:
+                    continue
+                compared += 1
+                reason = probe.app_diverged(model)
+            else:
+                if netcfg_keys(model.name) is None:
+                    # it can't be read back from the network configuration
+                    continue
+                path = subtree(model.name)
+                if changed is not None and path is not None and path not in changed:
+                    continue
+                compared += 1
+                reason = probe.config_diverged(model.name, model.value)
+
+            if reason:
+                diverged.append((model, reason))
+
+        with self.lock:
+            self.stats["compared"] += compared
+            self.stats["diverged"] += len(diverged)
+            if settled and not diverged:
+                self.in_sync[onos.id] = (desired, prints)
+
+        log.debug("Audited ONOS", service=onos.name, compared=compared, diverged=len(diverged),
+                  subtrees=len(prints) if changed is None else len(changed))
+        if not diverged:
+            return diverged
+
+        for (model, reason) in diverged:
+            log.info("Model drifted from ONOS", model=model, reason=reason)
+            # the ledger would skip the push
+            self.forget(session, onos, model)
+
+        dirty([m for (m, reason) in diverged], DRIFT_STATUS)
+        return diverged
+
+    @staticmethod
+    def is_settled(model):
+        return model.backend_code == 1
+
+    @staticmethod
+    def forget(session, onos, model):
+        if isinstance(model, ONOSApp):
+            applied_state.forget_app(onos.id, session.base_url, model.app_id)
+            return
+
+        path = model.name[1:] if model.name[0] == "/" else model.name
+        if isinstance(model, ServiceAttribute):
+            applied_state.forget(onos.id, session.base_url, path)
+        else:
+            applied_state.forget(onos.id, session.base_url, path, model="ServiceInstanceAttribute", model_id=model.id)
+
+
+# a new step is created for every cycle of the pull steps, the audits are tracked across steps
+drift_audits = DriftAuditor()
+
+
+class ONOSDriftPullStep(PullStep):
+    """
+    Audit the ONOS instances for the changes that didn't go through XOS, see DriftAuditor
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["observed_model"] = ONOSService
+        super(ONOSDriftPullStep, self).__init__(**kwargs)
+
+    def pull_records(self):
+        if not Helpers.get_onos_config("drift", "enabled", False):
+            return
+
+        for onos in drift_audits.due(ONOSService.objects.all()):
+            try:
+                drift_audits.audit(onos)
+            except Exception as e:
+                log.warning("Failed to audit ONOS", service=onos.name, error=str(e))
@@ -0,0 +1,272 @@
+# Copyright 2019-present Open Networking Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import json
+from mock import patch, call
+import requests_mock
+
+import os
+import sys
+
+test_path = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+
+NETCFG = "onos/v1/network/configuration"
+
+
+class TestONOSDrift(unittest.TestCase):
+
+    def setUp(self):
+
+        self.sys_path_save = sys.path
+
+        # Setting up the config module
+        from xosconfig import Config
+        config = os.path.join(test_path, "../test_config.yaml")
+        Config.clear()
+        Config.init(config, "synchronizer-config-schema.yaml")
+        # END Setting up the config module
+
+        from xossynchronizer.mock_modelaccessor_build import mock_modelaccessor_config
+        mock_modelaccessor_config(test_path, [("onos-service", "onos.xproto"), ])
+
+        import xossynchronizer.modelaccessor
+        import mock_modelaccessor
+        reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
+        reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
+
+        from xossynchronizer.modelaccessor import model_accessor
+
+        import onos.resync as onos_resync
+        reload(onos_resync)  # pick up the model classes of the reloaded model accessor
+        import onos_drift
+        reload(onos_drift)
+        from onos_drift import ONOSDriftPullStep, drift_audits
+        from onos.applied import applied_state
+        from onos.inventory import app_inventory
+
+        self.drift_audits = drift_audits
+        self.applied_state = applied_state
+        self.step = ONOSDriftPullStep
+        self.model_accessor = model_accessor
+        applied_state.clear()
+        app_inventory.new_cycle()
+
+        # import all class names to globals
+        for (k, v) in model_accessor.all_model_classes.items():
+            globals()[k] = v
+
+        self.onos = ONOSService(id=1,
+                                name="myonos",
+                                rest_hostname="onos-url",
+                                rest_port="8181",
+                                rest_username="karaf",
+                                rest_password="karaf",
+                                backend_code=1)
+
+        self.olt = ONOSApp(id=10, name="olt", app_id="org.opencord.olt", owner_id=1, backend_code=1)
+        self.aaa = ONOSApp(id=11, name="aaa", app_id="org.opencord.aaa", owner_id=1, backend_code=1)
+        # app of another ONOSService
+        self.dhcp = ONOSApp(id=12, name="dhcp", app_id="org.opencord.dhcpl2relay", owner_id=2, backend_code=1)
+
+        self.service_attrs = [
+            ServiceAttribute(id=20, service_id=1, name="/%s/devices/of:01" % NETCFG, backend_code=1,
+                             value=json.dumps({"basic": {"driver": "voltha"}})),
+            ServiceAttribute(id=21, service_id=1, name="/%s/devices/of:02" % NETCFG, backend_code=1,
+                             value=json.dumps({"basic": {"driver": "voltha"}})),
+        ]
+        self.attrs = [
+            ServiceInstanceAttribute(id=30, service_instance_id=10, name="/%s/apps/org.opencord.olt" % NETCFG,
+                                     value=json.dumps({"olt": {"vlan": 1}}), backend_code=1),
+            ServiceInstanceAttribute(id=31, service_instance_id=11, name="/%s/apps/org.opencord.aaa" % NETCFG,
+                                     value=json.dumps({"aaa": {"radius": "r"}}), backend_code=1),
+            # attribute of a ServiceInstance unrelated to ONOS
+            ServiceInstanceAttribute(id=32, service_instance_id=99, name="foo", value="bar", backend_code=1),
+        ]
+
+        self.applications = {"applications": [
+            {"name": "org.opencord.olt", "state": "ACTIVE", "version": "1.0.0"},
+            {"name": "org.opencord.aaa", "state": "ACTIVE", "version": "1.0.0"},
+        ]}
+        self.netcfg = {
+            "apps": {
+                "org.opencord.olt": {"olt": {"vlan": 1}},
+                "org.opencord.aaa": {"aaa": {"radius": "r", "port": 1812}},
+            },
+            "devices": {
+                "of:01": {"basic": {"driver": "voltha"}},
+                "of:02": {"basic": {"driver": "voltha"}},
+            },
+        }
+
+    def tearDown(self):
+        self.drift_audits.reset()
+        self.applied_state.clear()
+        sys.path = self.sys_path_save
+
+    def mock_onos(self, m):
+        m.get("http://onos-url:8181/onos/v1/applications", status_code=200, json=self.applications)
+        m.get("http://onos-url:8181/%s" % NETCFG, status_code=200, json=self.netcfg)
+
+    def audit(self):
+        with patch.object(ServiceAttribute.objects, "filter") as service_attrs, \
+                patch.object(ONOSApp.objects, "get_items") as apps, \
+                patch.object(ServiceInstanceAttribute.objects, "filter") as attrs, \
+                patch.object(ServiceAttribute, "save", autospec=True) as service_attr_save, \
+                patch.object(ServiceInstanceAttribute, "save", autospec=True) as attr_save, \
+                patch.object(ONOSApp, "save", autospec=True) as app_save:
+            service_attrs.return_value = self.service_attrs
+            apps.return_value = [self.olt, self.aaa, self.dhcp]
+            # the range query on the ids of olt and aaa
+            attrs.return_value = self.attrs[:2]
+
+            diverged = self.drift_audits.audit(self.onos)
+
+            self.service_attrs_filter = service_attrs
+            saves = service_attr_save.call_args_list + attr_save.call_args_list + app_save.call_args_list
+        return (diverged, saves)
+
+    @requests_mock.Mocker()
+    def test_audit_in_sync(self, m):
+        self.mock_onos(m)
+
+        (diverged, saves) = self.audit()
+
+        self.assertEqual(diverged, [])
+        self.assertEqual(saves, [])
+        self.service_attrs_filter.assert_called_with(service_id=1)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self.drift_audits.stats["compared"], 6)
+
+    @requests_mock.Mocker()
+    def test_audit_diverged(self, m):
+        from onos.applied import APPLIED
+
+        self.netcfg["devices"]["of:02"]["basic"]["driver"] = "default"
+        del self.netcfg["apps"]["org.opencord.aaa"]
+        self.applications["applications"][0]["state"] = "INSTALLED"
+        self.mock_onos(m)
+
+        base_url = "http://onos-url:8181"
+        self.applied_state.record(1, base_url, "%s/devices/of:01" % NETCFG, "hash", APPLIED)
+        self.applied_state.record(1, base_url, "%s/devices/of:02" % NETCFG, "hash", APPLIED)
+        self.applied_state.record(1, base_url, "%s/apps/org.opencord.aaa" % NETCFG, "hash", APPLIED,
+                                  model="ServiceInstanceAttribute", model_id=self.attrs[1].id)
+        self.applied_state.record_app(1, base_url, "org.opencord.olt", None)
+
+        (diverged, saves) = self.audit()
+
+        self.assertEqual(diverged, [
+            (self.service_attrs[1], "different"),
+            (self.attrs[1], "missing"),
+            (self.olt, "not active"),
+        ])
+        update = {"update_fields": ["updated", "backend_code", "backend_status"], "always_update_timestamp": True}
+        self.assertEqual(sorted(saves), sorted([call(self.service_attrs[1], **update), call(self.attrs[1], **update),
+                                                call(self.olt, **update)]))
+        self.assertEqual(self.olt.backend_code, 0)
+        self.assertEqual(self.olt.backend_status, "resynchronize due to drift from ONOS")
+        self.assertEqual(self.aaa.backend_code, 1)
+
+        # the ledger doesn't skip the push of the models that drifted
+        self.assertTrue(self.applied_state.is_applied(1, base_url, "%s/devices/of:01" % NETCFG, "hash"))
+        self.assertFalse(self.applied_state.is_applied(1, base_url, "%s/devices/of:02" % NETCFG, "hash"))
+        self.assertFalse(self.applied_state.is_applied(1, base_url, "%s/apps/org.opencord.aaa" % NETCFG, "hash",
+                                                       model="ServiceInstanceAttribute",
+                                                       model_id=self.attrs[1].id))
+        self.assertIsNone(self.applied_state.app_version(1, base_url, "org.opencord.olt"))
+
+    @requests_mock.Mocker()
+    def test_audit_fingerprints(self, m):
+        self.mock_onos(m)
+        self.audit()
+        self.assertEqual(self.drift_audits.stats["compared"], 6)
+
+        # nothing changed, nothing is compared
+        self.audit()
+        self.assertEqual(self.drift_audits.stats["compared"], 6)
+
+        # only the models whose subtree changed are compared
+        self.netcfg["devices"]["of:02"]["basic"]["driver"] = "default"
+        self.mock_onos(m)
+        (diverged, saves) = self.audit()
+        self.assertEqual(diverged, [(self.service_attrs[1], "different")])
+        self.assertEqual(self.drift_audits.stats["compared"], 7)
+
+        # the models changed, everything is compared
+        self.service_attrs[1].value = json.dumps({"basic": {"driver": "default"}})
+        self.service_attrs[1].backend_code = 1
+        self.audit()
+        self.assertEqual(self.drift_audits.stats["compared"], 13)
+        self.assertEqual(m.call_count, 8)
+
+    @requests_mock.Mocker()
+    def test_audit_unsettled(self, m):
+        self.mock_onos(m)
+        self.netcfg["devices"]["of:02"]["basic"]["driver"] = "default"
+        self.service_attrs[1].backend_code = 0
+
+        (diverged, saves) = self.audit()
+
+        # the sync steps are pushing the attribute already
+        self.assertEqual(diverged, [])
+        self.assertEqual(self.drift_audits.stats["compared"], 5)
+        self.assertEqual(self.drift_audits.in_sync, {})
+
+        # ONOS is being synchronized
+        self.onos.backend_code = 0
+        self.assertEqual(self.audit(), ([], []))
+        self.assertEqual(m.call_count, 2)
+
+    def test_due(self):
+        from onos.helpers import Helpers
+
+        services = [ONOSService(id=i, name="onos%d" % i) for i in range(1, 4)]
+
+        def get_onos_config(section, key, default=None):
+            return {("drift", "interval"): 60, ("drift", "budget"): 5}.get((section, key), default)
+
+        with patch.object(Helpers, "get_onos_config", side_effect=get_onos_config):
+            self.drift_audits.audited[1] = 1000
+            self.assertEqual(self.drift_audits.due(services), [services[1], services[2]])
+            self.assertEqual(self.drift_audits.stats["postponed"], 1)
+
+            self.drift_audits.audited[2] = self.drift_audits.audited[3] = 2000
+            self.assertEqual(self.drift_audits.due(services), [services[0], services[1]])
+
+            # audited recently
+            self.drift_audits.audited[3] = self.drift_audits.audited[2] = self.drift_audits.audited[1] = 10 ** 10
+            self.assertEqual(self.drift_audits.due(services), [])
+
+    def test_pull_records(self):
+        from onos.helpers import Helpers
+
+        def get_onos_config(section, key, default=None):
+            return {("drift", "enabled"): True}.get((section, key), default)
+
+        with patch.object(ONOSService.objects, "get_items") as services, \
+                patch.object(self.drift_audits, "audit") as audit:
+            services.return_value = [self.onos]
+
+            self.step(model_accessor=self.model_accessor).pull_records()
+            audit.assert_not_called()
+
+            with patch.object(Helpers, "get_onos_config", side_effect=get_onos_config):
+                audit.side_effect = Exception("Failed to read network configuration from ONOS")
+                self.step(model_accessor=self.model_accessor).pull_records()
+                audit.assert_called_once_with(self.onos)
+
+
+if __name__ == '__main__':
+    unittest.main()
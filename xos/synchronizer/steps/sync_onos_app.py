@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import sys
 import json
-import requests
-from requests.auth import HTTPBasicAuth
+import time
+
 from xossynchronizer.steps.syncstep import SyncStep, DeferredException
 from xossynchronizer.modelaccessor import model_accessor
 from xossynchronizer.modelaccessor import ONOSApp, ServiceInstance, ServiceInstanceAttribute
@@ -22,48 +24,169 @@ from xossynchronizer.modelaccessor import ONOSApp, ServiceInstance, ServiceInsta
 from xosconfig import Config
 from multistructlog import create_logger
 
-from helpers import Helpers
+# the helpers shared by the steps live in the onos package, imported once by all of them
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from onos.session import session_pool  # noqa: E402
+from onos.endpoints import endpoint_cache  # noqa: E402
+from onos.applied import applied_state, content_hash, APPLIED, FAILED  # noqa: E402
+from onos.netcfg import NETCFG_PATH, netcfg_keys, split_subjects  # noqa: E402
+from onos.payloads import payload_cache  # noqa: E402
+from onos.inventory import app_inventory  # noqa: E402
+from onos.app_graph import app_graph  # noqa: E402
+from onos.workers import run_concurrently, bind_context, KeyedLocks, EndpointLimiter  # noqa: E402
+from onos.readiness import readiness_gates  # noqa: E402
+from onos.artifacts import artifact_cache  # noqa: E402
+from onos.deadline import Deadline  # noqa: E402
+from onos.metrics import instrument_sync  # noqa: E402
+from onos.profiler import profile_sync  # noqa: E402
+from onos.tracing import trace_sync, traced  # noqa: E402
+from onos.helpers import Helpers  # noqa: E402
 
 log = create_logger(Config().get('logging'))
 log.info("config file", file=Config().get_config_file())
 
+# applications being installed or activated, an application is never installed twice at the same time
+app_locks = KeyedLocks()
+
+# maximum number of applications being installed or activated at the same time in an ONOS instance
+install_limiter = EndpointLimiter("install", "max_in_flight", 4)
+
 
 class SyncONOSApp(SyncStep):
     provides = [ONOSApp]
     observes = [ONOSApp, ServiceInstanceAttribute]
 
+    def fetch_pending(self, deletion=False):
+        # fetch_pending is called at the beginning of every sync cycle,
+        # start from a fresh snapshot of the applications installed in ONOS
+        app_inventory.new_cycle()
+        pending = super(SyncONOSApp, self).fetch_pending(deletion)
+
+        # keep the dependency graph in sync with the ONOSApps that changed
+        apps = [o for o in pending if hasattr(o, 'app_id')]
+        if deletion:
+            app_graph.remove(apps)
+        else:
+            app_graph.update(apps)
+        return pending
+
+    @staticmethod
+    def get_endpoint(app):
+        """
+        Resolve the endpoint of the ONOSService an application belongs to, going through the models only the first
+        time (see onos.endpoints.EndpointCache)
+        :param app: ONOSApp
+        :return: ONOSEndpoint
+        """
+        return endpoint_cache.get(app.owner_id, lambda: app.owner.leaf_model)
+
     def get_service_instance_attribute(self, o):
         # NOTE this method is defined in the core convenience methods for service_instances
         svc = ServiceInstance.objects.get(id=o.id)
         return svc.serviceinstanceattribute_dict
 
-    def check_app_dependencies(self, deps):
+    @traced
+    def check_app_dependencies(self, o, session):
+        """
+        Make sure that all the dependencies required by this application are installed in ONOS.
+        Dependencies that are not installed yet are installed right away, in topological order.
+        :param o: ONOSApp
+        :param session: ONOSSession towards the ONOS instance
+        """
+        app_graph.ensure_loaded()
+        app_graph.update([o])
+
+        cycle = app_graph.find_cycle(o.owner_id, o.app_id)
+        if cycle:
+            raise Exception('ONOSApp with id %s has circular dependencies: %s' % (o.id, " -> ".join(cycle)))
+
+        missing = app_graph.missing_dependencies(o.owner_id, o.app_id)
+        if missing:
+            raise DeferredException('Deferring installation of ONOSApp with id %s as dependencies are not met: '
+                                    'missing %s' % (o.id, ", ".join(missing)))
+
+        pending = [dep for dep in app_graph.install_order(o.owner_id, o.app_id) if not self.is_app_ready(dep, session)]
+        if not pending:
+            return
+
+        # applications in the same dependency level don't depend on each other, install them concurrently
+        workers = Helpers.get_onos_config("install", "workers", 4)
+        for level in self.group_by_level(o.owner_id, pending):
+            log.info("Installing dependencies", app=o.app_id, dependencies=[dep.app_id for dep in level])
+            install = bind_context(lambda dep: self.provision_dependency(o, dep, session))
+            errors = run_concurrently(install, level, workers)
+            if errors:
+                for (dep, e) in errors:
+                    log.error("Failed to install dependency", app=o.app_id, dependency=dep.app_id, error=str(e))
+                raise DeferredException(
+                    'Deferring installation of ONOSApp with id %s as dependencies are not met' % o.id)
+
+    def group_by_level(self, owner_id, apps):
         """
-        Check if all the dependencies required by this application are installed
-        :param deps: comma separated list of application names
+        Group applications by their level in the dependency graph
+        :param owner_id: id of the ONOSService
+        :param apps: list of ONOSApp
+        :return: list of lists of ONOSApp, the first list has to be installed first
+        """
+        level_of = {}
+        for (i, level) in enumerate(app_graph.levels(owner_id)):
+            for app in level:
+                level_of[app.app_id] = i
+
+        levels = {}
+        for app in apps:
+            levels.setdefault(level_of.get(app.app_id, 0), []).append(app)
+        return [levels[i] for i in sorted(levels.keys())]
+
+    @traced
+    def provision_dependency(self, o, dep, session):
+        """
+        Install a dependency and report the outcome in its backend_status
+        :param o: ONOSApp requiring the dependency
+        :param dep: ONOSApp to install
+        :param session: ONOSSession towards the ONOS instance
+        """
+        try:
+            self.sync_app(dep, session)
+        except Exception as e:
+            self.set_app_status(dep, 2, "Failed to install as a dependency of %s: %s" % (o.app_id, e))
+            raise
+        self.set_app_synced(dep)
+
+    def set_app_status(self, o, code, status):
+        o.backend_code = code
+        o.backend_status = status
+        o.save(update_fields=["backend_code", "backend_status"])
+
+    def set_app_synced(self, o):
+        """
+        Save an application synchronized outside of the event loop the way the event loop saves the ones it
+        synchronizes, so that it is not synchronized again, together with the version installed in ONOS
+        """
+        o.enacted = max(o.updated, o.changed_by_policy)
+        o.backend_register = json.dumps({"next_run": 0, "exponent": 0, "last_success": time.time()})
+        o.backend_status = "OK"
+        o.backend_code = 1
+        o.save(update_fields=["enacted", "backend_status", "backend_register", "backend_code", "version"])
+
+    def is_app_ready(self, o, session):
+        """
+        Check if an application is active in ONOS, with the requested version if it is installed from a remote source
+        :param o: ONOSApp
+        :param session: ONOSSession towards the ONOS instance
         :return: bool
         """
-        if not deps:
-            return True
-        for dep in [x.strip() for x in deps.split(',') if x != ""]:
-            try:
-                app = ONOSApp.objects.get(app_id=dep)
-                if not app.backend_code == 1:
-                    # backend_code == 1 means that the app has been pushed
-                    return False
-            except IndexError:
-                return False
-        return True
-
-    def add_config(self, o):
+        app = app_inventory.get(session, o.app_id)
+        if app is None or app["state"] != "ACTIVE":
+            return False
+        return not o.url or o.version == app["version"]
+
+    @traced
+    def add_config(self, o, onos):
         log.info("Adding config %s" % o.name, model=o.tologdict())
-        # getting onos url and auth
-        onos_url = "%s:%s" % (Helpers.format_url(
-            o.service_instance.leaf_model.owner.leaf_model.rest_hostname),
-            o.service_instance.leaf_model.owner.leaf_model.rest_port)
-        onos_basic_auth = HTTPBasicAuth(
-            o.service_instance.leaf_model.owner.leaf_model.rest_username,
-            o.service_instance.leaf_model.owner.leaf_model.rest_password)
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
 
         # push configs (if any)
         url = o.name
@@ -71,69 +194,153 @@ class SyncONOSApp(SyncStep):
             # strip initial /
             url = url[1:]
 
-        url = '%s/%s' % (onos_url, url)
-        value = json.loads(o.value)
-        request = requests.post(url, json=value, auth=onos_basic_auth)
+        path = url
+        url = '%s/%s' % (session.base_url, url)
+        payload = payload_cache.get(("ServiceInstanceAttribute", o.id), o.value)
+        digest = payload.digest
+        if payload.error:
+            applied_state.record(onos.id, session.base_url, path, digest, FAILED, payload.error,
+                                 model="ServiceInstanceAttribute", model_id=o.id)
+            raise Exception("Invalid JSON in config %s: %s" % (o.name, payload.error))
+        if applied_state.is_applied(onos.id, session.base_url, path, digest,
+                                    model="ServiceInstanceAttribute", model_id=o.id):
+            log.debug("Config is already applied", url=url)
+            return
 
-        if request.status_code != 200:
-            log.error("Request failed", response=request.text)
-            raise Exception("Failed to add config %s in ONOS:  %s" % (url, request.text))
+        subjects = None
+        keys = netcfg_keys(path)
+        if keys is not None and Helpers.get_onos_config("netcfg", "subjects", True):
+            subjects = split_subjects(keys, payload.value)
+        applied = applied_state.subjects(onos.id, session.base_url, path,
+                                         model="ServiceInstanceAttribute", model_id=o.id)
+        if subjects is not None and applied:
+            return self.push_subjects(o, onos, session, path, digest, subjects, applied)
 
-    def activate_app(self, o, onos_url, onos_basic_auth):
-        log.info("Activating app %s" % o.app_id)
-        url = '%s/onos/v1/applications/%s/active' % (onos_url, o.app_id)
-        request = requests.post(url, auth=onos_basic_auth)
+        request = session.post(url, operation="netcfg", **payload.post_kwargs())
 
         if request.status_code != 200:
             log.error("Request failed", response=request.text)
-            raise Exception("Failed to add application %s to ONOS: %s" % (url, request.text))
-
-        url = '%s/onos/v1/applications/%s' % (onos_url, o.app_id)
-        request = requests.get(url, auth=onos_basic_auth)
+            applied_state.record(onos.id, session.base_url, path, digest, FAILED, request.text,
+                                 model="ServiceInstanceAttribute", model_id=o.id)
+            raise Exception("Failed to add config %s in ONOS:  %s" % (url, request.text))
+        applied_state.record(onos.id, session.base_url, path, digest, APPLIED,
+                             model="ServiceInstanceAttribute", model_id=o.id)
+        applied_state.record_subjects(onos.id, session.base_url, path,
+                                      dict((s, content_hash(v)) for (s, v) in (subjects or {}).items()),
+                                      model="ServiceInstanceAttribute", model_id=o.id)
 
-        if request.status_code != 200:
-            log.error("Request failed", response=request.text)
-            raise Exception("Failed to read application %s from ONOS: %s" % (url, request.text))
+    def push_subjects(self, o, onos, session, path, digest, subjects, applied):
+        """
+        Push only the subjects of a network configuration that changed since it has been applied, and delete the
+        subjects that have been removed from it. The subjects that are still applied by the attributes of other
+        ONOSApps pushing to the same path are not deleted.
+        :param path: url the config is pushed to, relative to base_url
+        :param digest: hash of the whole config
+        :param subjects: dict subject -> config (see onos.netcfg.split_subjects)
+        :param applied: dict subject -> hash of the subjects that have been applied by this attribute
+        """
+        hashes = dict((subject, content_hash(config)) for (subject, config) in subjects.items())
+        calls = [("POST", subject) for subject in sorted(subjects) if applied.get(subject) != hashes[subject]]
+        removed = [subject for subject in sorted(applied) if subject not in subjects]
+        shared = set()
+        if removed:
+            # still applied by other attributes, they are not deleted
+            shared = applied_state.shared_subjects(onos.id, session.base_url, path,
+                                                   model="ServiceInstanceAttribute", model_id=o.id) & set(removed)
+        calls += [("DELETE", subject) for subject in removed if subject not in shared]
+
+        # the subjects are independent from each other, they are pushed concurrently
+        pushes = [(method, '%s/%s/%s' % (session.base_url, NETCFG_PATH, subject),
+                   {"json": subjects[subject]} if method == "POST" else {}) for (method, subject) in calls]
+        results = session.request_many(pushes, operation="netcfg",
+                                       workers=Helpers.get_onos_config("netcfg", "workers", 4))
+        errors = {}
+        for (call, (method, url, kwargs), request) in zip(calls, pushes, results):
+            if isinstance(request, Exception):
+                errors[call] = request
+            elif request.status_code != (200 if method == "POST" else 204):
+                log.error("Request failed", url=url, response=request.text)
+                errors[call] = Exception(request.text)
+
+        # a subject that failed to be pushed may or may not have been applied, it is pushed again next time
+        current = dict((s, h) for (s, h) in applied.items() if s not in shared)
+        for call in calls:
+            (method, subject) = call
+            if method == "POST" and call not in errors:
+                current[subject] = hashes[subject]
+            elif method == "POST" or call not in errors:
+                current.pop(subject, None)
+        applied_state.record_subjects(onos.id, session.base_url, path, current,
+                                      model="ServiceInstanceAttribute", model_id=o.id)
+
+        pushed = len([c for c in calls if c[0] == "POST"])
+        log.info("Pushed the subjects of the config", config=o.name, pushed=pushed, deleted=len(calls) - pushed,
+                 unchanged=len(subjects) - pushed, failed=len(errors))
+
+        url = '%s/%s' % (session.base_url, path)
+        if errors:
+            failures = "; ".join("%s %s: %s" % (c[0], c[1], e) for (c, e) in sorted(errors.items()))
+            applied_state.record(onos.id, session.base_url, path, digest, FAILED, failures,
+                                 model="ServiceInstanceAttribute", model_id=o.id)
+            raise Exception("Failed to add config %s in ONOS:  %s" % (url, failures))
+        applied_state.record(onos.id, session.base_url, path, digest, APPLIED,
+                             model="ServiceInstanceAttribute", model_id=o.id)
+
+    @traced
+    def activate_app(self, o, session):
+        app = app_inventory.get(session, o.app_id)
+
+        if app is None or app["state"] != "ACTIVE":
+            log.info("Activating app %s" % o.app_id)
+            url = '%s/onos/v1/applications/%s/active' % (session.base_url, o.app_id)
+            request = session.post(url, operation="activate")
+
+            if request.status_code != 200:
+                log.error("Request failed", response=request.text)
+                raise Exception("Failed to add application %s to ONOS: %s" % (url, request.text))
+
+            app_inventory.invalidate(session, o.app_id)
+            app = app_inventory.get(session, o.app_id)
+
+            if app is None:
+                raise Exception("Failed to read application %s from ONOS after activation" % o.app_id)
         else:
-            o.version = request.json()["version"]
+            log.debug("App is already active", app=o.app_id)
+
+        o.version = app["version"]
+        applied_state.record_app(o.owner_id, session.base_url, o.app_id, o.version)
 
-    def check_app_installed(self, o, onos_url, onos_basic_auth):
+    @traced
+    def check_app_installed(self, o, session):
         log.debug("Checking if app is installed", app=o.app_id)
-        url = '%s/onos/v1/applications/%s' % (onos_url, o.app_id)
-        request = requests.get(url, auth=onos_basic_auth)
-
-        if request.status_code == 200:
-            if "version" in request.json() and o.version == request.json()["version"]:
-                log.debug("App is installed", app=o.app_id)
-                return True
-            else:
-                # uninstall the application
-                self.uninstall_app(o, onos_url, onos_basic_auth)
-                return False
-        if request.status_code == 404:
+        app = app_inventory.get(session, o.app_id)
+
+        if app is None:
             # app is not installed at all
             return False
-        else:
-            log.error("Request failed", response=request.text)
-            raise Exception("Failed to read application %s from ONOS aaa: %s" % (url, request.text))
+        if o.version == app["version"]:
+            log.debug("App is installed", app=o.app_id)
+            return True
 
-    def install_app(self, o, onos_url, onos_basic_auth):
+        # uninstall the application
+        self.uninstall_app(o, session)
+        return False
+
+    @traced
+    def install_app(self, o, session):
         log.info("Installing app from url %s" % o.url, app=o.app_id, version=o.version)
 
         # check is the already installed app is the correct version
-        is_installed = self.check_app_installed(o, onos_url, onos_basic_auth)
+        is_installed = self.check_app_installed(o, session)
 
         if is_installed:
             # if the app is already installed we don't need to do anything
             log.info("App is installed, skipping install", app=o.app_id)
             return
 
-        data = {
-            'activate': True,
-            'url': o.url
-        }
-        url = '%s/onos/v1/applications' % onos_url
-        request = requests.post(url, json=data, auth=onos_basic_auth)
+        url = '%s/onos/v1/applications' % session.base_url
+        request = self.post_app(o, session, url)
+        app_inventory.invalidate(session, o.app_id)
 
         if request.status_code == 409:
             log.info("App was already installed", app=o.app_id, test=request.text)
@@ -145,103 +352,164 @@ class SyncONOSApp(SyncStep):
 
         log.debug("App from url %s installed" % o.url, app=o.app_id, version=o.version)
 
-        url = '%s/onos/v1/applications/%s' % (onos_url, o.app_id)
-        request = requests.get(url, auth=onos_basic_auth)
+        app = app_inventory.get(session, o.app_id)
 
-        if request.status_code != 200:
-            log.error("Request failed", response=request.text)
+        if app is None:
             raise Exception(
-                "Failed to read application %s from ONOS: %s while checking correct version" %
-                (url, request.text))
-        else:
-            if o.version != request.json()["version"]:
-                raise Exception(
-                    "The version of %s you installed (%s) is not the same you requested (%s)" %
-                    (o.app_id, request.json()["version"], o.version))
+                "Failed to read application %s from ONOS while checking correct version" % o.app_id)
+        if o.version != app["version"]:
+            raise Exception(
+                "The version of %s you installed (%s) is not the same you requested (%s)" %
+                (o.app_id, app["version"], o.version))
+        applied_state.record_app(o.owner_id, session.base_url, o.app_id, o.version)
+
+    def post_app(self, o, session, url):
+        """
+        Install an application, uploading the archive from the local cache if it is enabled,
+        otherwise ONOS downloads the archive from o.url on its own
+        """
+        archive = None
+        try:
+            cache = artifact_cache.get()
+            if cache is not None:
+                # once open, the archive can be read even if it is evicted from the cache meanwhile
+                archive = open(cache.get(o.url), "rb")
+        except Exception as e:
+            log.warning("Failed to cache application archive, ONOS will download it", url=o.url, error=str(e))
+
+        if archive is not None:
+            log.debug("Uploading application archive to ONOS", app=o.app_id, path=archive.name)
+            with archive:
+                return session.post(url, params={"activate": "true"}, data=archive,
+                                    headers={"Content-Type": "application/octet-stream"}, operation="install")
 
+        data = {
+            'activate': True,
+            'url': o.url
+        }
+        return session.post(url, json=data, operation="install")
+
+    @instrument_sync("sync")
+    @profile_sync("sync")
+    @trace_sync("sync")
     def sync_record(self, o):
         log.info("Sync'ing", model=o.tologdict())
         if hasattr(o, 'service_instance'):
             # this is a ServiceInstanceAttribute model just push the config
-            if 'ONOSApp' in o.service_instance.leaf_model.class_names:
-                return self.add_config(o)
+            app = o.service_instance.leaf_model
+            if 'ONOSApp' in app.class_names:
+                onos = self.get_endpoint(app)
+                deadline = Deadline.for_sync("sync of config %s" % o.name)
+                return deadline.wrap(self.add_config)(o, onos)
             return  # if it's not an ONOSApp do nothing
 
-        if not self.check_app_dependencies(o.dependencies):
-            raise DeferredException('Deferring installation of ONOSApp with id %s as dependencies are not met' % o.id)
+        # the dependencies, the installation and the verification of the application share the same deadline
+        onos = self.get_endpoint(o)
+        deadline = Deadline.for_sync("sync of app %s" % o.app_id)
+        return deadline.wrap(self.sync_onos_app)(o, onos)
+
+    @traced
+    def sync_onos_app(self, o, onos):
+        version = applied_state.app_version(o.owner_id, onos.base_url, o.app_id)
+        if version is not None and (not o.url or version == o.version):
+            # installed and activated already, eg: before the synchronizer restarted
+            log.debug("App is already installed and active", app=o.app_id, version=version)
+            o.version = version
+            return
 
-        # getting onos url and auth
-        onos_url = "%s:%s" % (Helpers.format_url(o.owner.leaf_model.rest_hostname), o.owner.leaf_model.rest_port)
-        onos_basic_auth = HTTPBasicAuth(o.owner.leaf_model.rest_username, o.owner.leaf_model.rest_password)
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
 
-        # activate app (bundled in onos)
-        if not o.url or o.url is None:
-            self.activate_app(o, onos_url, onos_basic_auth)
-        # install an app from a remote source
-        if o.url and o.url is not None:
-            self.install_app(o, onos_url, onos_basic_auth)
+        self.check_app_dependencies(o, session)
+        self.sync_app(o, session)
+
+    def sync_app(self, o, session):
+        with app_locks.get(session.base_url, o.app_id), install_limiter.get(session.base_url):
+            # activate app (bundled in onos)
+            if not o.url or o.url is None:
+                self.activate_app(o, session)
+            # install an app from a remote source
+            if o.url and o.url is not None:
+                self.install_app(o, session)
 
-    def delete_config(self, o):
+    @traced
+    def delete_config(self, o, onos):
         log.info("Deleting config %s" % o.name)
-        # getting onos url and auth
-        onos_app = o.service_instance.leaf_model
-        onos_url = "%s:%s" % (Helpers.format_url(
-            onos_app.owner.leaf_model.rest_hostname),
-            onos_app.owner.leaf_model.rest_port)
-        onos_basic_auth = HTTPBasicAuth(
-            onos_app.owner.leaf_model.rest_username,
-            onos_app.owner.leaf_model.rest_password)
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
 
         url = o.name
         if url[0] == "/":
             # strip initial /
             url = url[1:]
 
-        url = '%s/%s' % (onos_url, url)
-        request = requests.delete(url, auth=onos_basic_auth)
+        path = url
+        url = '%s/%s' % (session.base_url, url)
+        request = session.delete(url, operation="netcfg")
+        applied_state.forget(onos.id, session.base_url, path, model="ServiceInstanceAttribute", model_id=o.id)
+        payload_cache.forget(("ServiceInstanceAttribute", o.id))
 
         if request.status_code != 204:
             log.error("Request failed", response=request.text)
             raise Exception("Failed to remove config %s from ONOS:  %s" % (url, request.text))
 
-    def uninstall_app(self, o, onos_url, onos_basic_auth):
+    @traced
+    def uninstall_app(self, o, session):
         log.info("Uninstalling app %s" % o.app_id)
-        url = '%s/onos/v1/applications/%s' % (onos_url, o.app_id)
+        url = '%s/onos/v1/applications/%s' % (session.base_url, o.app_id)
 
-        request = requests.delete(url, auth=onos_basic_auth)
+        request = session.delete(url, operation="install")
+        app_inventory.invalidate(session, o.app_id)
+        applied_state.forget_app(o.owner_id, session.base_url, o.app_id)
 
         if request.status_code != 204:
             log.error("Request failed", response=request.text)
             raise Exception("Failed to delete application %s from ONOS: %s" % (url, request.text))
 
-    def deactivate_app(self, o, onos_url, onos_basic_auth):
+    @traced
+    def deactivate_app(self, o, session):
         log.info("Deactivating app %s" % o.app_id)
-        url = '%s/onos/v1/applications/%s/active' % (onos_url, o.app_id)
+        url = '%s/onos/v1/applications/%s/active' % (session.base_url, o.app_id)
 
-        request = requests.delete(url, auth=onos_basic_auth)
+        request = session.delete(url, operation="activate")
+        app_inventory.invalidate(session, o.app_id)
+        applied_state.forget_app(o.owner_id, session.base_url, o.app_id)
 
         if request.status_code != 204:
             log.error("Request failed", response=request.text)
             raise Exception("Failed to deactivate application %s from ONOS: %s" % (url, request.text))
 
+    @instrument_sync("delete")
+    @profile_sync("delete")
+    @trace_sync("delete")
     def delete_record(self, o):
 
         if hasattr(o, 'service_instance'):
             # this is a ServiceInstanceAttribute model
-            if 'ONOSApp' in o.service_instance.leaf_model.class_names:
-                return self.delete_config(o)
+            app = o.service_instance.leaf_model
+            if 'ONOSApp' in app.class_names:
+                onos = self.get_endpoint(app)
+                deadline = Deadline.for_sync("deletion of config %s" % o.name)
+                return deadline.wrap(self.delete_config)(o, onos)
             return  # if it's not related to an ONOSApp do nothing
 
         # NOTE if it is an ONOSApp we don't care about the ServiceInstanceAttribute
         # as the reaper will delete it
+        onos = self.get_endpoint(o)
+        deadline = Deadline.for_sync("deletion of app %s" % o.app_id)
+        return deadline.wrap(self.delete_onos_app)(o, onos)
 
-        # getting onos url and auth
-        onos_url = "%s:%s" % (Helpers.format_url(o.owner.leaf_model.rest_hostname), o.owner.leaf_model.rest_port)
-        onos_basic_auth = HTTPBasicAuth(o.owner.leaf_model.rest_username, o.owner.leaf_model.rest_password)
+    @traced
+    def delete_onos_app(self, o, onos):
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
 
         # deactivate an app (bundled in onos)
         if not o.url or o.url is None:
-            self.deactivate_app(o, onos_url, onos_basic_auth)
+            self.deactivate_app(o, session)
         # uninstall an app from a remote source, only if it has been activated before
         if o.url and o.url is not None:
-            self.uninstall_app(o, onos_url, onos_basic_auth)
+            self.uninstall_app(o, session)
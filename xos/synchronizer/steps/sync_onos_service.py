@@ -13,16 +13,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
-import requests
-from requests.auth import HTTPBasicAuth
+import os
+import sys
 from xossynchronizer.steps.syncstep import SyncStep
 from xossynchronizer.modelaccessor import ONOSService, Service, ServiceAttribute, model_accessor
 
 from xosconfig import Config
 from multistructlog import create_logger
 
-from helpers import Helpers
+# the helpers shared by the steps live in the onos package, imported once by all of them
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from onos.session import session_pool  # noqa: E402
+from onos.endpoints import endpoint_cache  # noqa: E402
+from onos.readiness import readiness_gates  # noqa: E402
+from onos.netcfg import NETCFG_PATH, netcfg_keys, merge  # noqa: E402
+from onos.applied import applied_state, format_summary, APPLIED, FAILED  # noqa: E402
+from onos.payloads import payload_cache  # noqa: E402
+from onos.deadline import Deadline  # noqa: E402
+from onos.metrics import instrument_sync  # noqa: E402
+from onos.profiler import profile_sync  # noqa: E402
+from onos.tracing import trace_sync, traced  # noqa: E402
+from onos.helpers import Helpers  # noqa: E402
 
 log = create_logger(Config().get('logging'))
 
@@ -36,55 +47,208 @@ class SyncONOSService(SyncStep):
         svc = Service.objects.get(id=o.id)
         return svc.serviceattribute_dict
 
+    @instrument_sync("sync")
+    @profile_sync("sync")
+    @trace_sync("sync")
     def sync_record(self, o):
         if hasattr(o, 'service'):
-            # this is a ServiceAttribute model
-            if 'ONOSService' in o.service.leaf_model.class_names:
-                print "sync ONOSService Attribute", o.service.leaf_model
-                return self.sync_record(o.service.leaf_model)
+            # this is a ServiceAttribute model, push only its own config
+            onos = o.service.leaf_model
+            if 'ONOSService' in onos.class_names:
+                deadline = Deadline.for_sync("sync of config %s" % o.name)
+                return deadline.wrap(self.add_config)(o, onos)
             return  # if it's not related to an ONOSService do nothing
 
-        onos_url = "%s:%s" % (Helpers.format_url(o.rest_hostname), o.rest_port)
-        onos_basic_auth = HTTPBasicAuth(o.rest_username, o.rest_password)
+        # the model may have changed, the other steps will use the new endpoint from now on
+        endpoint_cache.update(o)
+
+        # all the configs are pushed again only when the ONOSService itself changes
+        deadline = Deadline.for_sync("sync of ONOSService %s" % o.name)
+        return deadline.wrap(self.sync_service)(o)
+
+    @traced
+    def sync_service(self, o):
+        session = session_pool.get(o)
+        readiness_gates.check(session)
 
         configs = self.get_service_attribute(o)
-        for url, value in configs.iteritems():
+        desired = {}  # path -> hash of the config
+        paths = {}  # url -> path
+        calls = []
+        # url -> None if the config has been pushed, the error otherwise
+        results = {}
+        for url, value in sorted(configs.iteritems()):
+            keys = netcfg_keys(url)
 
             if url[0] == "/":
                 # strip initial /
                 url = url[1:]
 
-            url = '%s/%s' % (onos_url, url)
-            value = json.loads(value)
-            request = requests.post(url, json=value, auth=onos_basic_auth)
+            path = url
+            url = '%s/%s' % (session.base_url, url)
+            payload = payload_cache.get(("ServiceAttribute", o.id, path), value)
+            desired[path] = payload.digest
+            if payload.error:
+                # it would be refused by ONOS anyway
+                paths[url] = path
+                results[url] = "Invalid JSON: %s" % payload.error
+                continue
+            if applied_state.is_applied(o.id, session.base_url, path, desired[path]):
+                # the config has been applied already, don't send it again
+                continue
+            paths[url] = path
+            calls.append((url, keys, payload))
+
+        # the configs of the ServiceAttributes that have been deleted are not tracked anymore
+        applied_state.retain(o.id, session.base_url, desired.keys())
+
+        if calls and Helpers.get_onos_config("netcfg", "merge", True):
+            calls = self.push_merged(session, calls, results)
+
+        # the configs are independent from each other, they are pushed concurrently if the backend allows it
+        error = None
+        posts = [("POST", url, payload.post_kwargs()) for (url, keys, payload) in calls]
+        for ((method, url, kwargs), request) in zip(posts, session.request_many(posts, operation="netcfg")):
+            if isinstance(request, Exception):
+                # it is unknown whether ONOS applied the config, it is left pending
+                error = error or request
+                continue
 
             if request.status_code != 200:
-                log.error("Request failed", response=request.text)
-                raise Exception("Failed to add config %s in ONOS" % url)
-
+                log.error("Request failed", url=url, response=request.text)
+                results[url] = request.text
+            else:
+                results[url] = None
+
+        for (url, result) in sorted(results.items()):
+            log.debug("Pushed config" if result is None else "Failed to push config", service=o.name, url=url,
+                      error=result)
+            applied_state.record(o.id, session.base_url, paths[url], desired[paths[url]],
+                                 APPLIED if result is None else FAILED, result)
+
+        summary = applied_state.summarize(o.id, session.base_url, desired)
+        log.info("Pushed the configs of the ONOSService", service=o.name, pushed=len(results),
+                 skipped=len(desired) - len(paths), **summary)
+        log.debug("ONOS sessions usage", **session_pool.stats())
+
+        if error is not None:
+            raise error
+        failed = sorted(url for (url, result) in results.items() if result is not None)
+        if failed:
+            raise Exception("Failed to add config %s in ONOS (%s)" % (", ".join(failed), format_summary(summary)))
+
+    def after_sync_save(self, o):
+        """
+        Called by the synchronizer once the model has been saved, report how many configs have been applied
+        """
+        if hasattr(o, 'service'):
+            return
+        summary = applied_state.summary(o.id)
+        if summary is None:
+            return
+        o.backend_status = "OK (%s)" % format_summary(summary)
+        o.save(update_fields=["backend_status"])
+
+    def push_merged(self, session, calls, results):
+        """
+        Push the configs targeting the network configuration API with a single POST, ONOS applies them all at once
+        :param session: ONOSSession towards the ONOS instance
+        :param calls: list of (url, netcfg keys or None, onos_payloads.Payload)
+        :param results: dict url -> error, updated with the configs that have been pushed
+        :return: the calls that still have to be pushed one by one
+        """
+        document = {}
+        merged = []
+        remaining = []
+        for (url, keys, payload) in calls:
+            if keys is not None and merge(document, keys, payload.value):
+                merged.append((url, keys, payload))
+            else:
+                # not a network configuration, or overlapping with another config
+                remaining.append((url, keys, payload))
+
+        if len(merged) < 2:
+            return calls
+
+        url = '%s/%s' % (session.base_url, NETCFG_PATH)
+        request = session.post(url, json=document, operation="netcfg")
+        if request.status_code != 200:
+            # find out which configs ONOS does not accept
+            log.warning("Failed to push the merged network configuration, pushing the configs one by one",
+                        configs=len(merged), status_code=request.status_code, response=request.text)
+            return merged + remaining
+
+        log.info("Pushed the merged network configuration", configs=len(merged))
+        for (url, keys, payload) in merged:
+            results[url] = None
+        return remaining
+
+    @traced
+    def add_config(self, o, onos):
+        log.info("Adding config %s" % o.name)
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
+
+        url = o.name
+        if url[0] == "/":
+            # strip initial /
+            url = url[1:]
+
+        path = url
+        url = '%s/%s' % (session.base_url, url)
+        payload = payload_cache.get(("ServiceAttribute", onos.id, path), o.value)
+        if payload.error:
+            applied_state.record(onos.id, session.base_url, path, payload.digest, FAILED, payload.error)
+            raise Exception("Invalid JSON in config %s: %s" % (o.name, payload.error))
+        # the ServiceAttributes are identified by their path, the row is shared with sync_service
+        if applied_state.is_applied(onos.id, session.base_url, path, payload.digest):
+            log.debug("Config is already applied", url=url)
+            return
+        request = session.post(url, operation="netcfg", **payload.post_kwargs())
+
+        if request.status_code != 200:
+            log.error("Request failed", response=request.text)
+            applied_state.record(onos.id, session.base_url, path, payload.digest, FAILED, request.text)
+            raise Exception("Failed to add config %s in ONOS" % url)
+        applied_state.record(onos.id, session.base_url, path, payload.digest, APPLIED)
+
+    @instrument_sync("delete")
+    @profile_sync("delete")
+    @trace_sync("delete")
     def delete_record(self, o):
 
         if hasattr(o, 'service'):
             # this is a ServiceAttribute model
-            if 'ONOSService' in o.service.leaf_model.class_names:
-                print "sync ONOSService Attribute", o.service.leaf_model
-
-                log.info("Deleting config %s" % o.name)
-                # getting onos url and auth
-                onos_service = o.service.leaf_model
-                onos_url = "%s:%s" % (
-                    Helpers.format_url(onos_service.rest_hostname), onos_service.rest_port)
-                onos_basic_auth = HTTPBasicAuth(onos_service.rest_username,
-                                                onos_service.rest_password)
-
-                url = o.name
-                if url[0] == "/":
-                    # strip initial /
-                    url = url[1:]
-
-                url = '%s/%s' % (onos_url, url)
-                request = requests.delete(url, auth=onos_basic_auth)
-
-                if request.status_code != 204:
-                    log.error("Request failed", response=request.text)
-                    raise Exception("Failed to remove config %s from ONOS:  %s" % (url, request.text))
+            onos = o.service.leaf_model
+            if 'ONOSService' in onos.class_names:
+                log.debug("Deleting ONOSService attribute", service=onos.name, attribute=o.name)
+                deadline = Deadline.for_sync("deletion of config %s" % o.name)
+                return deadline.wrap(self.delete_config)(o, onos)
+            return  # if it's not related to an ONOSService do nothing
+
+        # the other steps stop using the ONOSService, its pooled connections are closed
+        endpoint_cache.invalidate(o.id)
+        session_pool.drop(o.id)
+
+    @traced
+    def delete_config(self, o, onos):
+        log.info("Deleting config %s" % o.name)
+        # getting the session towards onos
+        session = session_pool.get(onos)
+        readiness_gates.check(session)
+
+        url = o.name
+        if url[0] == "/":
+            # strip initial /
+            url = url[1:]
+
+        path = url
+        url = '%s/%s' % (session.base_url, url)
+        request = session.delete(url, operation="netcfg")
+        applied_state.forget(onos.id, session.base_url, path)
+        payload_cache.forget(("ServiceAttribute", onos.id, path))
+
+        if request.status_code != 204:
+            log.error("Request failed", response=request.text)
+            raise Exception("Failed to remove config %s from ONOS:  %s" % (url, request.text))
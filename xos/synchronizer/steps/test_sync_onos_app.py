@@ -13,7 +13,10 @@
 # limitations under the License.
 
 import unittest
+import json
 import functools
+import shutil
+import tempfile
 from mock import patch, Mock
 import requests_mock
 
@@ -57,8 +60,26 @@ class TestSyncOnosApp(unittest.TestCase):
         reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
 
         from sync_onos_app import SyncONOSApp, DeferredException, model_accessor
+        from onos.inventory import app_inventory
+        from onos.app_graph import app_graph
+        from onos.readiness import readiness_gates
+        from onos.endpoints import endpoint_cache
+        from onos.applied import applied_state
 
         self.model_accessor = model_accessor
+        self.app_graph = app_graph
+
+        # start every test from an empty snapshot of the ONOS applications
+        app_inventory.new_cycle()
+        app_graph.reset()
+        readiness_gates.reset()
+        endpoint_cache.invalidate()
+        applied_state.clear()
+        self.applied_state = applied_state
+
+        from onos.payloads import payload_cache
+        payload_cache.clear()
+        self.payload_cache = payload_cache
 
         # import all class names to globals
         for (k, v) in model_accessor.all_model_classes.items():
@@ -78,9 +99,12 @@ class TestSyncOnosApp(unittest.TestCase):
             'app_id',
             'dependencies',
             'owner',
+            'owner_id',
             'url',
             'backend_code',
+            'backend_status',
             'version',
+            'save',
             'tologdict'
         ])
         self.onos_app.id = 1
@@ -88,6 +112,7 @@ class TestSyncOnosApp(unittest.TestCase):
         self.onos_app.app_id = "org.onosproject.vrouter"
         self.onos_app.dependencies = ""
         self.onos_app.owner.leaf_model = onos
+        self.onos_app.owner_id = 1
         self.onos_app.url = None
         self.onos_app.class_names = "ONOSApp"
         self.onos_app.tologdict.return_value = ""
@@ -99,6 +124,13 @@ class TestSyncOnosApp(unittest.TestCase):
         self.vrouter_app_response = {
             "name": "org.onosproject.vrouter",
             "version": "1.13.1",
+            "state": "ACTIVE",
+        }
+
+        self.installed_vrouter_app = {
+            "name": "org.onosproject.vrouter",
+            "version": "1.13.1",
+            "state": "INSTALLED",
         }
 
         self.onos_app_attribute = Mock(spec=[
@@ -120,37 +152,169 @@ class TestSyncOnosApp(unittest.TestCase):
         self.onos = None
         sys.path = self.sys_path_save
 
+    def create_app(self, id, app_id, dependencies=""):
+        app = Mock(spec=self.onos_app)
+        app.id = id
+        app.app_id = app_id
+        app.dependencies = dependencies
+        app.owner.leaf_model = self.onos_app.owner.leaf_model
+        app.owner_id = self.onos_app.owner_id
+        app.url = None
+        app.updated = 1000.0
+        app.changed_by_policy = None
+        return app
+
     @requests_mock.Mocker()
     def test_defer_app_sync(self, m):
         self.onos_app.dependencies = "org.onosproject.segmentrouting, org.onosproject.openflow"
 
-        segment_routing = Mock()
-        segment_routing.app_id = "org.onosproject.segmentrouting"
-        segment_routing.backend_code = 1
+        segment_routing = self.create_app(2, "org.onosproject.segmentrouting")
+        openflow = self.create_app(3, "org.onosproject.openflow")
+        self.app_graph.load([self.onos_app, segment_routing, openflow])
 
-        openflow = Mock()
-        openflow.app_id = "org.onosproject.openflow"
-        openflow.backend_code = 0
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [
+                  {"name": "org.onosproject.segmentrouting", "version": "1.13.1", "state": "ACTIVE"},
+                  {"name": "org.onosproject.openflow", "version": "1.13.1", "state": "INSTALLED"},
+              ]})
 
-        with patch.object(ONOSApp.objects, "get_items") as app_get, \
-                patch.object(ServiceInstance.objects, "get_items") as mock_si, \
-                self.assertRaises(DeferredException) as e:
+        m.post("http://onos-url:8181/onos/v1/applications/org.onosproject.openflow/active",
+               status_code=500,
+               text="Mock Error")
 
-            app_get.return_value = [segment_routing, openflow]
-            mock_si.return_value = [self.si]
+        with self.assertRaises(DeferredException) as e:
             self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
 
         self.assertEqual(
             e.exception.message,
             'Deferring installation of ONOSApp with id 1 as dependencies are not met')
+        self.assertEqual(m.call_count, 2)
+        self.assertFalse(m.request_history[-1].url.endswith("org.onosproject.vrouter/active"))
+
+    @requests_mock.Mocker()
+    def test_defer_app_sync_missing_dependencies(self, m):
+        self.onos_app.dependencies = "org.onosproject.segmentrouting, org.onosproject.openflow"
+
+        segment_routing = self.create_app(2, "org.onosproject.segmentrouting")
+        self.app_graph.load([self.onos_app, segment_routing])
+
+        with self.assertRaises(DeferredException) as e:
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        self.assertEqual(
+            e.exception.message,
+            'Deferring installation of ONOSApp with id 1 as dependencies are not met: '
+            'missing org.onosproject.openflow')
         self.assertFalse(m.called)
 
+    @requests_mock.Mocker()
+    def test_circular_dependencies(self, m):
+        self.onos_app.dependencies = "org.onosproject.openflow"
+
+        openflow = self.create_app(2, "org.onosproject.openflow", dependencies="org.onosproject.vrouter")
+        self.app_graph.load([self.onos_app, openflow])
+
+        with self.assertRaises(Exception) as e:
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        self.assertEqual(
+            e.exception.message,
+            'ONOSApp with id 1 has circular dependencies: '
+            'org.onosproject.vrouter -> org.onosproject.openflow -> org.onosproject.vrouter')
+        self.assertFalse(m.called)
+
+    @requests_mock.Mocker()
+    def test_install_dependencies_in_order(self, m):
+        """
+        The whole dependency chain is installed in a single pass, dependencies first
+        """
+
+        self.onos_app.app_id = "org.opencord.dhcpl2relay"
+        self.onos_app.dependencies = "org.opencord.aaa"
+
+        sadis = self.create_app(2, "org.opencord.sadis")
+        olt = self.create_app(3, "org.opencord.olt", dependencies="org.opencord.sadis")
+        aaa = self.create_app(4, "org.opencord.aaa", dependencies="org.opencord.olt, org.opencord.sadis")
+        self.app_graph.load([self.onos_app, sadis, olt, aaa])
+
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [
+                  {"name": app.app_id, "version": "1.0.0", "state": "INSTALLED"}
+                  for app in [self.onos_app, sadis, olt, aaa]
+              ]})
+
+        for app in [self.onos_app, sadis, olt, aaa]:
+            m.post("http://onos-url:8181/onos/v1/applications/%s/active" % app.app_id, status_code=200)
+            m.get("http://onos-url:8181/onos/v1/applications/%s" % app.app_id,
+                  status_code=200,
+                  json={"name": app.app_id, "version": "1.0.0", "state": "ACTIVE"})
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        activated = [r.url.split("/")[-2] for r in m.request_history if r.method == "POST"]
+        self.assertEqual(activated, ["org.opencord.sadis", "org.opencord.olt", "org.opencord.aaa",
+                                     "org.opencord.dhcpl2relay"])
+
+        # dependencies are now active, syncing them is a no-op
+        m.reset_mock()
+        self.sync_step(model_accessor=self.model_accessor).sync_record(olt)
+        self.assertFalse(m.called)
+
+    @requests_mock.Mocker()
+    def test_install_dependencies_report_status(self, m):
+        """
+        Dependencies in the same level are installed together, each one reports its own outcome
+        """
+
+        self.onos_app.dependencies = "org.opencord.sadis, org.opencord.kafka, org.opencord.olt"
+
+        sadis = self.create_app(2, "org.opencord.sadis")
+        kafka = self.create_app(3, "org.opencord.kafka")
+        olt = self.create_app(4, "org.opencord.olt")
+        self.app_graph.load([self.onos_app, sadis, kafka, olt])
+
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [
+                  {"name": app.app_id, "version": "1.0.0", "state": "INSTALLED"}
+                  for app in [sadis, kafka, olt]
+              ]})
+
+        for app in [sadis, olt]:
+            m.post("http://onos-url:8181/onos/v1/applications/%s/active" % app.app_id, status_code=200)
+            m.get("http://onos-url:8181/onos/v1/applications/%s" % app.app_id,
+                  status_code=200,
+                  json={"name": app.app_id, "version": "1.0.0", "state": "ACTIVE"})
+        m.post("http://onos-url:8181/onos/v1/applications/org.opencord.kafka/active",
+               status_code=500,
+               text="Mock Error")
+
+        with self.assertRaises(DeferredException):
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        for app in [sadis, olt]:
+            self.assertEqual(app.backend_code, 1)
+            self.assertEqual(app.backend_status, "OK")
+            self.assertEqual(app.enacted, 1000.0)
+            self.assertEqual(app.version, "1.0.0")
+            app.save.assert_called_with(update_fields=["enacted", "backend_status", "backend_register",
+                                                       "backend_code", "version"])
+        self.assertEqual(kafka.backend_code, 2)
+        self.assertTrue(kafka.backend_status.startswith(
+            "Failed to install as a dependency of org.onosproject.vrouter: Failed to add application"))
+
     @requests_mock.Mocker()
     def test_dependencies_none(self, m):
         """ App should sync if dependencies is set to None """
 
         self.onos_app.dependencies = None
 
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.installed_vrouter_app]})
+
         m.post("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter/active",
                status_code=200,
                additional_matcher=match_none)
@@ -166,7 +330,7 @@ class TestSyncOnosApp(unittest.TestCase):
             self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
 
         self.assertTrue(m.called)
-        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.call_count, 3)
         self.assertEqual(self.onos_app.version, self.vrouter_app_response["version"])
 
     @requests_mock.Mocker()
@@ -175,6 +339,10 @@ class TestSyncOnosApp(unittest.TestCase):
         Activate an application that is already installed in ONOS
         """
 
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.installed_vrouter_app]})
+
         m.post("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter/active",
                status_code=200,
                additional_matcher=match_none)
@@ -190,12 +358,16 @@ class TestSyncOnosApp(unittest.TestCase):
             self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
 
         self.assertTrue(m.called)
-        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.call_count, 3)
         self.assertEqual(self.onos_app.version, self.vrouter_app_response["version"])
 
     @requests_mock.Mocker()
     def test_app_sync_local_app_with_config(self, m):
 
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.installed_vrouter_app]})
+
         m.post("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter/active",
                status_code=200,
                additional_matcher=match_none)
@@ -208,9 +380,226 @@ class TestSyncOnosApp(unittest.TestCase):
             mock_si.return_value = [self.si]
             self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
         self.assertTrue(m.called)
-        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(self.onos_app.version, self.vrouter_app_response["version"])
+
+    @requests_mock.Mocker()
+    def test_app_sync_local_app_already_active(self, m):
+        """
+        An application that is already active in ONOS does not need to be activated again
+        """
+
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.vrouter_app_response]})
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        self.assertEqual(m.call_count, 1)
         self.assertEqual(self.onos_app.version, self.vrouter_app_response["version"])
 
+    @requests_mock.Mocker()
+    def test_app_sync_after_restart(self, m):
+        """
+        An application that the ledger knows is active is not checked again, eg: after the synchronizer restarted
+        """
+        from onos.inventory import app_inventory
+
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.vrouter_app_response]})
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+        self.assertEqual(m.call_count, 1)
+
+        app_inventory.new_cycle()
+        self.onos_app.version = None
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(self.onos_app.version, self.vrouter_app_response["version"])
+
+        # the application has been deactivated
+        m.delete("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter/active", status_code=204)
+        self.sync_step(model_accessor=self.model_accessor).delete_record(self.onos_app)
+        self.assertIsNone(self.applied_state.app_version(1, "http://onos-url:8181", "org.onosproject.vrouter"))
+
+    @requests_mock.Mocker()
+    def test_config_add(self, m):
+        """
+        A config that has been applied already is not pushed again
+        """
+        self.onos_app_attribute.value = json.dumps(self.onos_app_attribute.value)
+        self.onos_app_attribute.tologdict = Mock(return_value="")
+        m.post("http://onos-url:8181%s" % self.onos_app_attribute.name, status_code=200)
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual(m.call_count, 1)
+        # the config is sent as it is stored in the model
+        self.assertEqual(m.last_request.body, self.onos_app_attribute.value)
+
+        # the config changed, only its subject is pushed
+        m.post("http://onos-url:8181%s/kafka" % self.onos_app_attribute.name, status_code=200)
+        self.onos_app_attribute.value = json.dumps({"kafka": {"bootstrapServers": "kafka:9092"}})
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(m.last_request.url, "http://onos-url:8181%s/kafka" % self.onos_app_attribute.name)
+        self.assertEqual(m.last_request.json(), {"bootstrapServers": "kafka:9092"})
+
+    @requests_mock.Mocker()
+    def test_config_add_subjects(self, m):
+        """
+        Only the subjects of a network configuration that changed are pushed, the removed ones are deleted
+        """
+        devices = "http://onos-url:8181/onos/v1/network/configuration/devices"
+        self.onos_app_attribute.name = "/onos/v1/network/configuration/devices"
+        self.onos_app_attribute.value = json.dumps({
+            "of:01": {"basic": {"driver": "voltha"}},
+            "of:02": {"basic": {"driver": "voltha"}, "ports": {"1": {}}},
+        })
+        self.onos_app_attribute.tologdict = Mock(return_value="")
+        m.post(devices, status_code=200)
+        m.post("%s/of:02/basic" % devices, status_code=200)
+        m.post("%s/of:03/basic" % devices, status_code=500, text="Mock Error")
+        m.delete("%s/of:01/basic" % devices, status_code=204)
+
+        # the first time the whole config is pushed
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual([(r.method, r.url) for r in m.request_history], [("POST", devices)])
+
+        self.onos_app_attribute.value = json.dumps({
+            "of:02": {"basic": {"driver": "default"}, "ports": {"1": {}}},
+            "of:03": {"basic": {"driver": "voltha"}},
+        })
+        with self.assertRaises(Exception) as e:
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual(str(e.exception), "Failed to add config %s in ONOS:  POST devices/of:03/basic: Mock Error"
+                         % devices)
+        self.assertEqual(sorted((r.method, r.url) for r in m.request_history[1:]), [
+            ("DELETE", "%s/of:01/basic" % devices),
+            ("POST", "%s/of:02/basic" % devices),
+            ("POST", "%s/of:03/basic" % devices),
+        ])
+
+        # only the subject that failed is pushed again
+        m.post("%s/of:03/basic" % devices, status_code=200)
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual([(r.method, r.url) for r in m.request_history[4:]], [("POST", "%s/of:03/basic" % devices)])
+        self.assertEqual(m.request_history[-1].json(), {"driver": "voltha"})
+
+    @requests_mock.Mocker()
+    def test_config_add_same_path(self, m):
+        """
+        The attributes of two ONOSApps pushing to the same path don't delete each other's subjects
+        """
+        devices = "http://onos-url:8181/onos/v1/network/configuration/devices"
+        m.post(devices, status_code=200)
+        m.delete("%s/of:02/basic" % devices, status_code=204)
+        m.post("%s/of:03/basic" % devices, status_code=200)
+
+        self.onos_app_attribute.name = "/onos/v1/network/configuration/devices"
+        self.onos_app_attribute.value = json.dumps({
+            "of:01": {"basic": {"driver": "voltha"}},
+            "of:02": {"basic": {"driver": "voltha"}},
+        })
+        self.onos_app_attribute.tologdict = Mock(return_value="")
+        other_attribute = Mock(spec=self.onos_app_attribute)
+        other_attribute.id = 2
+        other_attribute.service_instance = self.si
+        other_attribute.name = self.onos_app_attribute.name
+        other_attribute.value = json.dumps({"of:02": {"basic": {"driver": "voltha"}}})
+        other_attribute.tologdict = Mock(return_value="")
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.sync_step(model_accessor=self.model_accessor).sync_record(other_attribute)
+        self.assertEqual(m.call_count, 2)
+
+        from onos.applied import content_hash
+
+        # of:02 is still configured by the other attribute
+        self.onos_app_attribute.value = json.dumps({"of:01": {"basic": {"driver": "voltha"}}})
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+        self.assertEqual(m.call_count, 2)
+        onos = self.onos_app.owner.leaf_model
+        self.assertEqual(self.applied_state.subjects(onos.id, "http://onos-url:8181", self.onos_app_attribute.name[1:],
+                                                     model="ServiceInstanceAttribute", model_id=2),
+                         {"devices/of:02/basic": content_hash({"driver": "voltha"})})
+
+        # nobody configures of:02 anymore
+        other_attribute.value = json.dumps({"of:03": {"basic": {"driver": "voltha"}}})
+        self.sync_step(model_accessor=self.model_accessor).sync_record(other_attribute)
+        self.assertEqual(sorted((r.method, r.url) for r in m.request_history[2:]), [
+            ("DELETE", "%s/of:02/basic" % devices),
+            ("POST", "%s/of:03/basic" % devices),
+        ])
+
+    @requests_mock.Mocker()
+    def test_config_add_invalid(self, m):
+        self.onos_app_attribute.value = '{"kafka": {"bootstrapServers": }}'
+        self.onos_app_attribute.tologdict = Mock(return_value="")
+
+        for _ in range(2):
+            with self.assertRaises(Exception) as e:
+                self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+            self.assertTrue(str(e.exception).startswith("Invalid JSON in config %s: " % self.onos_app_attribute.name))
+
+        # the config is rejected once, without calling ONOS
+        self.assertFalse(m.called)
+        self.assertEqual(self.payload_cache.stats, {"hits": 1, "misses": 1, "invalid": 1})
+
+    @requests_mock.Mocker()
+    def test_config_add_fail(self, m):
+        self.onos_app_attribute.value = json.dumps(self.onos_app_attribute.value)
+        self.onos_app_attribute.tologdict = Mock(return_value="")
+        m.post("http://onos-url:8181%s" % self.onos_app_attribute.name, status_code=500, text="Mock Error")
+
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app_attribute)
+
+        # the push is retried
+        self.assertEqual(m.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_app_inventory_shared_in_cycle(self, m):
+        """
+        All the apps synchronized in the same cycle share a single read of the ONOS applications
+        """
+
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [
+                  self.vrouter_app_response,
+                  {"name": "org.onosproject.openflow", "version": "1.13.1", "state": "ACTIVE"}
+              ]})
+
+        openflow = Mock(spec=self.onos_app)
+        openflow.id = 2
+        openflow.app_id = "org.onosproject.openflow"
+        openflow.dependencies = ""
+        openflow.owner.leaf_model = self.onos_app.owner.leaf_model
+        openflow.owner_id = self.onos_app.owner_id
+        openflow.url = None
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+        self.sync_step(model_accessor=self.model_accessor).sync_record(openflow)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(openflow.version, "1.13.1")
+
+        # a new cycle reads the applications again, unless the ledger says the application is active already
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+        self.assertEqual(m.call_count, 1)
+        self.applied_state.clear()
+
+        step = self.sync_step(model_accessor=self.model_accessor)
+        with patch.object(self.model_accessor, "fetch_pending") as fetch_pending:
+            fetch_pending.return_value = []
+            step.fetch_pending()
+        step.sync_record(self.onos_app)
+
+        self.assertEqual(m.call_count, 2)
+
     @requests_mock.Mocker()
     def test_app_install_remote_app_no_config(self, m):
         """
@@ -231,10 +620,13 @@ class TestSyncOnosApp(unittest.TestCase):
                additional_matcher=functools.partial(match_json, expected),
                json=self.vrouter_app_response)
 
-        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter", [
-            {'status_code': 404, 'text': "foo"},
-            {'status_code': 200, 'json': self.vrouter_app_response}
-        ])
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": []})
+
+        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
+              status_code=200,
+              json=self.vrouter_app_response)
 
         self.si.serviceinstanceattribute_dict = {}
 
@@ -245,6 +637,77 @@ class TestSyncOnosApp(unittest.TestCase):
         self.assertEqual(m.call_count, 3)
         self.assertEqual(self.onos_app.app_id, self.vrouter_app_response["name"])
 
+    @requests_mock.Mocker()
+    def test_app_install_remote_app_from_cache(self, m):
+        """
+        Install an application uploading the archive from the local cache
+        """
+        from onos.artifacts import artifact_cache, ArtifactCache
+
+        self.onos_app.url = 'http://onf.org/maven/vrouter.oar'
+        self.onos_app.version = "1.13.1"
+
+        m.get("http://onf.org/maven/vrouter.oar", status_code=200, content=b"oar content")
+        m.post("http://onos-url:8181/onos/v1/applications?activate=true",
+               status_code=200,
+               request_headers={"Content-Type": "application/octet-stream"},
+               json=self.vrouter_app_response)
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": []})
+        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
+              status_code=200,
+              json=self.vrouter_app_response)
+
+        self.si.serviceinstanceattribute_dict = {}
+
+        cache = ArtifactCache(tempfile.mkdtemp(), 1024)
+        with patch.object(artifact_cache, "get") as mock_cache, \
+                patch.object(ServiceInstance.objects, "get_items") as mock_si:
+            mock_cache.return_value = cache
+            mock_si.return_value = [self.si]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        shutil.rmtree(cache.directory)
+
+        [upload] = [r for r in m.request_history if r.method == "POST"]
+        self.assertEqual(upload.body.name, cache.path(cache.index[self.onos_app.url]["sha256"]))
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(self.onos_app.version, "1.13.1")
+
+    @requests_mock.Mocker()
+    def test_app_install_remote_app_cache_failure(self, m):
+        """
+        ONOS downloads the archive on its own if it can't be read from the cache
+        """
+        from onos.artifacts import artifact_cache
+
+        self.onos_app.url = 'http://onf.org/maven/vrouter.oar'
+        self.onos_app.version = "1.13.1"
+
+        m.post("http://onos-url:8181/onos/v1/applications",
+               status_code=200,
+               additional_matcher=functools.partial(match_json, {"activate": True, "url": self.onos_app.url}),
+               json=self.vrouter_app_response)
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": []})
+        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
+              status_code=200,
+              json=self.vrouter_app_response)
+
+        self.si.serviceinstanceattribute_dict = {}
+
+        with patch.object(artifact_cache, "get") as mock_cache, \
+                patch.object(ServiceInstance.objects, "get_items") as mock_si:
+            # the archive is evicted before it is read
+            mock_cache.return_value.get.return_value = "/nonexistent/archive.oar"
+            mock_si.return_value = [self.si]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_app)
+
+        self.assertEqual(len([r for r in m.request_history if r.method == "POST"]), 1)
+        self.assertEqual(self.onos_app.version, "1.13.1")
+
     @requests_mock.Mocker()
     def test_update_remote_app(self, m):
         self.onos_app.url = 'http://onf.org/maven/...'
@@ -263,12 +726,13 @@ class TestSyncOnosApp(unittest.TestCase):
                additional_matcher=functools.partial(match_json, expected),
                json=self.vrouter_app_response)
 
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": [self.vrouter_app_response]})
+
         m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
-              [
-                  {"json": self.vrouter_app_response, "status_code": 200},
-                  {"json": self.vrouter_app_response_updated, "status_code": 200}
-              ]
-              )
+              status_code=200,
+              json=self.vrouter_app_response_updated)
 
         m.delete("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
                  status_code=204)
@@ -302,10 +766,13 @@ class TestSyncOnosApp(unittest.TestCase):
                additional_matcher=functools.partial(match_json, expected),
                json=self.vrouter_app_response)
 
-        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter", [
-            {'status_code': 404, 'text': "foo"},
-            {'status_code': 200, 'json': self.vrouter_app_response}
-        ])
+        m.get("http://onos-url:8181/onos/v1/applications",
+              status_code=200,
+              json={"applications": []})
+
+        m.get("http://onos-url:8181/onos/v1/applications/org.onosproject.vrouter",
+              status_code=200,
+              json=self.vrouter_app_response)
 
         self.si.serviceinstanceattribute_dict = {}
 
@@ -34,6 +34,7 @@ def match_json(desired, req):
 class TestSyncOnosService(unittest.TestCase):
 
     def setUp(self):
+        global Helpers
 
         self.sys_path_save = sys.path
 
@@ -52,7 +53,18 @@ class TestSyncOnosService(unittest.TestCase):
         reload(mock_modelaccessor)  # in case nose2 loaded it in a previous test
         reload(xossynchronizer.modelaccessor)      # in case nose2 loaded it in a previous test
 
-        from sync_onos_service import SyncONOSService, model_accessor
+        from sync_onos_service import SyncONOSService, Helpers, model_accessor
+        from onos.applied import applied_state
+        from onos.payloads import payload_cache
+        from onos.endpoints import endpoint_cache
+        from onos.session import session_pool
+
+        self.applied_state = applied_state
+        self.endpoint_cache = endpoint_cache
+        self.session_pool = session_pool
+        applied_state.clear()
+        payload_cache.clear()
+        endpoint_cache.invalidate()
 
         self.model_accessor = model_accessor
 
@@ -69,7 +81,9 @@ class TestSyncOnosService(unittest.TestCase):
             "rest_port",
             "rest_username",
             "rest_password",
-            "class_names"
+            "class_names",
+            "backend_status",
+            "save"
         ])
         self.onos.id = 1
         self.onos.name = "onos"
@@ -118,27 +132,158 @@ class TestSyncOnosService(unittest.TestCase):
             '/onos/v1/network/configuration/apps/org.onosproject.dhcp': expected_conf
         }
 
-        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt",
+        # the configs are merged in a single POST
+        m.post("http://onos-url:8181/onos/v1/network/configuration",
                status_code=200,
-               additional_matcher=functools.partial(match_json, json.loads(expected_conf)))
+               additional_matcher=functools.partial(match_json, {
+                   "apps": {
+                       "org.onosproject.olt": json.loads(expected_conf),
+                       "org.onosproject.dhcp": json.loads(expected_conf)
+                   }
+               }))
+
+        with patch.object(Service.objects, "get_items") as service_mock:
+            service_mock.return_value = [self.service]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
+        self.assertTrue(m.called)
+        self.assertEqual(m.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_not_merged(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": "bar"}',
+            # conflicts with the first one
+            '/onos/v1/network/configuration/apps/org.onosproject.olt/foo': '"baz"',
+            # not a network configuration
+            '/onos/v1/other/api': '{"foo": "bar"}'
+        }
 
-        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp",
+        m.post("http://onos-url:8181/onos/v1/network/configuration",
                status_code=200,
-               additional_matcher=functools.partial(match_json, json.loads(expected_conf)))
+               additional_matcher=functools.partial(match_json, {
+                   "apps": {
+                       "org.onosproject.olt": {"foo": "bar"},
+                       "org.onosproject.dhcp": {"foo": "bar"}
+                   }
+               }))
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt/foo",
+               status_code=200,
+               additional_matcher=functools.partial(match_json, "baz"))
+        m.post("http://onos-url:8181/onos/v1/other/api",
+               status_code=200,
+               additional_matcher=functools.partial(match_json, {"foo": "bar"}))
 
         with patch.object(Service.objects, "get_items") as service_mock:
             service_mock.return_value = [self.service]
             self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
-        self.assertTrue(m.called)
+        self.assertEqual(m.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_merge_disabled(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": "bar"}'
+        }
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt", status_code=200)
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp", status_code=200)
+
+        with patch.object(Service.objects, "get_items") as service_mock, \
+                patch.object(Helpers, "get_onos_config", side_effect=lambda section, key, default=None:
+                             False if (section, key) == ("netcfg", "merge") else default):
+            service_mock.return_value = [self.service]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
         self.assertEqual(m.call_count, 2)
 
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_merge_fallback(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": "bar"}'
+        }
+        # ONOS does not accept the dhcp config
+        m.post("http://onos-url:8181/onos/v1/network/configuration", status_code=400, text="Invalid config")
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt", status_code=200)
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp", status_code=400,
+               text="Invalid config")
+
+        with self.assertRaises(Exception) as e, \
+                patch.object(Service.objects, "get_items") as service_mock:
+            service_mock.return_value = [self.service]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
+
+        # the olt config has been pushed anyway
+        self.assertEqual(m.call_count, 3)
+        self.assertEqual(e.exception.message, "Failed to add config "
+                         "http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp in ONOS "
+                         "(1 applied, 0 pending, 1 failed)")
+
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_retry_failed(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": "bar"}'
+        }
+        m.post("http://onos-url:8181/onos/v1/network/configuration", status_code=400, text="Invalid config")
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt", status_code=200)
+        dhcp = m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp",
+                      status_code=400, text="Invalid config")
+
+        step = self.sync_step(model_accessor=self.model_accessor)
+        with patch.object(Service.objects, "get_items") as service_mock:
+            service_mock.return_value = [self.service]
+            with self.assertRaises(Exception):
+                step.sync_record(self.onos)
+            self.assertEqual(m.call_count, 3)
+
+            # only the config that failed is pushed again
+            m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp", status_code=200)
+            step.sync_record(self.onos)
+            self.assertEqual(m.call_count, 4)
+            self.assertEqual(m.last_request.url,
+                             "http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp")
+            self.assertEqual(dhcp.call_count, 1)
+
+        step.after_sync_save(self.onos)
+        self.assertEqual(self.onos.backend_status, "OK (2 applied, 0 pending, 0 failed)")
+        self.onos.save.assert_called_with(update_fields=["backend_status"])
+
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_changed(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": "bar"}'
+        }
+        m.post("http://onos-url:8181/onos/v1/network/configuration", status_code=200)
+        dhcp = m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp",
+                      status_code=200, additional_matcher=functools.partial(match_json, {"foo": "baz"}))
+
+        step = self.sync_step(model_accessor=self.model_accessor)
+        with patch.object(Service.objects, "get_items") as service_mock:
+            service_mock.return_value = [self.service]
+            step.sync_record(self.onos)
+            self.assertEqual(m.call_count, 1)
+
+            # nothing changed, nothing is pushed
+            step.sync_record(self.onos)
+            self.assertEqual(m.call_count, 1)
+
+            self.service.serviceattribute_dict['/onos/v1/network/configuration/apps/org.onosproject.dhcp'] = \
+                '{"foo": "baz"}'
+            step.sync_record(self.onos)
+            self.assertEqual(m.call_count, 2)
+            self.assertEqual(dhcp.call_count, 1)
+
     @requests_mock.Mocker()
     def test_sync_service_attributes_from_attribute(self, m):
         expected_conf = '{"foo": "bar"}'
+        # only the attribute that changed is pushed
         self.service.serviceattribute_dict = {
             '/onos/v1/network/configuration/apps/org.onosproject.olt': expected_conf,
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': expected_conf
         }
-        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt",
+        self.onos_service_attribute.value = expected_conf
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.opencord.olt",
                status_code=200,
                additional_matcher=functools.partial(match_json, json.loads(expected_conf)))
 
@@ -149,6 +294,41 @@ class TestSyncOnosService(unittest.TestCase):
         self.assertTrue(m.called)
         self.assertEqual(m.call_count, 1)
 
+    @requests_mock.Mocker()
+    def test_sync_service_attribute_applied(self, m):
+        """
+        A config the ledger holds already is not pushed again, eg: after the synchronizer restarted
+        """
+        from onos.applied import content_hash, APPLIED
+
+        self.onos_service_attribute.value = '{"foo": "bar"}'
+        self.applied_state.record(self.onos.id, "http://onos-url:8181", self.onos_service_attribute.name[1:],
+                                  content_hash({"foo": "bar"}), APPLIED)
+
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_service_attribute)
+        self.assertFalse(m.called)
+
+        # the config changed
+        m.post("http://onos-url:8181%s" % self.onos_service_attribute.name, status_code=200)
+        self.onos_service_attribute.value = '{"foo": "baz"}'
+        self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_service_attribute)
+        self.assertEqual(m.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_sync_service_attribute_err(self, m):
+        self.onos_service_attribute.value = '{"foo": "bar"}'
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.opencord.olt",
+               status_code=500,
+               text="Mock Error")
+
+        with self.assertRaises(Exception) as e:
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos_service_attribute)
+
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(
+            e.exception.message,
+            "Failed to add config http://onos-url:8181/onos/v1/network/configuration/apps/org.opencord.olt in ONOS")
+
     @requests_mock.Mocker()
     def test_sync_service_attributes_err(self, m):
         expected_conf = '{"foo": "bar"}'
@@ -172,7 +352,35 @@ class TestSyncOnosService(unittest.TestCase):
         self.assertEqual(m.call_count, 1)
         self.assertEqual(
             e.exception.message,
-            "Failed to add config http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt in ONOS")
+            "Failed to add config http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt in ONOS "
+            "(0 applied, 0 pending, 1 failed)")
+
+    @requests_mock.Mocker()
+    def test_sync_service_attributes_invalid(self, m):
+        self.service.serviceattribute_dict = {
+            '/onos/v1/network/configuration/apps/org.onosproject.olt': '{"foo": "bar"}',
+            '/onos/v1/network/configuration/apps/org.onosproject.dhcp': '{"foo": ',
+        }
+        m.post("http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.olt", status_code=200)
+
+        with patch.object(Service.objects, "get_items") as service_mock, \
+                patch("onos.payloads.json.loads", side_effect=json.loads) as loads:
+            service_mock.return_value = [self.service]
+
+            for _ in range(2):
+                with self.assertRaises(Exception) as e:
+                    self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
+
+        # the valid config is pushed anyway, as it is stored in the model
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(m.last_request.body, '{"foo": "bar"}')
+        self.assertEqual(m.last_request.headers["Content-Type"], "application/json")
+        self.assertEqual(
+            e.exception.message,
+            "Failed to add config http://onos-url:8181/onos/v1/network/configuration/apps/org.onosproject.dhcp "
+            "in ONOS (1 applied, 0 pending, 1 failed)")
+        # the configs are parsed only once
+        self.assertEqual(loads.call_count, 2)
 
     @requests_mock.Mocker()
     def test_delete(self, m):
@@ -183,6 +391,63 @@ class TestSyncOnosService(unittest.TestCase):
         self.assertTrue(m.called)
         self.assertEqual(m.call_count, 1)
 
+    @requests_mock.Mocker()
+    def test_endpoint_change(self, m):
+        """
+        SyncONOSApp sees the new endpoint of an ONOSService as soon as SyncONOSService synchronizes it
+        """
+        from sync_onos_app import SyncONOSApp
+
+        app = Mock()
+        app.owner_id = self.onos.id
+        app.owner.leaf_model = self.onos
+        app.class_names = "ONOSApp"
+        attribute = Mock(spec=["id", "service_instance", "name", "value", "tologdict"])
+        attribute.id = 1
+        attribute.service_instance.leaf_model = app
+        attribute.name = "/onos/v1/network/configuration/apps/org.opencord.olt"
+        attribute.value = '{"foo": "bar"}'
+        attribute.tologdict.return_value = ""
+
+        m.post("http://onos-url:8181%s" % attribute.name, status_code=200)
+        m.post("http://onos-new:8181%s" % attribute.name, status_code=200)
+
+        SyncONOSApp(model_accessor=self.model_accessor).sync_record(attribute)
+        self.assertEqual(m.last_request.url, "http://onos-url:8181%s" % attribute.name)
+
+        # the ONOSService has been moved
+        self.onos.rest_hostname = "onos-new"
+        with patch.object(Service.objects, "get_items") as service_mock:
+            service_mock.return_value = [self.service]
+            self.sync_step(model_accessor=self.model_accessor).sync_record(self.onos)
+
+        attribute.value = '{"foo": "baz"}'
+        SyncONOSApp(model_accessor=self.model_accessor).sync_record(attribute)
+        self.assertEqual(m.last_request.url, "http://onos-new:8181%s" % attribute.name)
+        self.assertEqual(m.call_count, 2)
+
+        # the ONOSService has been deleted
+        dropped = self.session_pool.stats()["sessions_dropped"]
+        self.sync_step(model_accessor=self.model_accessor).delete_record(self.onos)
+        self.assertEqual(self.endpoint_cache.stats()["endpoints"], 0)
+        self.assertEqual(self.session_pool.stats()["sessions_dropped"], dropped + 1)
+
+    def test_steps_share_the_helpers(self):
+        """
+        The synchronizer loads every module of the steps directory on its own, the helpers the steps depend on are
+        still loaded once and shared by all of them
+        """
+        from xossynchronizer.backend import Backend
+
+        steps = Backend(self.model_accessor).load_sync_step_modules(test_path)
+        modules = [sys.modules[step.__module__] for step in steps]
+        self.assertEqual(sorted(m.__name__ for m in modules), ["sync_onos_app", "sync_onos_service"])
+
+        (app, service) = sorted(modules, key=lambda m: m.__name__)
+        for name in ["session_pool", "endpoint_cache", "applied_state", "payload_cache", "readiness_gates",
+                     "trace_sync", "instrument_sync", "profile_sync"]:
+            self.assertIs(getattr(app, name), getattr(service, name), name)
+
 
 if __name__ == '__main__':
     unittest.main()